@@ -0,0 +1,199 @@
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+from threading import Thread, Condition
+from time import perf_counter
+from typing import Optional, Callable
+
+from core.tool_file import encode_tool_bytes, is_compact_tool_file
+from core.tool_file_cache import invalidate_tool_file
+from core.utils import write_file_bytes_atomically
+
+
+class BackgroundSaver:
+    """
+    Serialize and write files on a background thread. Saves submitted in a burst are coalesced: the thread waits for
+    the submissions to settle and only writes the last content of each file. Files whose content did not change are
+    not rewritten, and files identical to an already saved one are written from its bytes
+    """
+
+    @property
+    def queue_depth(self) -> int:
+        with self._condition:
+            return len(self._pending_save_dict) + self._in_flight_count
+
+    def __init__(self, coalescing_delay=0.3, logger: Optional[logging.Logger] = None):
+        self._coalescing_delay = coalescing_delay
+        self.logger = logger if logger is not None else logging.getLogger('')
+        # File path -> (value or path of the identical file, is_compact, time of its first coalesced submission,
+        # callback of the last submission once saved)
+        self._pending_save_dict = OrderedDict([])
+        self._in_flight_count = 0
+        self._flush_request_count = 0
+        self._last_submit_time = 0.0
+        self._is_stopping = False
+        # File path -> (size, modification time in ns, content hash) of the file as last written or read, the hash is
+        # only trusted while the file keeps its size and modification time, e.g. not after a p4 sync
+        self._content_hash_dict = {}
+        self._metric_dict = {
+            'written_count': 0,
+            'copied_count': 0,
+            'skipped_count': 0,
+            'failed_count': 0,
+            'last_save_latency': 0.0,
+            'max_save_latency': 0.0,
+            'total_save_latency': 0.0
+        }
+        self._condition = Condition()
+        self._thread = Thread(target=self._run, name='BackgroundSaver', daemon=True)
+        self._thread.start()
+
+    def submit(self, file_path, value: dict, is_compact: Optional[bool] = None,
+               on_saved: Optional[Callable[[], None]] = None):
+        """
+        Queue a file save. The value must not be modified afterward since it is serialized on the saver thread
+
+        :param file_path: path of the file
+        :param value: tool data or any JSON serializable dict
+        :param is_compact: write the compact tool format, None keeps the format of the existing file
+        :param on_saved: called on the saver thread once the file holds the value, not called if the save fails or
+        gets superseded by a later submission of the same file
+        :return:
+        """
+        file_path = Path(file_path)
+        with self._condition:
+            previous_save = self._pending_save_dict.pop(file_path, None)
+            submit_time = previous_save[2] if previous_save is not None else perf_counter()
+            self._pending_save_dict[file_path] = (value, is_compact, submit_time, on_saved)
+            self._last_submit_time = perf_counter()
+            self._condition.notify_all()
+
+    def submit_copy(self, file_path, source_file_path):
+        """
+        Queue the save of a file identical to another one, e.g. an unmodified tool saved again to a new folder. The
+        bytes of the source file are written to a new file once the saves submitted before got written. The file is
+        neither linked nor copied with its mode, so it stays writable when the source is read-only, e.g. synced from
+        Perforce
+
+        :param file_path: path of the file
+        :param source_file_path: path of the identical file, submitted earlier or already saved
+        :return:
+        """
+        self.submit(file_path, Path(source_file_path))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Write the pending saves right away and wait for them
+
+        :param timeout: maximum time to wait in seconds
+        :return: True if every pending save got written
+        """
+        with self._condition:
+            self._flush_request_count += 1
+            self._condition.notify_all()
+            try:
+                return self._condition.wait_for(lambda: not self._pending_save_dict and not self._in_flight_count,
+                                                timeout)
+            finally:
+                self._flush_request_count -= 1
+
+    def stop(self):
+        self.flush()
+        with self._condition:
+            self._is_stopping = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def get_metrics(self) -> dict:
+        with self._condition:
+            metric_dict = dict(self._metric_dict)
+            metric_dict['queue_depth'] = len(self._pending_save_dict) + self._in_flight_count
+        save_count = metric_dict['written_count'] + metric_dict['copied_count'] + metric_dict['skipped_count'] + \
+            metric_dict['failed_count']
+        metric_dict['average_save_latency'] = metric_dict.pop('total_save_latency') / save_count if save_count else 0.0
+        return metric_dict
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending_save_dict or self._is_stopping)
+                if not self._pending_save_dict:
+                    return
+                self._wait_for_submissions_to_settle()
+                save_list = list(self._pending_save_dict.items())
+                self._pending_save_dict.clear()
+                self._in_flight_count = len(save_list)
+            start_time = perf_counter()
+            for file_path, (value, is_compact, submit_time, on_saved) in save_list:
+                if self._save(file_path, value, is_compact, submit_time) and on_saved is not None:
+                    try:
+                        on_saved()
+                    except Exception:
+                        self.logger.exception(f'Saved callback of {file_path} failed')
+                with self._condition:
+                    self._in_flight_count -= 1
+            with self._condition:
+                self._condition.notify_all()
+            self.logger.debug(f'Background saved {len(save_list)} file(s) in {perf_counter() - start_time:.3f}s, '
+                              f'metrics: {self.get_metrics()}')
+
+    def _wait_for_submissions_to_settle(self):
+        while not self._is_stopping and not self._flush_request_count:
+            remaining_delay = self._last_submit_time + self._coalescing_delay - perf_counter()
+            if remaining_delay <= 0:
+                return
+            self._condition.wait(remaining_delay)
+
+    def _save(self, file_path: Path, value, is_compact: Optional[bool], submit_time: float) -> bool:
+        metric_key = 'written_count'
+        try:
+            if isinstance(value, Path):
+                metric_key = 'copied_count'
+                file_bytes = value.read_bytes()
+            else:
+                if is_compact is None:
+                    is_compact = is_compact_tool_file(file_path)
+                file_bytes = encode_tool_bytes(value, is_compact)
+            content_hash = hashlib.blake2b(file_bytes, digest_size=16).digest()
+            if self._get_existing_content_hash(file_path) == content_hash:
+                metric_key = 'skipped_count'
+            else:
+                write_file_bytes_atomically(file_path, file_bytes)
+                # Rewritten within the modification time resolution, the cached version could still look current
+                invalidate_tool_file(file_path)
+                self._remember_content_hash(file_path, content_hash)
+        except Exception:
+            metric_key = 'failed_count'
+            self._content_hash_dict.pop(file_path, None)
+            self.logger.exception(f'Could not save {file_path}')
+        save_latency = perf_counter() - submit_time
+        with self._condition:
+            self._metric_dict[metric_key] += 1
+            self._metric_dict['last_save_latency'] = save_latency
+            self._metric_dict['max_save_latency'] = max(self._metric_dict['max_save_latency'], save_latency)
+            self._metric_dict['total_save_latency'] += save_latency
+        return metric_key != 'failed_count'
+
+    def _get_existing_content_hash(self, file_path: Path) -> Optional[bytes]:
+        try:
+            file_stat = file_path.stat()
+        except FileNotFoundError:
+            return None
+        content_hash = self._get_cached_content_hash(file_path, file_stat)
+        if content_hash is None:
+            content_hash = hashlib.blake2b(file_path.read_bytes(), digest_size=16).digest()
+            self._content_hash_dict[file_path] = (file_stat.st_size, file_stat.st_mtime_ns, content_hash)
+        return content_hash
+
+    def _get_cached_content_hash(self, file_path: Path, file_stat: os.stat_result) -> Optional[bytes]:
+        """Get the content hash of a file as last written or read, None if unknown or if the file changed since"""
+        cached_content_hash = self._content_hash_dict.get(file_path, None)
+        if cached_content_hash is None or cached_content_hash[:2] != (file_stat.st_size, file_stat.st_mtime_ns):
+            return None
+        return cached_content_hash[2]
+
+    def _remember_content_hash(self, file_path: Path, content_hash: bytes):
+        file_stat = file_path.stat()
+        self._content_hash_dict[file_path] = (file_stat.st_size, file_stat.st_mtime_ns, content_hash)
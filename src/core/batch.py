@@ -0,0 +1,232 @@
+"""
+Batch runner, executes one tool event once per row of exposed var values
+
+Usage: python -m core.batch project.mproject --tool Perforce --event "Create workspace" --table users.csv
+"""
+import argparse
+import csv
+import json
+import logging
+import sys
+from multiprocessing import Pool
+from pathlib import Path
+from time import perf_counter
+from typing import List, Optional, Iterator, Tuple
+from traceback import format_exc
+
+from core.data_loader import refresh_core_data_with_json_dict, get_invalid_exposed_var_names
+from core.execution_plan import ExecutionPlan, ExecutionContext
+from core.executor import execute_event, get_execution_plan, setup_executor_parallel_mode
+from core.run import load_tool_data, get_event_tag, collect_exposed_var_values, get_exposed_var_type_dict, \
+    convert_string_to_var_value
+from core.utils import is_var_type_of_primitive_types
+from libs.constants import TOOLSET_NAME
+
+logger = logging.getLogger('')
+# Set once per worker process by _init_batch_worker, so rows only carry their own var values
+batch_worker_data = {}
+
+
+def main() -> int:
+    args = get_arg()
+    log_level = logging.DEBUG if args.is_debug_mode else logging.INFO
+    logging.basicConfig(level=log_level, format='%(asctime)s %(levelname)s %(message)s')
+    try:
+        tool_data = load_tool_data(Path(args.project_path), args.tool)
+        event_tag = get_event_tag(tool_data, args.event)
+        base_var_values = collect_exposed_var_values(tool_data, args.var, args.var_file)
+        row_list = load_var_table(Path(args.table), get_exposed_var_type_dict(tool_data))
+    except (OSError, KeyError, ValueError) as error:
+        logger.error(error)
+        return 2
+    output_file = open(args.output, 'w') if args.output else sys.stdout
+    start_time = perf_counter()
+    success_count = 0
+    try:
+        for result in execute_event_batch(tool_data, event_tag, row_list, base_var_values, args.workers,
+                                          args.parallel_workers, log_level):
+            success_count += result['status'] == 'success'
+            output_file.write(json.dumps(result, default=str) + '\n')
+            output_file.flush()
+    except ValueError as error:
+        logger.error(error)
+        return 1
+    finally:
+        if output_file is not sys.stdout:
+            output_file.close()
+    logger.info(f'{success_count}/{len(row_list)} rows succeeded in {perf_counter() - start_time:.3f}s')
+    return 0 if success_count == len(row_list) else 1
+
+
+def get_arg():
+    """
+    Get arg from CLI
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=f"{TOOLSET_NAME} - Batch runner", )
+
+    parser.add_argument(
+        "project_path",
+        type=str,
+        help='.mproject file, or a single .mtool file'
+    )
+    parser.add_argument(
+        "--tool",
+        type=str,
+        default='',
+        help='Tool name in the project, defaults to the first tool'
+    )
+    parser.add_argument(
+        "--event",
+        type=str,
+        required=True,
+        help='Event label as shown in Tools Viewer, or the event node uuid'
+    )
+    parser.add_argument(
+        "--table",
+        type=str,
+        required=True,
+        help='CSV file with var names as header, or JSONL file of objects keyed by var name. One run per row'
+    )
+    parser.add_argument(
+        "--var",
+        type=str,
+        action='append',
+        default=[],
+        help='Exposed var value shared by every row as Name=value, can be repeated'
+    )
+    parser.add_argument(
+        "--var_file",
+        type=str,
+        help='JSON file of exposed var values shared by every row'
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help='JSONL file receiving one result per row, defaults to stdout'
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help='Number of worker processes, defaults to the CPU count. 1 runs the rows in this process'
+    )
+    parser.add_argument(
+        "--is_debug_mode",
+        action='store_true'
+    )
+    parser.add_argument(
+        "--parallel_workers",
+        type=int,
+        default=0,
+        help='Number of threads computing independent Pure nodes concurrently in each run, 0 to disable'
+    )
+
+    args = parser.parse_args()
+    return args
+
+
+def load_var_table(table_path: Path, var_type_dict: dict) -> List[dict]:
+    """
+    Read the var values of every row. CSV cells are converted to their var type and empty cells are left unset
+
+    :param table_path: path to a .csv or .jsonl file
+    :param var_type_dict: type of every exposed var keyed by var name
+    :return: var values of every row
+    """
+    row_list = []
+    with open(table_path, newline='') as table_file:
+        if table_path.suffix == '.csv':
+            for csv_row in csv.DictReader(table_file):
+                row_list.append({var_name: convert_string_to_var_value(value, var_type_dict.get(var_name, 'String'))
+                                 for var_name, value in csv_row.items() if value})
+        else:
+            for line in table_file:
+                if line.strip():
+                    row_list.append(json.loads(line))
+    return row_list
+
+
+def execute_event_batch(tool_data: dict, event_tag: str, row_list: List[dict],
+                        base_var_values: Optional[dict] = None, worker_count: Optional[int] = None,
+                        parallel_worker_count: int = 0, log_level: int = logging.INFO) -> Iterator[dict]:
+    """
+    Execute an event once per row. The graph is loaded and compiled once, then every row runs the same plan in its
+    own execution context with the row values bound to the exposed vars
+
+    :param tool_data: tool data
+    :param event_tag: tag of the event node
+    :param row_list: exposed var values of every row, keyed by var name
+    :param base_var_values: exposed var values shared by every row, overridden by the row values
+    :param worker_count: number of worker processes, defaults to the CPU count. 1 runs the rows in this process
+    :param parallel_worker_count: number of threads computing independent Pure nodes in each run
+    :param log_level: logging level of the worker processes
+    :return: result of every row in row order, with its row index, status, elapsed time, outputs and message
+    """
+    if base_var_values is None:
+        base_var_values = {}
+    return_message = refresh_core_data_with_json_dict(tool_data, base_var_values, is_checking_regex=False)
+    if return_message[0] != 1:
+        raise ValueError(return_message[1])
+    init_args = (get_execution_plan(), event_tag, tool_data, base_var_values, parallel_worker_count, log_level)
+    if worker_count == 1 or len(row_list) <= 1:
+        _init_batch_worker(*init_args)
+        yield from map(_execute_batch_row, enumerate(row_list))
+        return
+    with Pool(worker_count, initializer=_init_batch_worker, initargs=init_args) as pool:
+        yield from pool.imap(_execute_batch_row, enumerate(row_list))
+
+
+def _init_batch_worker(plan: ExecutionPlan, event_tag: str, tool_data: dict, base_var_values: dict,
+                       parallel_worker_count: int, log_level: int):
+    logging.basicConfig(level=log_level, format='%(asctime)s %(levelname)s %(message)s')
+    setup_executor_parallel_mode(parallel_worker_count)
+    batch_worker_data.update({
+        'plan': plan,
+        'event_tag': event_tag,
+        'tool_data': tool_data,
+        'base_var_values': base_var_values,
+        'output_var_default_dict': _get_output_var_default_dict(tool_data)
+    })
+
+
+def _get_output_var_default_dict(tool_data: dict) -> dict:
+    """Vars reported as row outputs, passwords and non primitive vars such as Perforce instances are left out"""
+    return {var_info['name'][0]: var_info['default_value'][0] for var_info in tool_data['vars'].values()
+            if is_var_type_of_primitive_types(var_info['type'][0]) and var_info['type'][0] != 'Password'}
+
+
+def _execute_batch_row(indexed_row: Tuple[int, dict]) -> dict:
+    row_index, row_var_values = indexed_row
+    start_time = perf_counter()
+    result = {'row': row_index, 'status': 'success', 'elapsed_time': 0.0, 'outputs': {}, 'message': ''}
+    var_values = dict(batch_worker_data['base_var_values'], **row_var_values)
+    context = None
+    # Any error of a row is reported in its result, raising would abort the whole batch
+    try:
+        invalid_var_name_list = get_invalid_exposed_var_names(batch_worker_data['tool_data']['vars'], var_values)
+        if invalid_var_name_list:
+            result.update({'status': 'invalid',
+                           'message': f'Incorrect input value for {", ".join(invalid_var_name_list)}'})
+            return result
+        context = ExecutionContext(batch_worker_data['plan'], var_values)
+        return_code, message = execute_event(batch_worker_data['event_tag'], batch_worker_data['plan'], context)
+        if return_code != 1:
+            result.update({'status': 'skipped', 'message': message})
+    except RuntimeWarning:
+        result.update({'status': 'failed', 'message': 'Node execution failed, please check the log for details'})
+    except Exception:
+        result.update({'status': 'failed', 'message': format_exc()})
+    result['elapsed_time'] = perf_counter() - start_time
+    if context is None:
+        return result
+    result['outputs'] = {var_name: var_value[0] if var_value[0] is not None
+                         else batch_worker_data['output_var_default_dict'][var_name]
+                         for var_name, var_value in context.var_value_dict.items()
+                         if var_name in batch_worker_data['output_var_default_dict']}
+    return result
+
+
+if __name__ == '__main__':
+    sys.exit(main())
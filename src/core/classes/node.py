@@ -1,8 +1,8 @@
 from collections import OrderedDict
 
-from core.enum_types import NodeTypeFlag, PinMetaType
-from core.utils import dpg_get_value
-from core.classes.pin import *
+from core.enum_types import NodeTypeFlag, PinMetaType, InputPinType, OutputPinType
+from core.utils import dpg_get_value, generate_uuid
+# Pins and dearpygui are imported inside the UI methods only, so node modules can be imported headless
 
 
 def get_pin_class(pin_type):
@@ -12,6 +12,8 @@ def get_pin_class(pin_type):
     :param enumerate pin_type: pin_type from pin enumeration
     :return: pin class
     """
+    from core.classes.pin import PinExec, PinInt, PinFloat, PinString, PinMultilineString, PinPassword, PinJson, \
+        PinBool, PinWildCard, PerforceInstancePin, PinStringArray, PinBase
     # Since pin_type are Int enums, only need to compare pin_type to InputPinType
     if pin_type == InputPinType.Exec:
         return PinExec
@@ -158,6 +160,8 @@ def __init__(self,
             self._import_path = import_path
         self._import_path = import_path
         self._default_output_value_dict = {}
+        # Called with this node after its input pin values got edited, set by the node editor to record undo actions
+        self.pin_value_edit_listener = None
         if internal_data is None:
             self._internal_data = {}
         else:
@@ -171,6 +175,7 @@ def construct_pin(self, pin_type, label='', callback=None):
         :param label: name of the pin (uuid is internally assigned)
         :param callback: callback function on pin's value changed
         """
+        import dearpygui.dearpygui as dpg
         if pin_type.__class__ == InputPinType:
             attribute_type = dpg.mvNode_Attr_Input
             pin_class = get_pin_class(pin_type)
@@ -225,6 +230,8 @@ def initialize_node(self, parent, label, pos=None):
         :param label: label of the node
         :param pos: spawn position
         """
+        import dearpygui.dearpygui as dpg
+        from core.classes.pin import PinEvent
         if pos is None:
             _pos = [0, 0]
         else:
@@ -277,6 +284,7 @@ def initialize_node(self, parent, label, pos=None):
 
     @staticmethod
     def node_right_click_menu():
+        import dearpygui.dearpygui as dpg
         with dpg.window(
             popup=True,
             autosize=True,
@@ -317,6 +325,7 @@ def on_node_deletion(self, **kwargs):
         assert not hasattr(super(), 'Close')
 
     def update_internal_input_data(self):
+        import dearpygui.dearpygui as dpg
         for pin_info in self._pin_list:
             if pin_info['meta_type'] == PinMetaType.DataIn:
                 pin_value = dpg.get_value(pin_info['pin_instance'].value_tag)
@@ -326,6 +335,8 @@ def update_internal_input_data(self):
     def on_pin_value_change(self, sender):
         # self.is_dirty = True
         self.update_internal_input_data()
+        if self.pin_value_edit_listener is not None:
+            self.pin_value_edit_listener(self)
 
 
 class NodeInstance(BaseNode):
@@ -0,0 +1,206 @@
+"""
+Compiled tools cached by tool content hash, in memory and on disk under LOCALAPPDATA/Intermediate/CompiledTools.
+Disk artifacts are plain JSON data: node run functions are stored as their module name and imported again, so a file
+dropped in the user-writable cache folder cannot run code when a tool opens, unlike a pickle would
+"""
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from importlib import import_module
+from pathlib import Path
+from typing import Tuple, Optional
+
+from core.data_loader import refresh_core_data_with_json_dict
+from core.enum_types import ExecOpCode
+from core.execution_plan import ExecutionPlan, CompiledNode
+from core.executor import get_execution_plan
+from core.tool_file import decode_tool_bytes
+from core.tool_file_cache import get_tool_file_version
+from core.utils import write_file_bytes_atomically
+from libs.constants import COMPILED_TOOLS_DIR
+
+# Bump whenever the stored ExecutionPlan layout changes so stale artifacts are never loaded
+COMPILE_CACHE_FORMAT_VERSION = 2
+MAX_IN_MEMORY_COMPILED_TOOLS = 32
+# Least recently used artifacts are deleted once the disk cache grows past this size
+MAX_COMPILED_TOOLS_DISK_SIZE = 64 * 1024 * 1024
+
+logger = logging.getLogger('')
+# Compiled tools keyed by tool content hash, least recently used first
+compiled_tool_registry = OrderedDict()
+
+
+class CompiledTool:
+    """
+    Execution plan of a tool compiled with the default value of its exposed vars, the actual values being bound
+    per execution with an ExecutionContext
+    """
+    __slots__ = ('plan', 'vars_data', 'node_version_dict')
+
+    def __init__(self, plan: ExecutionPlan, vars_data: dict, node_version_dict: dict):
+        self.plan = plan
+        # Vars as stored in the .mtool file, to check exposed var values without parsing the tool again
+        self.vars_data = vars_data
+        self.node_version_dict = node_version_dict
+
+
+def load_compiled_tool(tool_path: Path) -> Tuple[Tuple[int, str], Optional[CompiledTool]]:
+    """
+    Get the compiled tool from memory, then from the disk cache, compiling it only if the tool content changed.
+    Disk artifacts are also discarded when any of its node modules changed version
+
+    :param tool_path: path to the .mtool file
+    :return: return code and message, and the compiled tool if succeeded
+    """
+    # Unchanged tool files are neither read nor hashed again
+    tool_file_version = get_tool_file_version(tool_path)
+    content_hash = get_compiled_tool_key(tool_file_version.content_hash)
+    compiled_tool = compiled_tool_registry.get(content_hash, None)
+    if compiled_tool is None:
+        compiled_tool = _load_compiled_tool_from_disk(content_hash)
+    if compiled_tool is None:
+        # Decoded again rather than shared, loading the graph for execution modifies the tool data
+        return_message, compiled_tool = compile_tool(decode_tool_bytes(tool_file_version.tool_bytes))
+        if compiled_tool is None:
+            return return_message, None
+        _save_compiled_tool_to_disk(content_hash, compiled_tool)
+    _register_compiled_tool(content_hash, compiled_tool)
+    return (1, ''), compiled_tool
+
+
+def get_compiled_tool_key(tool_content_hash: str) -> str:
+    return hashlib.blake2b((tool_content_hash + str(COMPILE_CACHE_FORMAT_VERSION)).encode(),
+                           digest_size=16).hexdigest()
+
+
+def compile_tool(tool_data: dict) -> Tuple[Tuple[int, str], Optional[CompiledTool]]:
+    return_message = refresh_core_data_with_json_dict(tool_data, {}, is_checking_regex=False)
+    if return_message[0] != 1:
+        return return_message, None
+    plan = get_execution_plan()
+    node_version_dict = {}
+    for node_info in tool_data['nodes']:
+        if node_info['uuid'] in plan.node_slot_dict:
+            node_version_dict[node_info['import_path']] = _get_node_module_version(node_info['import_path'])
+    return return_message, CompiledTool(plan, tool_data['vars'], node_version_dict)
+
+
+def _get_node_module_version(import_path: str) -> str:
+    return getattr(import_module(import_path).Node, 'ver', '')
+
+
+def _register_compiled_tool(content_hash: str, compiled_tool: CompiledTool):
+    compiled_tool_registry[content_hash] = compiled_tool
+    compiled_tool_registry.move_to_end(content_hash)
+    while len(compiled_tool_registry) > MAX_IN_MEMORY_COMPILED_TOOLS:
+        compiled_tool_registry.popitem(last=False)
+
+
+def _get_compiled_tool_file_path(content_hash: str) -> Path:
+    return COMPILED_TOOLS_DIR / (content_hash + '.json')
+
+
+def _load_compiled_tool_from_disk(content_hash: str) -> Optional[CompiledTool]:
+    file_path = _get_compiled_tool_file_path(content_hash)
+    if not file_path.exists():
+        return None
+    try:
+        with open(file_path, 'rb') as fp:
+            compiled_tool_dict = json.load(fp)
+        for import_path, node_version in compiled_tool_dict['node_version_dict'].items():
+            if _get_node_module_version(import_path) != node_version:
+                logger.debug(f'Discarded compiled tool {content_hash}, {import_path} changed version')
+                return None
+        compiled_tool = _construct_compiled_tool_from_dict(compiled_tool_dict)
+        # Mark it as recently used, so pruning deletes the other artifacts first
+        os.utime(file_path)
+    except Exception:
+        # Unreadable or referencing nodes that no longer exist, it will simply be compiled again
+        logger.debug(f'Discarded unreadable compiled tool {content_hash}', exc_info=True)
+        return None
+    return compiled_tool
+
+
+def _save_compiled_tool_to_disk(content_hash: str, compiled_tool: CompiledTool):
+    file_path = _get_compiled_tool_file_path(content_hash)
+    try:
+        compiled_tool_bytes = json.dumps(_construct_dict_from_compiled_tool(compiled_tool)).encode()
+        COMPILED_TOOLS_DIR.mkdir(parents=True, exist_ok=True)
+        write_file_bytes_atomically(file_path, compiled_tool_bytes)
+        _prune_compiled_tools_on_disk()
+    except (OSError, TypeError, ValueError):
+        # Caching is only an optimization, the freshly compiled tool is still used, e.g. when a pin holds a value
+        # JSON cannot store
+        logger.warning(f'Could not cache compiled tool to {file_path}', exc_info=True)
+
+
+def _prune_compiled_tools_on_disk():
+    """Delete the least recently used artifacts, by modification time, beyond MAX_COMPILED_TOOLS_DISK_SIZE"""
+    file_stat_list = []
+    for file_path in COMPILED_TOOLS_DIR.iterdir():
+        # Temp files are still being written by another process
+        if file_path.suffix == '.tmp':
+            continue
+        try:
+            file_stat_list.append((file_path.stat(), file_path))
+        except FileNotFoundError:
+            continue
+    file_stat_list.sort(key=lambda file_stat: file_stat[0].st_mtime_ns, reverse=True)
+    total_size = 0
+    for file_stat, file_path in file_stat_list:
+        total_size += file_stat.st_size
+        # Artifacts of the previous formats are never loaded anymore
+        if total_size <= MAX_COMPILED_TOOLS_DISK_SIZE and file_path.suffix == '.json':
+            continue
+        try:
+            file_path.unlink()
+        except OSError:
+            # Being read by another process, it will be pruned next time
+            logger.debug(f'Could not prune compiled tool {file_path}', exc_info=True)
+
+
+def _construct_dict_from_compiled_tool(compiled_tool: CompiledTool) -> dict:
+    plan = compiled_tool.plan
+    compiled_node_dict_list = []
+    for compiled_node in plan.compiled_node_list:
+        compiled_node_dict = {attribute: getattr(compiled_node, attribute) for attribute in CompiledNode.__slots__}
+        compiled_node_dict['run'] = compiled_node.run.__module__
+        # Shared with the Get/Set nodes of the same var, stored once in the default var values
+        compiled_node_dict['default_internal_data'] = {
+            key: value for key, value in compiled_node.default_internal_data.items() if key != 'var_value'}
+        compiled_node_dict_list.append(compiled_node_dict)
+    return {
+        'node_version_dict': compiled_tool.node_version_dict,
+        'vars_data': compiled_tool.vars_data,
+        'compiled_node_list': compiled_node_dict_list,
+        'node_slot_dict': plan.node_slot_dict,
+        'event_entry_slot_dict': plan.event_entry_slot_dict,
+        'initial_value_list': plan.initial_value_list,
+        # JSON object keys are strings, the integer value slots are stored as pairs
+        'value_consumer_slot_list': list(plan.value_consumer_slot_dict.items()),
+        'default_var_value_dict': plan.default_var_value_dict
+    }
+
+
+def _construct_compiled_tool_from_dict(compiled_tool_dict: dict) -> CompiledTool:
+    plan = ExecutionPlan()
+    plan.node_slot_dict = compiled_tool_dict['node_slot_dict']
+    plan.event_entry_slot_dict = compiled_tool_dict['event_entry_slot_dict']
+    plan.initial_value_list = compiled_tool_dict['initial_value_list']
+    plan.value_consumer_slot_dict = {value_slot: consumer_slot_list for value_slot, consumer_slot_list
+                                     in compiled_tool_dict['value_consumer_slot_list']}
+    plan.default_var_value_dict = compiled_tool_dict['default_var_value_dict']
+    for compiled_node_dict in compiled_tool_dict['compiled_node_list']:
+        compiled_node = CompiledNode.__new__(CompiledNode)
+        for attribute in CompiledNode.__slots__:
+            setattr(compiled_node, attribute, compiled_node_dict[attribute])
+        compiled_node.op_code = ExecOpCode(compiled_node.op_code)
+        compiled_node.run = import_module(compiled_node.run).Node.run
+        compiled_node.input_slot_list = [tuple(input_slot) for input_slot in compiled_node.input_slot_list]
+        compiled_node.output_slot_list = [tuple(output_slot) for output_slot in compiled_node.output_slot_list]
+        if compiled_node.var_name is not None:
+            compiled_node.default_internal_data['var_value'] = plan.default_var_value_dict[compiled_node.var_name]
+        plan.compiled_node_list.append(compiled_node)
+    return CompiledTool(plan, compiled_tool_dict['vars_data'], compiled_tool_dict['node_version_dict'])
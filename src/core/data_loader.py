@@ -2,10 +2,8 @@
 from importlib import import_module
 from copy import deepcopy
 from core.utils import extract_var_name_from_node_info, is_var_type_of_string_based
-from typing import Tuple, List
-import dearpygui.dearpygui as dpg
+from typing import Tuple, List, Optional
 import re
-from tkinter import Tk, messagebox
 from traceback import format_exc
 
 nodes_data = {}
@@ -14,15 +12,41 @@
 node_list = []
 data_link_list = []
 flow_link_list = []
-
-
-def refresh_core_data_with_json_dict(json_dict: dict):
+# Lookup indexes compiled once per refresh so link resolution does not need to scan the node list
+node_index_dict = {}
+pin_index_dict = {}
+data_link_by_destination_pin_dict = {}
+flow_link_by_source_pin_dict = {}
+# Bumped on every refresh so compiled execution plans know when they are stale
+graph_revision = [0]
+# Exposed var values given by the caller instead of the user input boxes, None when running from the UI
+exposed_var_value_dict: Optional[dict] = None
+is_checking_exposed_var_regex = True
+
+
+def refresh_core_data_with_json_dict(json_dict: dict, exposed_var_values: Optional[dict] = None,
+                                     is_checking_regex: bool = True):
+    """
+    Load a tool graph for execution
+
+    :param json_dict: tool data as saved in the .mtool file
+    :param exposed_var_values: values of exposed vars keyed by var name, used instead of the UI user input boxes.
+    Exposed vars missing from it fall back to their default value
+    :param is_checking_regex: whether exposed string vars must match their regex, disable it when the values are
+    bound and checked per execution instead
+    :return: return code and message
+    """
+    global exposed_var_value_dict, is_checking_exposed_var_regex
+    graph_revision[0] += 1
+    exposed_var_value_dict = exposed_var_values
+    is_checking_exposed_var_regex = is_checking_regex
     _clear_all_data()
     _load_json_node_dict(json_dict)
     _load_events_data(json_dict)
     _load_data_link_list(json_dict)
     _load_flow_link_list(json_dict)
     _load_vars_data(json_dict)
+    _compile_graph_indexes()
     try:
         _load_nodes_data()
     except ValueError:
@@ -38,6 +62,10 @@ def _clear_all_data():
     node_list.clear()
     data_link_list.clear()
     flow_link_list.clear()
+    node_index_dict.clear()
+    pin_index_dict.clear()
+    data_link_by_destination_pin_dict.clear()
+    flow_link_by_source_pin_dict.clear()
 
 
 def _load_json_node_dict(json_dict: dict):
@@ -79,34 +107,69 @@ def _restructure_imported_vars_data(json_dict: dict) -> dict:
     return restructured_vars_dict
 
 
-def _load_nodes_data():
-    for first_exec_node_tag in list(events_data.values()):
-        for node_index, node_info in enumerate(node_list):
-            if node_info['uuid'] == first_exec_node_tag:
-                _propagate_construct_nodes(node_index)
+def _compile_graph_indexes():
+    """
+    Build the hash indexes used to resolve links in a single pass over nodes, pins and links.
+    The first occurrence wins to stay consistent with the previous linear lookups
+    """
+    for node_index, node_info in enumerate(node_list):
+        node_index_dict.setdefault(node_info['uuid'], node_index)
+        for pin_index, pin_info in enumerate(node_info['pins']):
+            pin_index_dict.setdefault(pin_info['uuid'], (node_index, pin_index))
+    for data_link in data_link_list:
+        data_link_by_destination_pin_dict.setdefault(data_link[1], data_link)
+    for flow_link in flow_link_list:
+        flow_link_by_source_pin_dict.setdefault(flow_link[0], flow_link)
 
 
-def _propagate_construct_nodes(node_index: int):
-    _propagate_preceding_nodes_connection_info(node_index)
-    following_node_index_list = _get_following_exec_node_and_update_connection_data(node_index)
-    for following_node_index in following_node_index_list:
-        _propagate_construct_nodes(following_node_index)
+def _load_nodes_data():
+    visited_node_index_set = set()
+    for first_exec_node_tag in list(events_data.values()):
+        node_index = node_index_dict.get(first_exec_node_tag, None)
+        if node_index is None:
+            continue
+        _propagate_construct_nodes(node_index, visited_node_index_set)
 
 
-def _propagate_preceding_nodes_connection_info(node_index: int):
-    for pin_index, pin_info in enumerate(_get_pin_list_of_node(node_index)):
-        if not _is_data_input_pin_type(pin_info['meta_type']):
-            continue
-        preceding_node_index, preceding_pin_index = _get_source_node_and_pin_index_dataLinked_to_pin(
-            _get_pin_info_in_node_list(node_index, pin_index))
-        if preceding_node_index == -1:
-            _set_pin_unconnected(node_index, pin_index)
-            continue
-        _update_connected_data_to_pins_couple(node_index, preceding_node_index, pin_index, preceding_pin_index)
-        if _is_process_node(preceding_node_index):
+def _propagate_construct_nodes(first_node_index: int, visited_node_index_set: set):
+    # Walk the flow chain with an explicit stack so long chains do not hit the recursion limit
+    node_index_stack = [first_node_index]
+    while node_index_stack:
+        node_index = node_index_stack.pop()
+        if node_index in visited_node_index_set:
             continue
-        _propagate_preceding_nodes_connection_info(preceding_node_index)
-    _construct_and_update_node_info(node_index)
+        visited_node_index_set.add(node_index)
+        _propagate_preceding_nodes_connection_info(node_index, visited_node_index_set)
+        following_node_index_list = _get_following_exec_node_and_update_connection_data(node_index)
+        node_index_stack.extend(reversed(following_node_index_list))
+
+
+def _propagate_preceding_nodes_connection_info(first_node_index: int, visited_node_index_set: set):
+    # Post-order walk over the data predecessors with an explicit stack so long chains of pure nodes do not hit the
+    # recursion limit. Each entry holds a node and the position of the next pin to resolve
+    node_pin_index_stack = [(first_node_index, 0)]
+    while node_pin_index_stack:
+        node_index, pin_index = node_pin_index_stack.pop()
+        pin_list = _get_pin_list_of_node(node_index)
+        while pin_index < len(pin_list):
+            pin_info = pin_list[pin_index]
+            pin_index += 1
+            if not _is_data_input_pin_type(pin_info['meta_type']):
+                continue
+            preceding_node_index, preceding_pin_index = _get_source_node_and_pin_index_dataLinked_to_pin(pin_info)
+            if preceding_node_index == -1:
+                _set_pin_unconnected(node_index, pin_index - 1)
+                continue
+            _update_connected_data_to_pins_couple(node_index, preceding_node_index, pin_index - 1,
+                                                  preceding_pin_index)
+            if _is_process_node(preceding_node_index) or preceding_node_index in visited_node_index_set:
+                continue
+            visited_node_index_set.add(preceding_node_index)
+            node_pin_index_stack.append((node_index, pin_index))
+            node_pin_index_stack.append((preceding_node_index, 0))
+            break
+        else:
+            _construct_and_update_node_info(node_index)
 
 
 def _is_data_input_pin_type(pin_type: PinMetaType) -> bool:
@@ -126,16 +189,11 @@ def _get_source_node_and_pin_index_dataLinked_to_pin(pin_info: dict) -> Tuple[in
 
 
 def _get_data_link_connected_to_destination_pin(destination_pin_id):
-    for data_link in data_link_list:
-        if data_link[1] == destination_pin_id:
-            return data_link
+    return data_link_by_destination_pin_dict.get(destination_pin_id, None)
 
 
 def _get_source_node_index_in_data_link(data_link: dict) -> Tuple[int, int]:
-    for source_node_index, source_node_info in enumerate(node_list):
-        for source_pin_index, pin_info in enumerate(source_node_info['pins']):
-            if pin_info['uuid'] == data_link[0]:
-                return source_node_index, source_pin_index
+    return pin_index_dict.get(data_link[0], (None, None))
 
 
 def _update_connected_data_to_pins_couple(source_node_index: int, destination_node_index: int,
@@ -228,13 +286,41 @@ def _get_var_value_from_user_input_and_terminate_if_regex_fails(var_name: str):
     :return:
     """
     var_info = vars_data[var_name]
-    user_input_value = dpg.get_value(var_info['user_input_box_tag'])
-    if is_var_type_of_string_based(var_info['type'][0]):
-        if not _is_full_match_regex(user_input_value, var_info['regex'][0]):
-            warn_user_of_incorrect_input_and_terminate(var_name)
+    if exposed_var_value_dict is None:
+        import dearpygui.dearpygui as dpg
+        user_input_value = dpg.get_value(var_info['user_input_box_tag'])
+    else:
+        user_input_value = exposed_var_value_dict.get(var_name, var_info['default_value'][0])
+    if is_checking_exposed_var_regex and not _is_var_value_valid(var_info, user_input_value):
+        warn_user_of_incorrect_input_and_terminate(var_name)
     return user_input_value
 
 
+def get_invalid_exposed_var_names(tool_vars_data: dict, exposed_var_values: dict) -> List[str]:
+    """
+    Check exposed var values against their regex without loading the graph
+
+    :param tool_vars_data: vars of the tool as saved in the .mtool file
+    :param exposed_var_values: values of exposed vars keyed by var name, missing ones use their default value
+    :return: names of the exposed vars whose value is invalid
+    """
+    invalid_var_name_list = []
+    for var_info in tool_vars_data.values():
+        if not var_info['is_exposed'][0]:
+            continue
+        var_name = var_info['name'][0]
+        if not _is_var_value_valid(var_info, exposed_var_values.get(var_name, var_info['default_value'][0])):
+            invalid_var_name_list.append(var_name)
+    return invalid_var_name_list
+
+
+def _is_var_value_valid(var_info: dict, value) -> bool:
+    if is_var_type_of_string_based(var_info['type'][0]):
+        # Values coming from batch tables or JSON files may not be strings at all
+        return isinstance(value, str) and _is_full_match_regex(value, var_info['regex'][0])
+    return True
+
+
 def _is_full_match_regex(to_check_string: str, regex: str) -> bool:
     pattern = re.compile(regex)
     match_object = re.fullmatch(pattern, to_check_string)
@@ -243,11 +329,17 @@ def _is_full_match_regex(to_check_string: str, regex: str) -> bool:
     return False
 
 
-def warn_user_of_incorrect_input_and_terminate(var_name: str):
+def warn_user_of_incorrect_input(var_name: str):
+    from tkinter import Tk, messagebox
     root = Tk()
     root.withdraw()
     messagebox.showerror('Execution Error', f'Incorrect input value for {var_name}')
     root.destroy()
+
+
+def warn_user_of_incorrect_input_and_terminate(var_name: str):
+    if exposed_var_value_dict is None:
+        warn_user_of_incorrect_input(var_name)
     raise ValueError(f'Incorrect input value for {var_name}')
 
 
@@ -276,16 +368,11 @@ def _get_destination_node_and_pin_index_flowLinked_to_pin(pin_info: dict) -> Tup
 
 
 def _get_flow_link_connected_to_source_pin(source_pin_id):
-    for flow_link in flow_link_list:
-        if flow_link[0] == source_pin_id:
-            return flow_link
+    return flow_link_by_source_pin_dict.get(source_pin_id, None)
 
 
 def _get_destination_node_index_in_flow_link(flow_link: dict) -> Tuple[int, int]:
-    for destination_node_index, destination_node_info in enumerate(node_list):
-        for destination_pin_index, pin_info in enumerate(destination_node_info['pins']):
-            if pin_info['uuid'] == flow_link[1]:
-                return destination_node_index, destination_pin_index
+    return pin_index_dict.get(flow_link[1], (None, None))
 
 
 def _update_pin_connected_to_following_node(this_pin_info: dict, following_node_uuid: str):
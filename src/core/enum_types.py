@@ -1,5 +1,4 @@
 from enum import IntFlag, IntEnum, auto, Enum
-import dearpygui.dearpygui as dpg
 
 
 class NodeTypeFlag(IntFlag):
@@ -51,6 +50,19 @@ class PinMetaType(IntEnum):
     FlowOut = auto()
 
 
+class ExecOpCode(IntEnum):
+    """Instruction kinds of a compiled execution plan"""
+    Inert = auto()
+    Pure = auto()
+    Blueprint = auto()
+    SetVariable = auto()
+    Branch = auto()
+    DoN = auto()
+    ForEachLoop = auto()
+    Sequence = auto()
+    Sequential = auto()
+
+
 class CombinationKeyboardInput(Enum):
     CtrlShift = auto()
     CtrlAlt = auto()
@@ -0,0 +1,58 @@
+"""
+Resources held for the run of an event, e.g. pooled Perforce connections, released once the event is done
+"""
+import contextlib
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Callable, Optional, Any
+
+logger = logging.getLogger('')
+# (key, thread id) -> (resource, release function) of the event run by the current context
+_event_resource_dict: ContextVar[Optional[dict]] = ContextVar('event_resource_dict', default=None)
+_event_resource_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def event_scope():
+    """
+    Hold the resources got with get_event_resource until the block exits, then release them in reverse order
+    """
+    resource_dict = {}
+    token = _event_resource_dict.set(resource_dict)
+    try:
+        yield
+    finally:
+        _event_resource_dict.reset(token)
+        with _event_resource_lock:
+            resource_list = list(resource_dict.values())
+            resource_dict.clear()
+        for resource, release in reversed(resource_list):
+            try:
+                release(resource)
+            except Exception:
+                logger.warning('Could not release a resource of the event', exc_info=True)
+
+
+def get_event_resource(key, acquire: Callable[[], Any], release: Callable[[Any], None]) -> Optional[Any]:
+    """
+    Get the resource of key held by the current event for the calling thread, acquiring it on first use. Threads
+    computing nodes of the same event get their own resource, so it is never used concurrently
+
+    :param key: hashable key of the resource
+    :param acquire: called without argument to get the resource
+    :param release: called with the resource when the event ends
+    :return: resource, None when no event is running in the current context
+    """
+    resource_dict = _event_resource_dict.get()
+    if resource_dict is None:
+        return None
+    key = (key, threading.get_ident())
+    with _event_resource_lock:
+        entry = resource_dict.get(key, None)
+    if entry is None:
+        # Only the calling thread adds this key, so acquiring outside the lock cannot race
+        entry = (acquire(), release)
+        with _event_resource_lock:
+            resource_dict[key] = entry
+    return entry[0]
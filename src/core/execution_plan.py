@@ -0,0 +1,253 @@
+from copy import deepcopy
+from core.enum_types import NodeTypeFlag, PinMetaType, ExecOpCode
+from typing import List, Tuple, Dict, Optional
+
+SEQUENTIAL_OP_CODE_DICT = {
+    'Branch': ExecOpCode.Branch,
+    'Do N': ExecOpCode.DoN,
+    'For each loop': ExecOpCode.ForEachLoop,
+    'Sequence': ExecOpCode.Sequence
+}
+UNCONNECTED_SLOT = -1
+
+
+class CompiledNode:
+    """
+    A node lowered to integer slots so the executor does not need to walk nodes_data dicts at runtime
+
+    flow_successor_list layout depends on the op code:
+    Blueprint/SetVariable: [next], Branch: [true, false], Do N: [body], For each loop: [body, completed],
+    Sequence: every connected Then pin in order. Unconnected entries are UNCONNECTED_SLOT
+    """
+    __slots__ = ('slot', 'tag', 'label', 'op_code', 'run', 'default_internal_data', 'var_name',
+                 'is_computable', 'is_rerun_when_clean', 'is_backward_computable',
+                 'input_slot_list', 'output_slot_list', 'predecessor_list', 'flow_successor_list',
+                 'dirty_successor_list', 'index_value_slot', 'element_value_slot')
+
+    def __init__(self, slot: int, tag: str, node_info: dict):
+        node_type = node_info['type']
+        self.slot = slot
+        self.tag = tag
+        self.label = node_info['label']
+        self.op_code = _get_op_code(node_type, self.label)
+        self.run = node_info['run']
+        # Never mutated at runtime, every execution context works on its own copy
+        self.default_internal_data = node_info['internal_data']
+        self.var_name = self.default_internal_data.get('var_name', None)
+        self.is_computable = bool(node_type & NodeTypeFlag.Pure)
+        self.is_rerun_when_clean = node_type == NodeTypeFlag.Blueprint or node_type == NodeTypeFlag.Sequential
+        self.is_backward_computable = node_type == NodeTypeFlag.Pure or node_type == NodeTypeFlag.GetVariable
+        self.input_slot_list: List[Tuple[str, int]] = []
+        self.output_slot_list: List[Tuple[str, int]] = []
+        self.predecessor_list: List[int] = []
+        self.flow_successor_list: List[int] = []
+        self.dirty_successor_list: List[int] = []
+        self.index_value_slot = UNCONNECTED_SLOT
+        self.element_value_slot = UNCONNECTED_SLOT
+
+
+class ExecutionPlan:
+    """
+    Compiled form of the loaded node graph, shared by every execution until the graph is refreshed
+
+    value_consumer_slot_dict maps an output pin value slot to the slots of every node reading it.
+    default_var_value_dict maps a var name to the value list shared by its Get/Set nodes at load time
+    """
+    __slots__ = ('compiled_node_list', 'node_slot_dict', 'event_entry_slot_dict', 'initial_value_list',
+                 'value_consumer_slot_dict', 'default_var_value_dict')
+
+    def __init__(self):
+        self.compiled_node_list: List[CompiledNode] = []
+        self.node_slot_dict = {}
+        self.event_entry_slot_dict = {}
+        self.initial_value_list = []
+        self.value_consumer_slot_dict: Dict[int, List[int]] = {}
+        self.default_var_value_dict: Dict[str, list] = {}
+
+
+class ExecutionContext:
+    """
+    Per-run graph instance of an execution plan. It owns the node states, node internal data and var store of
+    a single event run, so several events can run concurrently on the same plan
+
+    clean_var_node_slot_dict keeps, per var name, the var nodes computed since that var was last set,
+    so setting a var only has to invalidate those
+    """
+    __slots__ = ('dirty_flag_list', 'value_list', 'clean_var_node_slot_dict', 'var_value_dict',
+                 'internal_data_list')
+
+    def __init__(self, plan: ExecutionPlan, var_values: Optional[dict] = None):
+        """
+        :param plan: execution plan to instantiate
+        :param var_values: values keyed by var name overriding the ones bound when the graph was loaded
+        """
+        self.dirty_flag_list = [True] * len(plan.compiled_node_list)
+        self.value_list = [_copy_value(value) for value in plan.initial_value_list]
+        self.clean_var_node_slot_dict: Dict[str, List[int]] = {}
+        self.var_value_dict = {var_name: [_copy_value(value) for value in var_value]
+                               for var_name, var_value in plan.default_var_value_dict.items()}
+        if var_values:
+            for var_name, var_value in var_values.items():
+                if var_name in self.var_value_dict:
+                    self.var_value_dict[var_name][0] = _copy_value(var_value)
+        self.internal_data_list = [self._copy_internal_data(compiled_node)
+                                   for compiled_node in plan.compiled_node_list]
+
+    def _copy_internal_data(self, compiled_node: CompiledNode) -> dict:
+        internal_data = {key: _copy_value(value) for key, value in compiled_node.default_internal_data.items()}
+        if compiled_node.var_name is not None:
+            # Get/Set nodes of the same var share the value list of this run only
+            internal_data['var_value'] = self.var_value_dict[compiled_node.var_name]
+        return internal_data
+
+
+def _copy_value(value):
+    """
+    Copy the containers, e.g. String Array and Json values, so a node mutating them in place only affects its own
+    run. Other values are immutable or objects such as Perforce instances, which are shared as they are
+    """
+    if isinstance(value, (list, dict, set)):
+        return deepcopy(value)
+    return value
+
+
+def _get_op_code(node_type: NodeTypeFlag, node_label: str) -> ExecOpCode:
+    if node_type == NodeTypeFlag.Sequential:
+        return SEQUENTIAL_OP_CODE_DICT.get(node_label, ExecOpCode.Sequential)
+    if node_type == NodeTypeFlag.Blueprint:
+        return ExecOpCode.Blueprint
+    if node_type == NodeTypeFlag.SetVariable:
+        return ExecOpCode.SetVariable
+    if node_type & NodeTypeFlag.Pure:
+        return ExecOpCode.Pure
+    return ExecOpCode.Inert
+
+
+def compile_execution_plan(nodes_data: dict, events_data: dict) -> ExecutionPlan:
+    """
+    Lower the loaded nodes data into an execution plan with pre-resolved pin value slots,
+    flow successors, data predecessors and downstream data consumers
+
+    :param nodes_data: nodes data constructed by the data loader
+    :param events_data: mapping of event node tag to its first connected node tag
+    :return: compiled execution plan
+    """
+    plan = ExecutionPlan()
+    for slot, (node_tag, node_info) in enumerate(nodes_data.items()):
+        plan.compiled_node_list.append(CompiledNode(slot, node_tag, node_info))
+        plan.node_slot_dict[node_tag] = slot
+        _register_default_var_value(plan, plan.compiled_node_list[slot])
+    pin_value_slot_dict = _allocate_pin_value_slots(plan, nodes_data)
+    for compiled_node in plan.compiled_node_list:
+        pin_list = nodes_data[compiled_node.tag]['pins']
+        _compile_data_pins(plan, compiled_node, pin_list, pin_value_slot_dict)
+        _compile_flow_pins(plan, compiled_node, pin_list)
+        _compile_loop_value_slots(compiled_node, pin_list, pin_value_slot_dict)
+    for event_tag, first_node_tag in events_data.items():
+        entry_slot = plan.node_slot_dict.get(first_node_tag, None)
+        if entry_slot is not None:
+            plan.event_entry_slot_dict[event_tag] = entry_slot
+    return plan
+
+
+def _register_default_var_value(plan: ExecutionPlan, compiled_node: CompiledNode):
+    if compiled_node.var_name is not None:
+        plan.default_var_value_dict.setdefault(compiled_node.var_name,
+                                               compiled_node.default_internal_data['var_value'])
+
+
+def _allocate_pin_value_slots(plan: ExecutionPlan, nodes_data: dict) -> dict:
+    """
+    Give every output pin and unconnected input pin its own value slot. Connected input pins are resolved later
+    to their source pin slot so no value copying is needed at runtime
+    """
+    pin_value_slot_dict = {}
+    for node_info in nodes_data.values():
+        for pin_info in node_info['pins']:
+            if pin_info['meta_type'] == PinMetaType.DataOut:
+                initial_value = pin_info.get('value', pin_info.get('default_value', None))
+            elif pin_info['meta_type'] == PinMetaType.DataIn and not pin_info.get('is_connected', False):
+                initial_value = pin_info.get('value', None)
+            else:
+                continue
+            pin_value_slot_dict[pin_info['uuid']] = len(plan.initial_value_list)
+            plan.initial_value_list.append(initial_value)
+    return pin_value_slot_dict
+
+
+def _compile_data_pins(plan: ExecutionPlan, compiled_node: CompiledNode, pin_list: list,
+                       pin_value_slot_dict: dict):
+    for pin_info in pin_list:
+        if pin_info['meta_type'] == PinMetaType.DataOut:
+            compiled_node.output_slot_list.append((pin_info['label'], pin_value_slot_dict[pin_info['uuid']]))
+        elif pin_info['meta_type'] == PinMetaType.DataIn:
+            if not pin_info.get('is_connected', False):
+                compiled_node.input_slot_list.append((pin_info['label'], pin_value_slot_dict[pin_info['uuid']]))
+                continue
+            source_value_slot = pin_value_slot_dict.get(pin_info['connected_to_pin'], None)
+            preceding_slot = plan.node_slot_dict.get(pin_info['connected_to_node'], None)
+            if source_value_slot is None or preceding_slot is None:
+                raise Exception(f'Could not find preceding pin info matched with {pin_info["uuid"]}')
+            compiled_node.input_slot_list.append((pin_info['label'], source_value_slot))
+            _add_data_consumer(plan, preceding_slot, source_value_slot, compiled_node.slot)
+            if plan.compiled_node_list[preceding_slot].is_backward_computable and \
+                preceding_slot not in compiled_node.predecessor_list:
+                compiled_node.predecessor_list.append(preceding_slot)
+
+
+def _compile_flow_pins(plan: ExecutionPlan, compiled_node: CompiledNode, pin_list: list):
+    flow_out_pin_list = [pin_info for pin_info in pin_list if pin_info['meta_type'] == PinMetaType.FlowOut]
+    op_code = compiled_node.op_code
+    if op_code == ExecOpCode.Branch:
+        compiled_node.flow_successor_list = [_get_flow_successor_slot_by_label(plan, flow_out_pin_list, 'True'),
+                                             _get_flow_successor_slot_by_label(plan, flow_out_pin_list, 'False')]
+    elif op_code == ExecOpCode.ForEachLoop:
+        compiled_node.flow_successor_list = [_get_flow_successor_slot_by_label(plan, flow_out_pin_list, 'Loop Body'),
+                                             _get_flow_successor_slot_by_label(plan, flow_out_pin_list, 'Completed')]
+    elif op_code == ExecOpCode.Sequence:
+        successor_slot_list = [_get_flow_successor_slot(plan, pin_info) for pin_info in flow_out_pin_list]
+        compiled_node.flow_successor_list = [successor_slot for successor_slot in successor_slot_list
+                                             if successor_slot != UNCONNECTED_SLOT]
+    elif op_code in (ExecOpCode.Blueprint, ExecOpCode.SetVariable, ExecOpCode.DoN):
+        compiled_node.flow_successor_list = [UNCONNECTED_SLOT]
+        for pin_info in flow_out_pin_list:
+            successor_slot = _get_flow_successor_slot(plan, pin_info)
+            if successor_slot != UNCONNECTED_SLOT:
+                compiled_node.flow_successor_list[0] = successor_slot
+                break
+
+
+def _get_flow_successor_slot_by_label(plan: ExecutionPlan, flow_out_pin_list: list, pin_label: str) -> int:
+    for pin_info in flow_out_pin_list:
+        if pin_info['label'] == pin_label and pin_info.get('is_connected', False):
+            return _get_flow_successor_slot(plan, pin_info)
+    return UNCONNECTED_SLOT
+
+
+def _get_flow_successor_slot(plan: ExecutionPlan, pin_info: dict) -> int:
+    if not pin_info.get('is_connected', False):
+        return UNCONNECTED_SLOT
+    return plan.node_slot_dict.get(pin_info['connected_to_node'], UNCONNECTED_SLOT)
+
+
+def _compile_loop_value_slots(compiled_node: CompiledNode, pin_list: list, pin_value_slot_dict: dict):
+    if compiled_node.op_code not in (ExecOpCode.DoN, ExecOpCode.ForEachLoop):
+        return
+    for pin_info in pin_list:
+        if 'Index' in pin_info['label'] and compiled_node.index_value_slot == UNCONNECTED_SLOT:
+            compiled_node.index_value_slot = pin_value_slot_dict.get(pin_info['uuid'], UNCONNECTED_SLOT)
+        elif pin_info['label'] == 'Array Str Element':
+            compiled_node.element_value_slot = pin_value_slot_dict.get(pin_info['uuid'], UNCONNECTED_SLOT)
+
+
+def _add_data_consumer(plan: ExecutionPlan, preceding_slot: int, source_value_slot: int, consumer_slot: int):
+    """
+    Record the fan-out of an output pin. Consumers are compiled in slot order, so checking the last entry is
+    enough to keep both lists free of duplicates
+    """
+    consumer_slot_list = plan.value_consumer_slot_dict.setdefault(source_value_slot, [])
+    if not consumer_slot_list or consumer_slot_list[-1] != consumer_slot:
+        consumer_slot_list.append(consumer_slot)
+    dirty_successor_list = plan.compiled_node_list[preceding_slot].dirty_successor_list
+    if not dirty_successor_list or dirty_successor_list[-1] != consumer_slot:
+        dirty_successor_list.append(consumer_slot)
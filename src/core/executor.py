@@ -1,13 +1,24 @@
 import logging
+from contextvars import copy_context
+from itertools import chain, repeat
+from multiprocessing.pool import ThreadPool
+from threading import Lock
 from time import perf_counter
-from core.enum_types import OutputPinType
-from core.utils import create_queueHandler_logger, start_timer, stop_timer_and_get_elapsed_time
-from core.data_loader import nodes_data, events_data
-from core.enum_types import PinMetaType, NodeTypeFlag
-from typing import Tuple
+from core.utils import create_queueHandler_logger
+from core.data_loader import nodes_data, events_data, graph_revision
+from core.enum_types import ExecOpCode
+from core.event_scope import event_scope
+from core.execution_plan import ExecutionPlan, ExecutionContext, CompiledNode, compile_execution_plan, \
+    UNCONNECTED_SLOT
+from typing import Tuple, Iterator, List, Optional, Callable
 
 logger = logging.getLogger('')
 is_debug_mode = False
+# Compiled plan of the currently loaded graph, keyed by the data loader graph revision
+execution_plan_registry = {}
+execution_plan_lock = Lock()
+# Opt-in pool computing independent dirty Pure predecessors concurrently, None runs them one after another
+parallel_thread_pool: Optional[ThreadPool] = None
 
 
 def setup_executor_logger(logger_queue, debug_mode: bool):
@@ -16,316 +27,336 @@ def setup_executor_logger(logger_queue, debug_mode: bool):
     logger = create_queueHandler_logger(__name__, logger_queue, is_debug_mode)
 
 
-def execute_event(event_node_tag: str, ) -> Tuple[int, str]:
-    preprocess_execute_event()
-    start_timer()
+def setup_executor_parallel_mode(worker_count: int):
+    """
+    Enable or disable the parallel evaluation of independent Pure predecessors
+
+    :param worker_count: number of worker threads, 0 or 1 keeps the sequential evaluation
+    """
+    global parallel_thread_pool
+    if parallel_thread_pool is not None:
+        parallel_thread_pool.close()
+        parallel_thread_pool = None
+    if worker_count > 1:
+        parallel_thread_pool = ThreadPool(worker_count)
+
+
+def execute_event(event_node_tag: str, plan: Optional[ExecutionPlan] = None,
+                  context: Optional[ExecutionContext] = None) -> Tuple[int, str]:
+    """
+    Run an event in its own execution context, so it can safely run alongside other events
+
+    :param event_node_tag: tag of the event node to execute
+    :param plan: execution plan to run, compile the currently loaded graph if None. Pass the plan compiled right
+    after loading the graph when the event is executed on another thread, as the graph may be reloaded meanwhile
+    :param context: fresh execution context of the plan, for callers binding var values or reading them back
+    after the run. A new one is created if None
+    :return: return code and message
+    """
+    if plan is None:
+        plan = get_execution_plan()
+    start_time = perf_counter()
     logger.info(f'**** Exec event : {event_node_tag} ****')
-    current_node_tag = events_data.get(event_node_tag, None)
-    if not current_node_tag:
+    entry_slot = plan.event_entry_slot_dict.get(event_node_tag, None)
+    if entry_slot is None:
         logger.error('Cannot find the event, this could be due to the event node not connecting to anything!')
         return 0, ''
-    # This will propagate the flow chain until it meets the end (unconnected Exec out)
-    anchors = []
-    if anchors:
-        anchors.clear()
-    forward_propagate_flow(current_node_tag, anchors)
-    flow_control_redirect(anchors)
-    logger.debug(f"Elapsed time for the event {event_node_tag}: {stop_timer_and_get_elapsed_time()} ")
+    if context is None:
+        context = ExecutionContext(plan)
+    # Resources acquired by the nodes, e.g. pooled Perforce connections, are held until the event ends
+    with event_scope():
+        # This will propagate the flow chain until it meets the end (unconnected Exec out)
+        anchors = []
+        forward_propagate_flow(plan, context, entry_slot, anchors)
+        flow_control_redirect(plan, context, anchors)
+    logger.debug(f"Elapsed time for the event {event_node_tag}: {perf_counter() - start_time} ")
     logger.info(f'**** Event {event_node_tag} finished ****')
     return 1, ''
 
 
-def preprocess_execute_event():
-    # Reset all nodes' is_executed flags to False and set them to dirty
-    for node_uuid in nodes_data.keys():
-        nodes_data[node_uuid]['is_dirty'] = True
-        nodes_data[node_uuid]['is_executed'] = False
+def get_execution_plan() -> ExecutionPlan:
+    """
+    Get the execution plan of the loaded graph, compiling it only once per data loader refresh
+    """
+    with execution_plan_lock:
+        revision = graph_revision[0]
+        plan = execution_plan_registry.get(revision, None)
+        if plan is None:
+            execution_plan_registry.clear()
+            plan = compile_execution_plan(nodes_data, events_data)
+            execution_plan_registry[revision] = plan
+        return plan
 
 
-def flow_control_redirect(anchors: list):
+def flow_control_redirect(plan: ExecutionPlan, context: ExecutionContext, anchors: list):
     if not anchors:
         return 0
-    for anchor in anchors:
-        if anchor['this_node_label'] == 'Do N':
-            _set_for_loop_index_value(anchor['this_node_tag'], anchor['index'])
-        elif anchor['this_node_label'] == 'For each loop':
-            _set_for_each_index_and_element(anchor['this_node_tag'], anchor['index'])
+    # Nested anchors are drained depth-first with an explicit stack instead of recursion
+    anchor_iterator_stack = [chain.from_iterable(anchors)]
+    while anchor_iterator_stack:
+        anchor = next(anchor_iterator_stack[-1], None)
+        if anchor is None:
+            anchor_iterator_stack.pop()
+            continue
+        next_slot, loop_slot, index = anchor
+        if loop_slot != UNCONNECTED_SLOT:
+            loop_node = plan.compiled_node_list[loop_slot]
+            if loop_node.op_code == ExecOpCode.DoN:
+                _set_for_loop_index_value(plan, context, loop_node, index)
+            elif loop_node.op_code == ExecOpCode.ForEachLoop:
+                _set_for_each_index_and_element(plan, context, loop_node, index)
         sub_anchors = []
+        forward_propagate_flow(plan, context, next_slot, sub_anchors)
         if sub_anchors:
-            sub_anchors.clear()
-        forward_propagate_flow(anchor['next_node_tag'], sub_anchors)
-        if sub_anchors:
-            flow_control_redirect(sub_anchors)
-
-
-def _set_for_each_index_and_element(node_tag: str, index: int):
-    if not _is_completed_body(node_tag, index):
-        _set_for_loop_index_value(node_tag, index)
-        _set_for_loop_element_value(node_tag, index)
-
+            anchor_iterator_stack.append(chain.from_iterable(sub_anchors))
 
-def _is_completed_body(node_tag: str, index: int) -> bool:
-    return index > len(nodes_data[node_tag]['internal_data']['String Array']) - 1
 
+def _set_for_each_index_and_element(plan: ExecutionPlan, context: ExecutionContext, loop_node: CompiledNode,
+                                    index: int):
+    if not _is_completed_body(context, loop_node, index):
+        _set_for_loop_index_value(plan, context, loop_node, index)
+        _set_for_loop_element_value(plan, context, loop_node, index)
 
-def _set_for_loop_index_value(node_tag: str, value: int):
-    pin_info = _find_index_pin_info_in_for_loop_node(node_tag)
-    pin_info['value'] = value
-    dirty_propagate(node_tag)
 
+def _is_completed_body(context: ExecutionContext, loop_node: CompiledNode, index: int) -> bool:
+    return index > len(context.internal_data_list[loop_node.slot]['String Array']) - 1
 
-def _find_index_pin_info_in_for_loop_node(node_tag) -> dict:
-    for pin_info in nodes_data[node_tag]['pins']:
-        if 'Index' in pin_info['label']:
-            return pin_info
 
+def _set_for_loop_index_value(plan: ExecutionPlan, context: ExecutionContext, loop_node: CompiledNode, value: int):
+    if loop_node.index_value_slot != UNCONNECTED_SLOT:
+        context.value_list[loop_node.index_value_slot] = value
+        _dirty_propagate_value_consumers(plan, context, loop_node.index_value_slot)
 
-def _set_for_loop_element_value(node_tag: str, element_index: int):
-    pin_info = _find_element_pin_info_for_each_node(node_tag)
-    pin_info['value'] = nodes_data[node_tag]['internal_data']['String Array'][element_index]
-    dirty_propagate(node_tag)
 
+def _set_for_loop_element_value(plan: ExecutionPlan, context: ExecutionContext, loop_node: CompiledNode,
+                                element_index: int):
+    if loop_node.element_value_slot != UNCONNECTED_SLOT:
+        string_array = context.internal_data_list[loop_node.slot]['String Array']
+        context.value_list[loop_node.element_value_slot] = string_array[element_index]
+        _dirty_propagate_value_consumers(plan, context, loop_node.element_value_slot)
 
-def _find_element_pin_info_for_each_node(node_tag: str) -> dict:
-    for pin_info in nodes_data[node_tag]['pins']:
-        if pin_info['label'] == 'Array Str Element':
-            return pin_info
 
+def forward_propagate_flow(plan: ExecutionPlan, context: ExecutionContext, current_slot: int, anchors: list):
+    compiled_node_list = plan.compiled_node_list
+    while current_slot != UNCONNECTED_SLOT:
+        compute_node_with_timer(plan, context, current_slot)
+        current_node = compiled_node_list[current_slot]
+        if current_node.op_code in (ExecOpCode.Sequence, ExecOpCode.DoN, ExecOpCode.ForEachLoop):
+            update_anchors(context, current_node, anchors)
+        current_slot = _get_next_node_slot(plan, context, current_node)
 
-def forward_propagate_flow(current_node_tag: str, anchors: list):
-    compute_node_with_timer(current_node_tag)
-    current_node_info = nodes_data[current_node_tag]
-    if current_node_info['type'] == NodeTypeFlag.Sequential:
-        update_anchors(current_node_info, current_node_tag, anchors)
-    next_node_tag = _get_next_node_tag(current_node_info)
-    if next_node_tag:
-        forward_propagate_flow(next_node_tag, anchors)
 
-
-def compute_node_with_timer(node_tag: str):
+def compute_node_with_timer(plan: ExecutionPlan, context: ExecutionContext, slot: int):
+    if not is_debug_mode:
+        compute_node(plan, context, slot)
+        return
     t1_start = perf_counter()
-    current_node_elapsed_time = compute_node(node_tag)
+    compute_node(plan, context, slot)
     t1_stop = perf_counter()
-    logger.debug(f"**** Executing {node_tag} ****")
-    logger.debug(f"Compute time: {current_node_elapsed_time}")
-    backward_propagate_time = t1_stop - t1_start - current_node_elapsed_time
-    logger.debug(f"Time to backward propagate: {backward_propagate_time}")
+    logger.debug(f"**** Executing {plan.compiled_node_list[slot].tag} ****")
+    logger.debug(f"Compute time: {t1_stop - t1_start}")
 
 
-def compute_node(node_tag: str):
-    current_node_info = nodes_data[node_tag]
+def compute_node(plan: ExecutionPlan, context: ExecutionContext, slot: int):
+    compiled_node_list = plan.compiled_node_list
+    current_node = compiled_node_list[slot]
+    dirty_flag_list = context.dirty_flag_list
     # Blueprint nodes still need to be executed even if it's clean
-    if not current_node_info['is_dirty'] and (
-        current_node_info['type'] == NodeTypeFlag.Blueprint or current_node_info['type'] == NodeTypeFlag.Sequential):
-        compute_internal_output_data(node_tag)
-    # If the nodes (Blueprint is also Pure) is dirty, perform computing output values from inputs
-    if current_node_info['is_dirty'] and current_node_info['type'] & NodeTypeFlag.Pure:
-        for pin_info in current_node_info['pins']:
-            pre_node_tag = _get_pre_node_tag_if_should_backward_propagate(pin_info)
-            if pre_node_tag not in [None, '']:
-                compute_node(pre_node_tag)
-        start_timer()
-        compute_internal_output_data(node_tag)
-        return stop_timer_and_get_elapsed_time()
-    # If the current node is already clean, can safely skip computation and use it outputs values right away
+    if not dirty_flag_list[slot]:
+        if current_node.is_rerun_when_clean:
+            compute_internal_output_data(context, current_node)
+        # If the current node is already clean, can safely skip computation and use it outputs values right away
+        return
+    if not current_node.is_computable:
+        return
+    if parallel_thread_pool is not None:
+        _compute_dirty_predecessors_in_parallel(plan, context, current_node)
+        compute_internal_output_data(context, current_node)
+        return
+    # Compute every dirty Pure predecessor first (post-order) with an explicit stack instead of recursion.
+    # Each entry holds a node and the position of the next predecessor to visit
+    compute_stack = [(current_node, 0)]
+    computing_slot_set = {slot}
+    while compute_stack:
+        compiled_node, predecessor_index = compute_stack[-1]
+        predecessor_list = compiled_node.predecessor_list
+        while predecessor_index < len(predecessor_list) and \
+            (not dirty_flag_list[predecessor_list[predecessor_index]] or
+             predecessor_list[predecessor_index] in computing_slot_set):
+            predecessor_index += 1
+        if predecessor_index < len(predecessor_list):
+            pre_slot = predecessor_list[predecessor_index]
+            compute_stack[-1] = (compiled_node, predecessor_index + 1)
+            compute_stack.append((compiled_node_list[pre_slot], 0))
+            computing_slot_set.add(pre_slot)
+            continue
+        compute_stack.pop()
+        compute_internal_output_data(context, compiled_node)
+
+
+def _compute_dirty_predecessors_in_parallel(plan: ExecutionPlan, context: ExecutionContext,
+                                            compiled_node: CompiledNode):
+    """
+    Compute the dirty Pure predecessors of a node in dependency levels. Nodes of the same level do not depend on
+    each other so they run concurrently, while inputs and outputs are still copied on the calling thread in slot
+    order, which keeps the results identical to the sequential evaluation
+    """
+    compiled_node_list = plan.compiled_node_list
+    dirty_flag_list = context.dirty_flag_list
+    pending_predecessor_count_dict = {}
+    dependent_slot_dict = {}
+    visit_stack = [compiled_node.slot]
+    while visit_stack:
+        slot = visit_stack.pop()
+        for pre_slot in compiled_node_list[slot].predecessor_list:
+            if not dirty_flag_list[pre_slot] or pre_slot == compiled_node.slot:
+                continue
+            if pre_slot not in pending_predecessor_count_dict:
+                pending_predecessor_count_dict[pre_slot] = 0
+                dependent_slot_dict[pre_slot] = []
+                visit_stack.append(pre_slot)
+            if slot != compiled_node.slot:
+                pending_predecessor_count_dict[slot] += 1
+                dependent_slot_dict[pre_slot].append(slot)
+    level_slot_list = sorted(slot for slot, count in pending_predecessor_count_dict.items() if count == 0)
+    while pending_predecessor_count_dict:
+        if not level_slot_list:
+            # Only a data cycle can leave nodes waiting, run the rest in slot order as the sequential mode would
+            level_slot_list = sorted(pending_predecessor_count_dict)
+        _compute_level_in_parallel(context, [compiled_node_list[slot] for slot in level_slot_list])
+        next_level_slot_list = []
+        for slot in level_slot_list:
+            del pending_predecessor_count_dict[slot]
+            for dependent_slot in dependent_slot_dict[slot]:
+                if dependent_slot in pending_predecessor_count_dict:
+                    pending_predecessor_count_dict[dependent_slot] -= 1
+                    if pending_predecessor_count_dict[dependent_slot] == 0:
+                        next_level_slot_list.append(dependent_slot)
+        level_slot_list = sorted(next_level_slot_list)
+
+
+def _compute_level_in_parallel(context: ExecutionContext, compiled_node_list: List[CompiledNode]):
+    for compiled_node in compiled_node_list:
+        _load_input_data(context, compiled_node)
+    # Each node runs in a copy of the event context, so it reaches the resources of the event from the worker thread
+    run_arg_list = [(copy_context().run, compiled_node.run, context.internal_data_list[compiled_node.slot])
+                    for compiled_node in compiled_node_list]
+    if len(run_arg_list) == 1:
+        error_list = [_run_node_and_get_error(*run_arg_list[0])]
     else:
-        return 0
+        error_list = parallel_thread_pool.starmap(_run_node_and_get_error, run_arg_list)
+    for compiled_node, error in zip(compiled_node_list, error_list):
+        if error is not None:
+            logger.error(f'Failed to run node: {compiled_node.label} (uuid: {compiled_node.tag})', exc_info=error)
+            raise RuntimeWarning
+        _store_output_data(context, compiled_node)
 
 
-def _get_pre_node_tag_if_should_backward_propagate(pin_info: dict) -> str:
-    if pin_info['meta_type'] == PinMetaType.DataIn:
-        if pin_info['is_connected'] is False:
-            return ''
-        pre_node_tag = pin_info['connected_to_node']
-        pre_node_info = nodes_data[pre_node_tag]
-        if _should_skip_backward_compute_node(pre_node_info):
-            return ''
-        # Recursively compute every dirty Pure nodes
-        elif _is_dirty_pure_node(pre_node_info):
-            return pre_node_tag
-        # Recursively compute dirty Blueprint nodes even if it's executed
-        elif _is_dirty_executed_blueprint_node(pre_node_info):
-            return pre_node_tag
-
-
-def compute_internal_output_data(node_tag: str):
-    node_info = nodes_data[node_tag]
-    _set_pins_value_from_connected_preceding_pin_value(node_info)
-    _update_internal_input_data(node_info)
-    _run_node_and_set_to_clean(node_tag)
-    _update_pins_value_in_node_info(node_info)
-    nodes_data.update({node_tag: node_info})
-
-
-def _set_pins_value_from_connected_preceding_pin_value(node_info: dict):
-    for pin_info in node_info['pins']:
-        if pin_info['meta_type'] == PinMetaType.DataIn and pin_info['is_connected']:
-            preceding_node_info = nodes_data[pin_info['connected_to_node']]
-            pre_pin_info = _find_pin_info_in_pin_list_match_uuid(preceding_node_info,
-                                                                 pin_info['connected_to_pin'])
-            if pre_pin_info is None:
-                raise Exception('Could not find preceding pin info matched with ')
-            try:
-                pin_info['value'] = pre_pin_info['value']
-            except KeyError:
-                pin_info['value'] = pre_pin_info['default_value']
-
-
-def _update_internal_input_data(node_info: dict):
-    for pin_info in node_info['pins']:
-        if pin_info['meta_type'] == PinMetaType.DataIn:
-            node_info['internal_data'].update({pin_info['label']: pin_info['value']})
-
-
-def _find_pin_info_in_pin_list_match_uuid(node_info: dict, match_pin_uuid: str) -> dict:
-    for pin_info in node_info['pins']:
-        if pin_info['uuid'] == match_pin_uuid:
-            return pin_info
-
-
-def _run_node_and_set_to_clean(node_tag: str):
-    node_info = nodes_data[node_tag]
-    Run = node_info['run']
+def _run_node_and_get_error(run_in_context: Callable, run: Callable[[dict], None],
+                            internal_data: dict) -> Optional[BaseException]:
     try:
-        Run(node_info['internal_data'])
-    except:
-        logger.exception(f'Failed to run node: {node_info["label"]} (uuid: {node_tag})')
-        raise RuntimeWarning
-    node_info['is_dirty'] = False
-
-
-def _update_pins_value_in_node_info(node_info: dict):
-    for pin_info in node_info['pins']:
-        if pin_info['meta_type'] == PinMetaType.DataOut:
-            for key, value in node_info['internal_data'].items():
-                if key == pin_info['label']:
-                    pin_info['value'] = value
-                    break
-
-
-def _is_dirty_pure_node(node_info: dict) -> bool:
-    return node_info['is_dirty'] and \
-        (node_info['type'] == NodeTypeFlag.Pure or node_info['type'] == NodeTypeFlag.GetVariable)
-
-
-def _is_dirty_executed_blueprint_node(node_info: dict) -> bool:
-    return node_info['is_dirty'] and \
-        (node_info['type'] & NodeTypeFlag.Blueprint or node_info['type'] & NodeTypeFlag.Sequential) and \
-        node_info['is_executed']
-
-
-def _should_skip_backward_compute_node(node_info: dict) -> bool:
-    return _is_dirty_unexecuted_blueprint_node(node_info) and \
-        _is_clean_executed_blueprint_node(node_info) and \
-        _is_clean_unexecuted_blueprint_node(node_info)
-
-
-def _is_dirty_unexecuted_blueprint_node(node_info: dict) -> bool:
-    return node_info['is_dirty'] and \
-        (node_info['type'] & NodeTypeFlag.Blueprint or node_info['type'] & NodeTypeFlag.Sequential) and \
-        not node_info['is_executed']
-
-
-def _is_clean_executed_blueprint_node(node_info: dict) -> bool:
-    return not node_info['is_dirty'] and \
-        (node_info['type'] & NodeTypeFlag.Blueprint or node_info['type'] & NodeTypeFlag.Sequential) and \
-        node_info['is_executed']
-
-
-def _is_clean_unexecuted_blueprint_node(node_info: dict) -> bool:
-    return not node_info['is_dirty'] and \
-        (node_info['type'] & NodeTypeFlag.Blueprint or node_info['type'] & NodeTypeFlag.Sequential) and \
-        not node_info['is_executed']
-
-
-def update_anchors(current_node_info: dict, current_node_tag: str, anchors: list):
-    if current_node_info['label'] == 'Sequence':
-        for pin_info in current_node_info['pins']:
-            if pin_info['meta_type'] == PinMetaType.FlowOut and pin_info['is_connected']:
-                anchors.append({'next_node_tag': pin_info['connected_to_node'],
-                                'this_node_tag': current_node_tag,
-                                'this_node_label': current_node_info['label']})
-    elif current_node_info['label'] == 'Do N':
-        iteration_num = current_node_info['internal_data']['N']
-        for pin_info in current_node_info['pins']:
-            if pin_info['meta_type'] == PinMetaType.FlowOut and pin_info['is_connected']:
-                for i in range(iteration_num):
-                    anchors.append({'next_node_tag': pin_info['connected_to_node'],
-                                    'index': i,
-                                    'this_node_tag': current_node_tag,
-                                    'this_node_label': current_node_info['label']})
-                break
-    elif current_node_info['label'] == 'For each loop':
-        iteration_num = len(current_node_info['internal_data']['String Array'])
-        for pin_info in current_node_info['pins']:
-            if pin_info['label'] == 'Loop Body' and pin_info['is_connected']:
-                for i in range(iteration_num):
-                    anchors.append({'next_node_tag': pin_info['connected_to_node'],
-                                    'index': i,
-                                    'this_node_tag': current_node_tag,
-                                    'this_node_label': current_node_info['label']})
-            elif pin_info['label'] == 'Completed' and pin_info['is_connected']:
-                anchors.append({'next_node_tag': pin_info['connected_to_node'],
-                                'this_node_tag': current_node_tag,
-                                'index': iteration_num,
-                                'this_node_label': current_node_info['label']})
-
-
-def _get_next_node_tag(current_node_info: dict) -> str:
-    next_node_tag = None
-    if current_node_info['label'] == 'Branch':
-        next_node_tag = _get_next_node_tag_from_branch_node(current_node_info)
-    if current_node_info['type'] == NodeTypeFlag.Blueprint:
-        next_node_tag = _get_next_node_tag_from_blueprint_node(current_node_info)
-    if current_node_info['type'] == NodeTypeFlag.SetVariable:
-        _dirty_propagate_all_get_var_nodes(current_node_info)
-        next_node_tag = _get_next_node_tag_from_blueprint_node(current_node_info)
-    return next_node_tag
-
-
-def _get_next_node_tag_from_branch_node(current_node_info: dict):
-    condition = current_node_info['internal_data']['Condition']
-    if condition is True or condition == 'True':
-        for pin_info in current_node_info['pins']:
-            if pin_info['meta_type'] == PinMetaType.FlowOut:
-                if pin_info['is_connected'] and pin_info['label'] == 'True':
-                    next_node_tag = pin_info['connected_to_node']
-                    return next_node_tag
-    else:
-        for pin_info in current_node_info['pins']:
-            if pin_info['meta_type'] == PinMetaType.FlowOut:
-                if pin_info['is_connected'] and pin_info['label'] == 'False':
-                    next_node_tag = pin_info['connected_to_node']
-                    return next_node_tag
-
-
-def _get_next_node_tag_from_blueprint_node(current_node_info: dict):
-    for pin_info in current_node_info['pins']:
-        if pin_info['meta_type'] == PinMetaType.FlowOut:
-            if pin_info['is_connected']:
-                next_node_tag = pin_info['connected_to_node']
-                return next_node_tag
-
-
-def _dirty_propagate_all_get_var_nodes(current_node_info: dict):
-    for node_tag, node_info in nodes_data.items():
-        if node_info['internal_data'].get('var_name', '') == current_node_info['internal_data']['var_name']:
-            dirty_propagate(node_tag)
+        run_in_context(run, internal_data)
+    except Exception as error:
+        return error
+    return None
 
 
-def dirty_propagate(node_tag: str):
-    current_node_info = nodes_data[node_tag]
-    if current_node_info['is_dirty']:
+def compute_internal_output_data(context: ExecutionContext, compiled_node: CompiledNode):
+    _load_input_data(context, compiled_node)
+    try:
+        compiled_node.run(context.internal_data_list[compiled_node.slot])
+    except:
+        logger.exception(f'Failed to run node: {compiled_node.label} (uuid: {compiled_node.tag})')
+        raise RuntimeWarning
+    _store_output_data(context, compiled_node)
+
+
+def _load_input_data(context: ExecutionContext, compiled_node: CompiledNode):
+    value_list = context.value_list
+    internal_data = context.internal_data_list[compiled_node.slot]
+    for label, value_slot in compiled_node.input_slot_list:
+        internal_data[label] = value_list[value_slot]
+
+
+def _store_output_data(context: ExecutionContext, compiled_node: CompiledNode):
+    value_list = context.value_list
+    internal_data = context.internal_data_list[compiled_node.slot]
+    context.dirty_flag_list[compiled_node.slot] = False
+    if compiled_node.var_name is not None:
+        context.clean_var_node_slot_dict.setdefault(compiled_node.var_name, []).append(compiled_node.slot)
+    for label, value_slot in compiled_node.output_slot_list:
+        if label in internal_data:
+            value_list[value_slot] = internal_data[label]
+
+
+def update_anchors(context: ExecutionContext, current_node: CompiledNode, anchors: list):
+    """
+    Queue the flow redirections of a Sequential node. Each entry of anchors is an iterable of
+    (next_slot, loop_slot, index) so loop iterations are produced lazily instead of being materialised up front
+    """
+    internal_data = context.internal_data_list[current_node.slot]
+    if current_node.op_code == ExecOpCode.Sequence:
+        anchors.append([(next_slot, UNCONNECTED_SLOT, 0) for next_slot in current_node.flow_successor_list])
+    elif current_node.op_code == ExecOpCode.DoN:
+        body_slot = current_node.flow_successor_list[0]
+        if body_slot != UNCONNECTED_SLOT:
+            anchors.append(_iterate_loop_anchors(body_slot, current_node.slot, internal_data['N']))
+    elif current_node.op_code == ExecOpCode.ForEachLoop:
+        body_slot, completed_slot = current_node.flow_successor_list
+        iteration_num = len(internal_data['String Array'])
+        if body_slot != UNCONNECTED_SLOT:
+            anchors.append(_iterate_loop_anchors(body_slot, current_node.slot, iteration_num))
+        if completed_slot != UNCONNECTED_SLOT:
+            anchors.append([(completed_slot, current_node.slot, iteration_num)])
+
+
+def _iterate_loop_anchors(body_slot: int, loop_slot: int, iteration_num: int) -> Iterator[Tuple[int, int, int]]:
+    return zip(repeat(body_slot), repeat(loop_slot), range(iteration_num))
+
+
+def _get_next_node_slot(plan: ExecutionPlan, context: ExecutionContext, current_node: CompiledNode) -> int:
+    op_code = current_node.op_code
+    if op_code == ExecOpCode.Blueprint:
+        return current_node.flow_successor_list[0]
+    if op_code == ExecOpCode.SetVariable:
+        _dirty_propagate_all_get_var_nodes(plan, context, current_node)
+        return current_node.flow_successor_list[0]
+    if op_code == ExecOpCode.Branch:
+        condition = context.internal_data_list[current_node.slot]['Condition']
+        if condition is True or condition == 'True':
+            return current_node.flow_successor_list[0]
+        return current_node.flow_successor_list[1]
+    return UNCONNECTED_SLOT
+
+
+def _dirty_propagate_all_get_var_nodes(plan: ExecutionPlan, context: ExecutionContext, current_node: CompiledNode):
+    # Var nodes that are still dirty need nothing, so only the ones computed since the last set are visited
+    for var_node_slot in context.clean_var_node_slot_dict.pop(current_node.var_name, ()):
+        dirty_propagate(plan, context, var_node_slot)
+
+
+def _dirty_propagate_value_consumers(plan: ExecutionPlan, context: ExecutionContext, value_slot: int):
+    """
+    Invalidate only the nodes reading the given output value slot and their downstream nodes.
+    The owner of the slot is left untouched since its value was written directly
+    """
+    dirty_flag_list = context.dirty_flag_list
+    for consumer_slot in plan.value_consumer_slot_dict.get(value_slot, ()):
+        if not dirty_flag_list[consumer_slot]:
+            dirty_propagate(plan, context, consumer_slot)
+
+
+def dirty_propagate(plan: ExecutionPlan, context: ExecutionContext, slot: int):
+    dirty_flag_list = context.dirty_flag_list
+    if dirty_flag_list[slot]:
         return 0
     # Mark current node to 'dirty'
-    current_node_info['is_dirty'] = True
-    # Propagate to any connected following node to 'dirty' as well
-    for pin_info in current_node_info['pins']:
-        # if pin type is exec, skip
-        if pin_info['type'] == OutputPinType.Exec:
-            continue
-        # if pin is not connected, skip
-        if pin_info.get('is_connected', False) is False:
-            continue
-        # propagate to the connected node
-        dirty_propagate(pin_info['connected_to_node'])
+    dirty_flag_list[slot] = True
+    # Propagate to every downstream data consumer, using an explicit stack instead of recursion
+    compiled_node_list = plan.compiled_node_list
+    dirty_stack = [slot]
+    while dirty_stack:
+        for connected_slot in compiled_node_list[dirty_stack.pop()].dirty_successor_list:
+            if not dirty_flag_list[connected_slot]:
+                dirty_flag_list[connected_slot] = True
+                dirty_stack.append(connected_slot)
@@ -0,0 +1,109 @@
+"""
+Manifest of the events and exposed vars of every tool of a project, kept next to the .mproject file so a project can
+be listed with one small read instead of reading every tool file. Entries are checked against the size and
+modification time of their tool file, then against its content hash, and only the stale ones are read again.
+"""
+import json
+import logging
+from collections import OrderedDict
+from pathlib import Path
+
+from core.tool_file_cache import get_tool_file_version
+from core.utils import json_load_from_file_path, write_file_bytes_atomically
+
+# Bump whenever the layout of the manifest entries changes so older manifests get rebuilt
+PROJECT_MANIFEST_VERSION = 1
+PROJECT_MANIFEST_SUFFIX = '.mmanifest'
+
+logger = logging.getLogger('')
+
+
+def get_project_manifest_path(project_file_path) -> Path:
+    return Path(project_file_path).with_suffix(PROJECT_MANIFEST_SUFFIX)
+
+
+def load_project_manifest(project_file_path) -> OrderedDict:
+    """
+    Get the events and exposed vars of every tool of a project, reading only the tool files changed since the
+    manifest got written. The manifest is updated when any entry got rebuilt
+
+    :param project_file_path: path to the .mproject file
+    :return: dict of tool name -> tool path, event labels keyed by event node uuid and exposed vars, in project order
+    """
+    project_file_path = Path(project_file_path)
+    project_dict = json_load_from_file_path(project_file_path)
+    manifest_path = get_project_manifest_path(project_file_path)
+    old_entry_dict = _read_manifest_entries(manifest_path)
+    is_manifest_changed = list(old_entry_dict) != list(project_dict)
+    entry_dict = OrderedDict([])
+    for tool_name, tool_relative_path in project_dict.items():
+        tool_path = project_file_path.parent / tool_relative_path
+        entry = old_entry_dict.get(tool_name, None)
+        is_entry_valid, is_entry_changed = _validate_manifest_entry(entry, tool_relative_path, tool_path)
+        if not is_entry_valid:
+            entry = _construct_manifest_entry(tool_relative_path, tool_path)
+            is_entry_changed = True
+        entry_dict[tool_name] = entry
+        is_manifest_changed = is_manifest_changed or is_entry_changed
+    if is_manifest_changed:
+        _write_manifest_entries(manifest_path, entry_dict)
+    return OrderedDict([(tool_name, {'tool_path': project_file_path.parent / entry['path'],
+                                     'events': OrderedDict(entry['events']),
+                                     'vars': entry['vars']})
+                        for tool_name, entry in entry_dict.items()])
+
+
+def _read_manifest_entries(manifest_path: Path) -> dict:
+    try:
+        manifest = json_load_from_file_path(manifest_path)
+    except ValueError:
+        logger.warning(f'Could not read project manifest {manifest_path}, rebuilding it')
+        return {}
+    if manifest.get('version', None) != PROJECT_MANIFEST_VERSION:
+        return {}
+    return manifest['tools']
+
+
+def _write_manifest_entries(manifest_path: Path, entry_dict: OrderedDict):
+    manifest_bytes = json.dumps({'version': PROJECT_MANIFEST_VERSION, 'tools': entry_dict},
+                                separators=(',', ':')).encode()
+    try:
+        write_file_bytes_atomically(manifest_path, manifest_bytes)
+    except OSError:
+        # The manifest is only an optimization, e.g. projects on read-only shares are simply read whole every time
+        logger.warning(f'Could not write project manifest {manifest_path}', exc_info=True)
+
+
+def _validate_manifest_entry(entry, tool_relative_path: str, tool_path: Path):
+    """
+    Check a manifest entry against its tool file
+
+    :return: whether the entry is up to date, and whether it got updated with the new modification time of the file
+    """
+    if entry is None or entry['path'] != tool_relative_path:
+        return False, False
+    tool_stat = tool_path.stat()
+    if entry['size'] != tool_stat.st_size:
+        return False, False
+    if entry['mtime_ns'] == tool_stat.st_mtime_ns:
+        return True, False
+    # Touched without being modified, e.g. rewritten with the same content or checked out again
+    tool_file_version = get_tool_file_version(tool_path)
+    if tool_file_version.content_hash != entry['hash']:
+        return False, False
+    entry['mtime_ns'] = tool_file_version.mtime_ns
+    return True, True
+
+
+def _construct_manifest_entry(tool_relative_path: str, tool_path: Path) -> dict:
+    tool_file_version = get_tool_file_version(tool_path)
+    tool_summary = tool_file_version.summary
+    return {
+        'path': tool_relative_path,
+        'size': tool_file_version.size,
+        'mtime_ns': tool_file_version.mtime_ns,
+        'hash': tool_file_version.content_hash,
+        'events': list(tool_summary['events'].items()),
+        'vars': {var_tag: var_info for var_tag, var_info in tool_summary['vars'].items()
+                 if var_info['is_exposed'][0]}
+    }
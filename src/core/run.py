@@ -0,0 +1,195 @@
+"""
+Headless runner, executes a tool event without the DearPyGui front-ends
+
+Usage: python -m core.run project.mproject --tool Perforce --event "Sync essential" --var P4ROOT=D:/P4
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Tuple, Optional
+
+from core.data_loader import refresh_core_data_with_json_dict
+from core.enum_types import NodeTypeFlag
+from core.executor import execute_event, setup_executor_parallel_mode
+from core.tool_file import load_tool_file
+from core.utils import json_load_from_file_path, remove_node_type_from_node_label, log_on_return_message
+from libs.constants import TOOLSET_NAME
+
+ENV_VAR_PREFIX = f'{TOOLSET_NAME.upper()}_VAR_'
+TRUE_STRING_LIST = ['1', 'true', 'yes', 'on']
+
+logger = logging.getLogger('')
+
+
+def main() -> int:
+    args = get_arg()
+    logging.basicConfig(level=logging.DEBUG if args.is_debug_mode else logging.INFO,
+                        format='%(asctime)s %(levelname)s %(message)s')
+    setup_executor_parallel_mode(args.parallel_workers)
+    try:
+        tool_data = load_tool_data(Path(args.project_path), args.tool)
+        event_tag = get_event_tag(tool_data, args.event)
+        exposed_var_values = collect_exposed_var_values(tool_data, args.var, args.var_file)
+    except (OSError, KeyError, ValueError) as error:
+        logger.error(error)
+        return 2
+    return_message = run_tool_event(tool_data, event_tag, exposed_var_values)
+    return 0 if return_message[0] == 1 else 1
+
+
+def get_arg():
+    """
+    Get arg from CLI
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=f"{TOOLSET_NAME} - Headless runner", )
+
+    parser.add_argument(
+        "project_path",
+        type=str,
+        help='.mproject file, or a single .mtool file'
+    )
+    parser.add_argument(
+        "--tool",
+        type=str,
+        default='',
+        help='Tool name in the project, defaults to the first tool'
+    )
+    parser.add_argument(
+        "--event",
+        type=str,
+        required=True,
+        help='Event label as shown in Tools Viewer, or the event node uuid'
+    )
+    parser.add_argument(
+        "--var",
+        type=str,
+        action='append',
+        default=[],
+        help='Exposed var value as Name=value, can be repeated'
+    )
+    parser.add_argument(
+        "--var_file",
+        type=str,
+        help='JSON file of exposed var values keyed by var name'
+    )
+    parser.add_argument(
+        "--is_debug_mode",
+        action='store_true'
+    )
+    parser.add_argument(
+        "--parallel_workers",
+        type=int,
+        default=0,
+        help='Number of threads computing independent Pure nodes concurrently, 0 to disable'
+    )
+
+    args = parser.parse_args()
+    return args
+
+
+def load_tool_data(project_path: Path, tool_name: str = '') -> dict:
+    """
+    Load tool data from a project or directly from a tool file
+
+    :param project_path: path to the .mproject or .mtool file
+    :param tool_name: name of the tool in the project, the first tool is used if empty
+    :return: tool data
+    """
+    if project_path.suffix == '.mtool':
+        return load_tool_file(project_path)
+    project_dict = json_load_from_file_path(project_path)
+    if not tool_name:
+        tool_name = next(iter(project_dict))
+    if tool_name not in project_dict:
+        raise KeyError(f'Could not find tool {tool_name} in project {project_path.name}')
+    return load_tool_file(project_path.parent / project_dict[tool_name])
+
+
+def get_event_tag(tool_data: dict, event_name: str) -> str:
+    """
+    Find the event node matching an event label or uuid
+
+    :param tool_data: tool data
+    :param event_name: event label without the 'Event' prefix, or event node uuid
+    :return: tag of the event node
+    """
+    for node_info in tool_data['nodes']:
+        if node_info['type'] != NodeTypeFlag.Event:
+            continue
+        if event_name in (node_info['uuid'], node_info['label'], remove_node_type_from_node_label(node_info['label'])):
+            return node_info['uuid']
+    raise KeyError(f'Could not find event {event_name}')
+
+
+def collect_exposed_var_values(tool_data: dict, var_arg_list: list, var_file_path: Optional[str] = None) -> dict:
+    """
+    Collect exposed var values from the environment, then a JSON file, then CLI args, later sources taking priority.
+    Environment variables are named MOMOTAROU_VAR_<var name in upper case with non alphanumerics as _>
+
+    :param tool_data: tool data
+    :param var_arg_list: list of Name=value strings
+    :param var_file_path: path to a JSON file of var values keyed by var name
+    :return: exposed var values keyed by var name
+    """
+    var_type_dict = get_exposed_var_type_dict(tool_data)
+    exposed_var_values = {}
+    for var_name, var_type in var_type_dict.items():
+        env_value = os.environ.get(ENV_VAR_PREFIX + re.sub(r'\W', '_', var_name).upper(), None)
+        if env_value is not None:
+            exposed_var_values[var_name] = convert_string_to_var_value(env_value, var_type)
+    if var_file_path:
+        exposed_var_values.update(json_load_from_file_path(var_file_path))
+    for var_arg in var_arg_list:
+        var_name, separator, value = var_arg.partition('=')
+        if not separator:
+            raise ValueError(f'Invalid var {var_arg}, expected Name=value')
+        exposed_var_values[var_name] = convert_string_to_var_value(value, var_type_dict.get(var_name, 'String'))
+    for var_name in exposed_var_values:
+        if var_name not in var_type_dict:
+            logger.warning(f'{var_name} is not an exposed var of this tool and will be ignored')
+    return exposed_var_values
+
+
+def get_exposed_var_type_dict(tool_data: dict) -> dict:
+    return {var_info['name'][0]: var_info['type'][0] for var_info in tool_data['vars'].values()
+            if var_info['is_exposed'][0]}
+
+
+def convert_string_to_var_value(value: str, var_type: str):
+    if var_type == 'Int':
+        return int(value)
+    elif var_type == 'Float':
+        return float(value)
+    elif var_type == 'Bool':
+        return value.lower() in TRUE_STRING_LIST
+    return value
+
+
+def run_tool_event(tool_data: dict, event_tag: str, exposed_var_values: dict) -> Tuple[int, str]:
+    """
+    Load the tool graph and execute one of its events on the calling thread
+
+    :param tool_data: tool data
+    :param event_tag: tag of the event node
+    :param exposed_var_values: exposed var values keyed by var name
+    :return: return code and message
+    """
+    return_message = refresh_core_data_with_json_dict(tool_data, exposed_var_values)
+    log_on_return_message(logger, 'Compile node graph', return_message)
+    if return_message[0] != 1:
+        return return_message
+    try:
+        return_message = execute_event(event_tag)
+    except RuntimeWarning:
+        return_message = (3, '')
+    log_on_return_message(logger, 'Execute event', return_message)
+    return return_message
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,310 @@
+"""
+Reading and writing of .mtool files, either as pretty-printed JSON or in the compact binary format.
+
+The compact format interns every UUID in a table and references nodes and pins by their index in it. The file starts
+with a small header holding the UUID table, events and vars, followed by the body holding nodes and links, each
+encoded separately so listing events and exposed vars never decodes the node list.
+
+Usage: python -m core.tool_file tools/*.mtool --format compact
+"""
+import argparse
+import json
+import logging
+import os
+import struct
+import sys
+import zlib
+from collections import OrderedDict
+from typing import Tuple, Optional
+
+from core.enum_types import NodeTypeFlag
+from core.utils import remove_node_type_from_node_label, write_file_bytes_atomically
+from libs.constants import TOOLSET_NAME
+
+# Optional dependencies, the compact format falls back to compact JSON and zlib when they are not installed
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPACT_TOOL_MAGIC = b'MTOOLB'
+COMPACT_TOOL_FORMAT_VERSION = 1
+# magic, format version, codec, compression, header size
+COMPACT_TOOL_PREFIX_STRUCT = struct.Struct('<6sBBBI')
+
+
+class ToolCodec:
+    Json = 0
+    MsgPack = 1
+
+
+class ToolCompression:
+    NoCompression = 0
+    Zlib = 1
+    Zstd = 2
+
+
+NODE_FIELD_LIST = ['uuid', 'label', 'pins', 'type', 'import_path', 'position']
+PIN_FIELD_LIST = ['uuid', 'label', 'meta_type', 'type']
+
+logger = logging.getLogger('')
+
+
+def main() -> int:
+    args = get_arg()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    return_code = 0
+    for tool_path in args.tool_paths:
+        try:
+            tool_data = load_tool_file(tool_path)
+            write_tool_file(tool_path, tool_data, is_compact=args.format == 'compact')
+        except (OSError, ValueError, KeyError) as error:
+            logger.error(f'Could not convert {tool_path}: {error}')
+            return_code = 1
+        else:
+            logger.info(f'Converted {tool_path} to {args.format}, {os.path.getsize(tool_path)} bytes')
+    return return_code
+
+
+def get_arg():
+    """
+    Get arg from CLI
+
+    :return:
+    """
+    parser = argparse.ArgumentParser(description=f"{TOOLSET_NAME} - Tool file converter", )
+
+    parser.add_argument(
+        "tool_paths",
+        type=str,
+        nargs='+',
+        help='.mtool files to convert in place'
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=['compact', 'json'],
+        required=True,
+        help='Target format, JSON stays editable by hand while compact is smaller and faster to list'
+    )
+
+    args = parser.parse_args()
+    return args
+
+
+def is_compact_tool_file(tool_path) -> bool:
+    try:
+        with open(tool_path, 'rb') as fp:
+            return fp.read(len(COMPACT_TOOL_MAGIC)) == COMPACT_TOOL_MAGIC
+    except OSError:
+        return False
+
+
+def load_tool_file(tool_path) -> dict:
+    """
+    Load tool data from a .mtool file of either format
+
+    :param tool_path: path to the .mtool file
+    :return: tool data, empty if the file does not exist
+    """
+    try:
+        with open(tool_path, 'rb') as fp:
+            tool_bytes = fp.read()
+    except FileNotFoundError:
+        return {}
+    return decode_tool_bytes(tool_bytes)
+
+
+def decode_tool_bytes(tool_bytes: bytes) -> dict:
+    if not tool_bytes.startswith(COMPACT_TOOL_MAGIC):
+        return json.loads(tool_bytes)
+    codec, compression, header_size = _unpack_compact_tool_prefix(tool_bytes)
+    body_start = COMPACT_TOOL_PREFIX_STRUCT.size + header_size
+    header = _decode_section(tool_bytes[COMPACT_TOOL_PREFIX_STRUCT.size:body_start], codec, compression)
+    body = _decode_section(tool_bytes[body_start:], codec, compression)
+    return _expand_tool_data(header, body)
+
+
+def decode_tool_summary(tool_bytes: bytes) -> dict:
+    """
+    Get the events and vars of a tool. Compact files only decode their header, JSON files are parsed whole
+
+    :param tool_bytes: content of the .mtool file
+    :return: dict of event labels keyed by event node uuid in node order, and the vars data
+    """
+    if not tool_bytes.startswith(COMPACT_TOOL_MAGIC):
+        return _get_tool_summary_from_tool_data(json.loads(tool_bytes))
+    codec, compression, header_size = _unpack_compact_tool_prefix(tool_bytes)
+    header_start = COMPACT_TOOL_PREFIX_STRUCT.size
+    return _get_tool_summary_from_header(
+        _decode_section(tool_bytes[header_start:header_start + header_size], codec, compression))
+
+
+def _get_tool_summary_from_tool_data(tool_data: dict) -> dict:
+    event_label_dict = OrderedDict([(node_info['uuid'], remove_node_type_from_node_label(node_info['label']))
+                                    for node_info in tool_data['nodes']
+                                    if node_info['type'] == NodeTypeFlag.Event])
+    return {'events': event_label_dict, 'vars': tool_data['vars']}
+
+
+def _get_tool_summary_from_header(header: dict) -> dict:
+    uuid_list = header['uuids']
+    event_label_dict = OrderedDict([(uuid_list[event_ref], event_label)
+                                    for event_ref, event_label in header['event_labels']])
+    return {'events': event_label_dict, 'vars': header['vars']}
+
+
+def write_tool_file(tool_path, tool_data: dict, is_compact: bool = False):
+    """
+    Write tool data to a .mtool file, replacing the previous file only once fully written
+
+    :param tool_path: path to the .mtool file
+    :param tool_data: tool data
+    :param is_compact: write the compact binary format instead of JSON
+    """
+    write_file_bytes_atomically(tool_path, encode_tool_bytes(tool_data, is_compact))
+
+
+def encode_tool_bytes(tool_data: dict, is_compact: bool = False) -> bytes:
+    if is_compact:
+        return encode_compact_tool_bytes(tool_data)
+    # Same layout as json_write_to_file_path so JSON tools stay diff friendly
+    return json.dumps(tool_data, indent=4).encode()
+
+
+def encode_compact_tool_bytes(tool_data: dict, codec: Optional[int] = None,
+                              compression: Optional[int] = None) -> bytes:
+    """
+    Encode tool data to the compact format
+
+    :param tool_data: tool data
+    :param codec: ToolCodec, defaults to MsgPack when installed
+    :param compression: ToolCompression, defaults to Zstd when installed
+    :return: file content
+    """
+    if codec is None:
+        codec = ToolCodec.MsgPack if msgpack is not None else ToolCodec.Json
+    if compression is None:
+        compression = ToolCompression.Zstd if zstandard is not None else ToolCompression.Zlib
+    header, body = _intern_tool_data(tool_data)
+    header_bytes = _encode_section(header, codec, compression)
+    body_bytes = _encode_section(body, codec, compression)
+    prefix = COMPACT_TOOL_PREFIX_STRUCT.pack(COMPACT_TOOL_MAGIC, COMPACT_TOOL_FORMAT_VERSION, codec, compression,
+                                             len(header_bytes))
+    return prefix + header_bytes + body_bytes
+
+
+def _unpack_compact_tool_prefix(tool_bytes: bytes) -> Tuple[int, int, int]:
+    magic, format_version, codec, compression, header_size = \
+        COMPACT_TOOL_PREFIX_STRUCT.unpack_from(tool_bytes)
+    if format_version > COMPACT_TOOL_FORMAT_VERSION:
+        raise ValueError(f'Tool file format version {format_version} is newer than this version of {TOOLSET_NAME}')
+    return codec, compression, header_size
+
+
+def _intern_tool_data(tool_data: dict) -> Tuple[dict, dict]:
+    """Split tool data into header and body, replacing node and pin uuids with their index in the uuid table"""
+    uuid_index_dict = {}
+
+    def intern(uuid):
+        if uuid is None:
+            return None
+        return uuid_index_dict.setdefault(uuid, len(uuid_index_dict))
+
+    node_list = []
+    event_label_list = []
+    for node_info in tool_data['nodes']:
+        node_ref = intern(node_info['uuid'])
+        pin_list = [[intern(pin_info['uuid'])] + [pin_info[field] for field in PIN_FIELD_LIST[1:]] +
+                    [{key: value for key, value in pin_info.items() if key not in PIN_FIELD_LIST}]
+                    for pin_info in node_info['pins']]
+        node_list.append([node_ref, node_info['label'], pin_list, node_info['type'], node_info['import_path'],
+                          [node_info['position']['x'], node_info['position']['y']],
+                          {key: value for key, value in node_info.items() if key not in NODE_FIELD_LIST}])
+        if node_info['type'] == NodeTypeFlag.Event:
+            event_label_list.append([node_ref, remove_node_type_from_node_label(node_info['label'])])
+    body = {
+        'nodes': node_list,
+        'flows': [intern(pin_tag) for link in tool_data['flows'] for pin_tag in link],
+        'data_links': [intern(pin_tag) for link in tool_data['data_links'] for pin_tag in link]
+    }
+    header = {
+        'events': [[intern(event_tag), intern(first_node_tag)]
+                   for event_tag, first_node_tag in tool_data['events'].items()],
+        'event_labels': event_label_list,
+        'vars': tool_data['vars']
+    }
+    # Filled last, once every uuid of the body and header got interned
+    header['uuids'] = list(uuid_index_dict)
+    return header, body
+
+
+def _expand_tool_data(header: dict, body: dict) -> dict:
+    uuid_list = header['uuids']
+
+    def expand(ref):
+        return None if ref is None else uuid_list[ref]
+
+    node_list = []
+    for node_ref, label, pin_list, node_type, import_path, position, node_extra in body['nodes']:
+        expanded_pin_list = []
+        for pin_ref, pin_label, meta_type, pin_type, pin_extra in pin_list:
+            expanded_pin_list.append(dict({'uuid': expand(pin_ref), 'label': pin_label, 'meta_type': meta_type,
+                                           'type': pin_type}, **pin_extra))
+        node_list.append(dict({'uuid': expand(node_ref), 'label': label, 'pins': expanded_pin_list,
+                               'type': node_type, 'import_path': import_path,
+                               'position': {'x': position[0], 'y': position[1]}}, **node_extra))
+    return {
+        'nodes': node_list,
+        'flows': _expand_link_refs(body['flows'], uuid_list),
+        'data_links': _expand_link_refs(body['data_links'], uuid_list),
+        'events': {expand(event_ref): expand(first_node_ref) for event_ref, first_node_ref in header['events']},
+        'vars': header['vars']
+    }
+
+
+def _expand_link_refs(link_ref_list: list, uuid_list: list) -> list:
+    return [[uuid_list[link_ref_list[index]], uuid_list[link_ref_list[index + 1]]]
+            for index in range(0, len(link_ref_list), 2)]
+
+
+def _encode_section(section: dict, codec: int, compression: int) -> bytes:
+    if codec == ToolCodec.MsgPack:
+        section_bytes = _get_msgpack('write').packb(section, use_bin_type=True)
+    else:
+        section_bytes = json.dumps(section, separators=(',', ':')).encode()
+    if compression == ToolCompression.Zstd:
+        return _get_zstandard('write').ZstdCompressor(level=10).compress(section_bytes)
+    elif compression == ToolCompression.Zlib:
+        return zlib.compress(section_bytes, 9)
+    return section_bytes
+
+
+def _decode_section(section_bytes: bytes, codec: int, compression: int) -> dict:
+    if compression == ToolCompression.Zstd:
+        section_bytes = _get_zstandard('read').ZstdDecompressor().decompress(section_bytes)
+    elif compression == ToolCompression.Zlib:
+        section_bytes = zlib.decompress(section_bytes)
+    if codec == ToolCodec.MsgPack:
+        return _get_msgpack('read').unpackb(section_bytes, raw=False)
+    return json.loads(section_bytes)
+
+
+def _get_msgpack(action: str):
+    if msgpack is None:
+        raise ValueError(f'msgpack is required to {action} this tool file, install it with pip install msgpack')
+    return msgpack
+
+
+def _get_zstandard(action: str):
+    if zstandard is None:
+        raise ValueError(f'zstandard is required to {action} this tool file, install it with pip install zstandard')
+    return zstandard
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Shared cache of tool files, so each version of a tool file is read, hashed and decoded at most once by the Tools
+Viewer components asking for it. Versions are told apart by the size and modification time of the file.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from core.tool_file import decode_tool_summary
+
+MAX_CACHED_TOOL_FILES = 64
+
+# Tool file versions keyed by tool path, least recently used first
+tool_file_version_registry = OrderedDict()
+
+
+class ToolFileVersion:
+    """
+    One version of a tool file. Its summary is decoded on first use and shared, it must be treated as read-only.
+    Callers needing the tool data decode their own copy with decode_tool_bytes(tool_bytes)
+    """
+    __slots__ = ('tool_path', 'size', 'mtime_ns', 'tool_bytes', 'content_hash', '_summary')
+
+    @property
+    def summary(self) -> dict:
+        if self._summary is None:
+            self._summary = decode_tool_summary(self.tool_bytes)
+        return self._summary
+
+    def __init__(self, tool_path: Path):
+        self.tool_path = tool_path
+        with open(tool_path, 'rb') as fp:
+            # Stat the opened file so the version matches the content read even if the file gets replaced meanwhile
+            tool_stat = os.fstat(fp.fileno())
+            self.tool_bytes = fp.read()
+        self.size = tool_stat.st_size
+        self.mtime_ns = tool_stat.st_mtime_ns
+        self.content_hash = hashlib.blake2b(self.tool_bytes, digest_size=16).hexdigest()
+        self._summary = None
+
+    def is_current(self, tool_stat: os.stat_result) -> bool:
+        return self.size == tool_stat.st_size and self.mtime_ns == tool_stat.st_mtime_ns
+
+
+def get_tool_file_version(tool_path) -> ToolFileVersion:
+    """
+    Get the current version of a tool file, reading it only if it changed since last asked for
+
+    :param tool_path: path to the .mtool file
+    :return: tool file version
+    """
+    tool_path = Path(tool_path)
+    tool_file_version = tool_file_version_registry.get(tool_path, None)
+    if tool_file_version is None or not tool_file_version.is_current(tool_path.stat()):
+        tool_file_version = ToolFileVersion(tool_path)
+    tool_file_version_registry[tool_path] = tool_file_version
+    tool_file_version_registry.move_to_end(tool_path)
+    while len(tool_file_version_registry) > MAX_CACHED_TOOL_FILES:
+        tool_file_version_registry.popitem(last=False)
+    return tool_file_version
+
+
+def invalidate_tool_file(tool_path: Optional[Path] = None):
+    """
+    Forget a cached tool file, e.g. when it may have been rewritten within the modification time resolution
+
+    :param tool_path: path to the .mtool file, None to forget every tool file
+    :return:
+    """
+    if tool_path is None:
+        tool_file_version_registry.clear()
+    else:
+        tool_file_version_registry.pop(Path(tool_path), None)
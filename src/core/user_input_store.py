@@ -0,0 +1,89 @@
+import json
+import logging
+from pathlib import Path
+from threading import Lock, Timer
+from typing import Optional
+
+from core.utils import json_load_from_file_path, write_file_bytes_atomically
+
+
+class UserInputStore:
+    """
+    Last user inputs of every tab of a project, read once and then updated in memory. Changes are written in the
+    background at most once per flush delay, and at close. Only the changed tabs are merged into the file, since Node
+    Editor and Tools Viewer share it
+    """
+
+    @property
+    def file_path(self) -> Path:
+        return self._file_path
+
+    @property
+    def write_count(self) -> int:
+        return self._write_count
+
+    def __init__(self, file_path, flush_delay=1.0, logger: Optional[logging.Logger] = None):
+        self._file_path = Path(file_path)
+        self._flush_delay = flush_delay
+        self.logger = logger if logger is not None else logging.getLogger('')
+        self._user_input_dict = self._read_user_input_dict()
+        self._dirty_tab_name_set = set()
+        self._flush_timer = None
+        self._write_count = 0
+        self._lock = Lock()
+        # Held while writing, so a flush at close waits for the one running on the timer thread
+        self._write_lock = Lock()
+
+    def get_tab_user_inputs(self, tab_name: str) -> dict:
+        with self._lock:
+            return dict(self._user_input_dict.get(tab_name, {}))
+
+    def update_tab_user_inputs(self, tab_name: str, user_inputs: dict):
+        """
+        Store the user inputs of a tab, scheduling a write if they changed
+
+        :param tab_name: name of the tab
+        :param user_inputs: user input values keyed by exposed var name
+        :return:
+        """
+        with self._lock:
+            if self._user_input_dict.get(tab_name, None) == user_inputs:
+                return
+            self._user_input_dict[tab_name] = dict(user_inputs)
+            self._dirty_tab_name_set.add(tab_name)
+            # Changes made until the scheduled write are written along with it
+            if self._flush_timer is None:
+                self._flush_timer = Timer(self._flush_delay, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                dirty_user_input_dict = {tab_name: dict(self._user_input_dict[tab_name])
+                                         for tab_name in self._dirty_tab_name_set}
+                self._dirty_tab_name_set.clear()
+            if not dirty_user_input_dict:
+                return
+            try:
+                user_input_dict = self._read_user_input_dict()
+                user_input_dict.update(dirty_user_input_dict)
+                write_file_bytes_atomically(self._file_path, json.dumps(user_input_dict, indent=4).encode())
+                self._write_count += 1
+            except OSError:
+                self.logger.exception(f'Could not save user inputs to {self._file_path}')
+                with self._lock:
+                    self._dirty_tab_name_set.update(dirty_user_input_dict)
+
+    def close(self):
+        self.flush()
+
+    def _read_user_input_dict(self) -> dict:
+        try:
+            return json_load_from_file_path(self._file_path)
+        except ValueError:
+            self.logger.warning(f'Could not read user inputs from {self._file_path}, starting afresh')
+            return {}
@@ -4,6 +4,7 @@
 import logging
 import os
 import platform
+import threading
 from logging.handlers import QueueHandler
 from multiprocessing import Queue
 from logging import Logger
@@ -14,7 +15,7 @@
 from misc import color as color
 from libs.constants import LAST_SESSIONS_DIR, RECENT_PROJECTS_STORAGE_FILE_PATH
 
-from dearpygui import dearpygui as dpg
+# dearpygui is imported inside the UI helpers only, so the headless runner never loads it
 
 timer_registry = [0]
 
@@ -41,7 +42,7 @@ def dpg_set_value(tag: Union[int, str], value):
     :param tag: tag to check
     :param value: value to set
     """
-
+    from dearpygui import dearpygui as dpg
     if dpg.does_item_exist(tag):
         dpg.set_value(tag, value)
 
@@ -52,6 +53,7 @@ def dpg_get_value(tag: str):
     :param tag: tags of node to query value
     :return: the value of node with tag
     """
+    from dearpygui import dearpygui as dpg
     value = None
     if dpg.does_item_exist(tag):
         value = dpg.get_value(tag)
@@ -74,6 +76,23 @@ def json_write_to_file_path(file_path, value: dict):
         json.dump(value, fp, indent=4)
 
 
+def write_file_bytes_atomically(file_path, file_bytes: bytes):
+    """
+    Write a file through a temp file, so readers see either the previous or the new content, never a partial one
+
+    :param file_path: path of the file to write
+    :param file_bytes: file content
+    """
+    temp_file_path = Path(file_path).with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        with open(temp_file_path, 'wb') as fp:
+            fp.write(file_bytes)
+        os.replace(temp_file_path, file_path)
+    finally:
+        if temp_file_path.exists():
+            temp_file_path.unlink()
+
+
 def start_timer():
     global timer_registry
     timer_registry[0] = perf_counter()
@@ -95,6 +114,7 @@ def generate_uuid() -> str:
 def add_user_input_box(var_type, callback=None, default_value=None,
                        user_data=None, text='', add_separator=False, width=None,
                        tag='') -> str:
+    from dearpygui import dearpygui as dpg
     if not tag:
         user_input_box_tag = generate_uuid()
     else:
@@ -227,12 +247,14 @@ def camel_case_split(string_input: str):
 
 
 def warn_file_dialog_and_reshow_widget(widget_tag: str, warn_text: str):
+    from dearpygui import dearpygui as dpg
     clear_file_dialog_children(widget_tag)
     dpg.add_text(parent=widget_tag, default_value=warn_text, color=color.darkred)
     dpg.show_item(widget_tag)
 
 
 def clear_file_dialog_children(file_dialog_tag: str):
+    from dearpygui import dearpygui as dpg
     for item_id in dpg.get_item_children(file_dialog_tag)[1]:
         dpg.delete_item(item_id)
 
@@ -257,14 +279,15 @@ def create_directory_if_not_existed(directory: Path):
 
 
 def cache_undo_action(func):
+    """Group the undo actions recorded by the decorated node editor operation so they are undone at once"""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         node_editor_project = args[0].node_editor_project_instance
-        return_value = func(*args, **kwargs)
-        if not node_editor_project.init_flag:
-            node_editor_project.reset_undo_streak()
-            node_editor_project.project_save_to_folder(is_cache=True)
-        return return_value
+        node_editor_project.undo_journal.begin_group()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            node_editor_project.end_undo_group()
 
     return wrapper
 
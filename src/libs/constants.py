@@ -9,6 +9,7 @@
 TOOLS_VIEWER_LOG_DIR = LOCALAPPDATA / 'Logs' / f'{TOOLS_VIEWER_APP_NAME}.log'
 CACHE_DIR = LOCALAPPDATA / 'Cache'
 INTERMEDIATE_DIR = LOCALAPPDATA / 'Intermediate'
+COMPILED_TOOLS_DIR = INTERMEDIATE_DIR / 'CompiledTools'
 LAST_SESSIONS_DIR = LOCALAPPDATA / 'LastSessions'
 RECENT_PROJECTS_STORAGE_FILE_PATH = LOCALAPPDATA / 'recent_projects.json'
 TEMP_DIR = Path(os.environ.get('temp'))
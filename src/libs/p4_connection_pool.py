@@ -0,0 +1,171 @@
+"""
+Pool of connected Perforce instances keyed by (port, user, client, charset), so the helpers and nodes asking for the
+same settings reuse one authenticated session instead of connecting and logging in every time.
+"""
+import contextlib
+import logging
+import time
+from threading import Condition
+from typing import Callable, Optional
+
+import P4
+
+P4_POOL_MAX_SIZE = 8
+# Idle connections are disconnected after this many seconds
+P4_POOL_IDLE_TIMEOUT = 300
+# Idle connections are checked against the server when reused after this many seconds
+P4_POOL_HEALTH_CHECK_INTERVAL = 60
+
+logger = logging.getLogger('')
+
+
+class _PooledConnection:
+    __slots__ = ('p4', 'key', 'last_used_time', 'last_checked_time')
+
+    def __init__(self, p4: P4.P4, key: tuple):
+        self.p4 = p4
+        self.key = key
+        self.last_used_time = time.monotonic()
+        self.last_checked_time = self.last_used_time
+
+
+class P4ConnectionPool:
+    """
+    Connected P4 instances, at most max size of them. An acquired instance is used by its caller only until released,
+    idle instances are reused by the next caller asking for the same settings once checked to be still connected
+    """
+
+    @property
+    def connection_count(self) -> int:
+        with self._condition:
+            return len(self._connection_dict)
+
+    @property
+    def connect_count(self) -> int:
+        return self._connect_count
+
+    def __init__(self, max_size=P4_POOL_MAX_SIZE, idle_timeout=P4_POOL_IDLE_TIMEOUT,
+                 health_check_interval=P4_POOL_HEALTH_CHECK_INTERVAL, p4_factory: Callable[[], P4.P4] = P4.P4):
+        self._max_size = max_size
+        self._idle_timeout = idle_timeout
+        self._health_check_interval = health_check_interval
+        self._p4_factory = p4_factory
+        # id of the P4 instance -> pooled connection, whether idle or acquired
+        self._connection_dict = {}
+        # Idle pooled connections, least recently used first
+        self._idle_connection_list = []
+        self._connect_count = 0
+        self._condition = Condition()
+
+    def acquire(self, port: str, user: str, client: str, charset: str, password='',
+                timeout: Optional[float] = None) -> P4.P4:
+        """
+        Get a connected P4 instance for the settings, waiting for one to be released if the pool is full
+
+        :param port: P4PORT
+        :param user: P4USER
+        :param client: P4CLIENT
+        :param charset: P4CHARSET
+        :param password: P4PASSWD, used when the instance gets (re)connected
+        :param timeout: seconds to wait for a connection, None to wait as long as needed
+        :return: P4 instance, to be handed back with release
+        """
+        key = (port, user, client, charset)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                self._evict_idle_connections()
+                connection = self._pop_idle_connection(key)
+                if connection is not None:
+                    break
+                if len(self._connection_dict) < self._max_size or self._idle_connection_list:
+                    if len(self._connection_dict) >= self._max_size:
+                        self._disconnect(self._idle_connection_list.pop(0))
+                    connection = _PooledConnection(self._create_p4(key, password), key)
+                    self._connection_dict[id(connection.p4)] = connection
+                    break
+                remaining_time = None if deadline is None else deadline - time.monotonic()
+                if remaining_time is not None and remaining_time <= 0:
+                    raise P4.P4Exception(f'No Perforce connection released within {timeout}s, '
+                                         f'{self._max_size} connections in use')
+                self._condition.wait(remaining_time)
+        connection.p4.password = password or connection.p4.password
+        try:
+            self._ensure_connected(connection)
+        except Exception:
+            self.release(connection.p4, is_broken=True)
+            raise
+        return connection.p4
+
+    def release(self, p4: P4.P4, is_broken=False):
+        """
+        Hand back an acquired P4 instance
+
+        :param p4: P4 instance got from acquire
+        :param is_broken: disconnect the instance instead of keeping it for the next callers
+        :return:
+        """
+        with self._condition:
+            connection = self._connection_dict.get(id(p4), None)
+            if connection is None or connection in self._idle_connection_list:
+                return
+            connection.last_used_time = time.monotonic()
+            if is_broken:
+                self._disconnect(connection)
+            else:
+                self._idle_connection_list.append(connection)
+            self._condition.notify()
+
+    @contextlib.contextmanager
+    def connection(self, port: str, user: str, client: str, charset: str, password=''):
+        p4 = self.acquire(port, user, client, charset, password)
+        try:
+            yield p4
+        finally:
+            self.release(p4)
+
+    def close(self):
+        """Disconnect every idle connection"""
+        with self._condition:
+            while self._idle_connection_list:
+                self._disconnect(self._idle_connection_list.pop())
+
+    def _create_p4(self, key: tuple, password: str) -> P4.P4:
+        p4 = self._p4_factory()
+        p4.port, p4.user, p4.client, p4.charset = key
+        p4.password = password
+        return p4
+
+    def _pop_idle_connection(self, key: tuple) -> Optional[_PooledConnection]:
+        for index in range(len(self._idle_connection_list) - 1, -1, -1):
+            if self._idle_connection_list[index].key == key:
+                return self._idle_connection_list.pop(index)
+        return None
+
+    def _evict_idle_connections(self):
+        expired_time = time.monotonic() - self._idle_timeout
+        while self._idle_connection_list and self._idle_connection_list[0].last_used_time < expired_time:
+            self._disconnect(self._idle_connection_list.pop(0))
+
+    def _disconnect(self, connection: _PooledConnection):
+        del self._connection_dict[id(connection.p4)]
+        try:
+            if connection.p4.connected():
+                connection.p4.disconnect()
+        except P4.P4Exception:
+            logger.debug('Could not disconnect pooled Perforce connection', exc_info=True)
+
+    def _ensure_connected(self, connection: _PooledConnection):
+        p4 = connection.p4
+        if p4.connected() and time.monotonic() - connection.last_checked_time > self._health_check_interval:
+            # The server may have dropped a connection idle for a while without the client knowing yet
+            try:
+                p4.run_info()
+            except P4.P4Exception:
+                logger.debug(f'Pooled Perforce connection to {p4.port} got dropped, reconnecting')
+                with contextlib.suppress(P4.P4Exception):
+                    p4.disconnect()
+        if not p4.connected():
+            p4.connect()
+            self._connect_count += 1
+        connection.last_checked_time = time.monotonic()
@@ -0,0 +1,213 @@
+"""
+Local cache of the fstat metadata of depot files, kept in SQLite so it outlives a tool run. A depot path pattern
+fetched once is then only asked to the server for the files changed by the changelists submitted since, which the
+highest submitted changelist number tells apart with a single query.
+"""
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+P4_FSTAT_CACHE_FIELDS = ('depotFile', 'clientFile', 'headRev', 'haveRev', 'action', 'headAction', 'headType',
+                         'headChange', 'fileSize')
+# Patterns are fetched whole again after this many seconds, since syncs made by other applications (e.g. P4V) change
+# the have revisions without any changelist telling it
+P4_FSTAT_CACHE_MAX_AGE = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    client_key TEXT NOT NULL,
+    depot_file_key TEXT NOT NULL,
+    depotFile TEXT, clientFile TEXT, headRev TEXT, haveRev TEXT, action TEXT, headAction TEXT, headType TEXT,
+    headChange TEXT, fileSize TEXT,
+    PRIMARY KEY (client_key, depot_file_key)
+);
+CREATE TABLE IF NOT EXISTS patterns (
+    client_key TEXT NOT NULL,
+    pattern_key TEXT NOT NULL,
+    change INTEGER NOT NULL,
+    refresh_time REAL NOT NULL,
+    PRIMARY KEY (client_key, pattern_key)
+);
+"""
+
+
+class P4FstatCache:
+    """
+    Fstat metadata of the files of depot syntax patterns, per server and client. Patterns in client or local syntax,
+    or with a revision specifier, are always asked to the server
+    """
+
+    @property
+    def server_query_count(self) -> int:
+        return self._server_query_count
+
+    def __init__(self, db_path, max_age=P4_FSTAT_CACHE_MAX_AGE):
+        self._db_path = Path(db_path)
+        self._max_age = max_age
+        self._connection = None
+        self._server_query_count = 0
+        # The cache is updated from the sync worker threads
+        self._lock = threading.Lock()
+
+    def run_fstat(self, p4, paths) -> list:
+        """
+        Get the fstat records of the files of paths, as p4.run_fstat('-Ol', paths) restricted to the cached fields
+
+        :param p4: connected P4 instance
+        :param paths: p4 file patterns
+        :return: list of fstat dicts
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+        cached_paths = [path for path in paths if self._is_cacheable(p4, path)]
+        fstats = self._run_server_fstat(p4, [path for path in paths if path not in cached_paths])
+        if not cached_paths:
+            return fstats
+        client_key = self._get_client_key(p4)
+        last_changes = self._run_server_query(p4.run_changes, '-m1', '-s', 'submitted')
+        current_change = int(last_changes[0]['change']) if last_changes else 0
+        with self._lock:
+            pattern_dict = self._get_pattern_dict(client_key, cached_paths)
+        stale_path_dict = {}
+        uncached_paths = []
+        for path in cached_paths:
+            pattern_state = pattern_dict.get(path.lower(), None)
+            if pattern_state is None or time.time() - pattern_state[1] > self._max_age:
+                uncached_paths.append(path)
+            elif pattern_state[0] < current_change:
+                stale_path_dict.setdefault(pattern_state[0], []).append(path)
+        refresh_time = time.time()
+        if uncached_paths:
+            # Fetched before clearing, so a failed query leaves the previous state untouched
+            uncached_fstats = self._run_server_fstat(p4, uncached_paths)
+            with self._lock, self._get_connection() as connection:
+                for path in uncached_paths:
+                    self._delete_pattern_files(connection, client_key, path)
+                self._upsert_files(connection, client_key, uncached_fstats)
+                self._set_pattern_state(connection, client_key, uncached_paths, current_change, refresh_time)
+        for change, stale_paths in stale_path_dict.items():
+            # Only the files with a revision submitted after the change the pattern was last fetched at
+            delta_fstats = self._run_server_fstat(p4, [f'{path}@{change + 1},@now' for path in stale_paths])
+            with self._lock, self._get_connection() as connection:
+                self._upsert_files(connection, client_key, delta_fstats)
+                self._set_pattern_state(connection, client_key, stale_paths, current_change, None)
+        with self._lock:
+            for path in cached_paths:
+                fstats.extend(self._select_pattern_files(client_key, path))
+        return fstats
+
+    def record_synced_revisions(self, p4, sync_results: list):
+        """
+        Update the have revisions of the files synced by a p4 sync
+
+        :param p4: P4 instance which synced the files
+        :param sync_results: results of run_sync
+        :return:
+        """
+        client_key = self._get_client_key(p4)
+        row_list = [(None if result.get('action') == 'deleted' else result['rev'], client_key,
+                     result['depotFile'].lower())
+                    for result in sync_results if isinstance(result, dict) and 'depotFile' in result]
+        if not row_list:
+            return
+        with self._lock, self._get_connection() as connection:
+            connection.executemany('UPDATE files SET haveRev = ? WHERE client_key = ? AND depot_file_key = ?',
+                                   row_list)
+
+    def clear(self):
+        with self._lock, self._get_connection() as connection:
+            connection.execute('DELETE FROM files')
+            connection.execute('DELETE FROM patterns')
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    @staticmethod
+    def _is_cacheable(p4, path) -> bool:
+        return path.startswith('//') and not path.lower().startswith(f'//{p4.client.lower()}/') and \
+            '#' not in path and '@' not in path
+
+    @staticmethod
+    def _get_client_key(p4) -> str:
+        return f'{p4.port}|{p4.client}'.lower()
+
+    def _run_server_query(self, run, *args) -> list:
+        self._server_query_count += 1
+        return run(*args)
+
+    def _run_server_fstat(self, p4, paths) -> list:
+        if not paths:
+            return []
+        with p4.at_exception_level(1):
+            # Patterns without any file are reported as warnings
+            fstats = self._run_server_query(p4.run_fstat, '-Ol', '-T', ','.join(P4_FSTAT_CACHE_FIELDS), paths)
+        return [fstat for fstat in fstats if isinstance(fstat, dict) and 'depotFile' in fstat]
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._db_path.parent.mkdir(parents=True, exist_ok=True)
+            # Node Editor and Tools Viewer may share the cache, wait for the other one to be done writing
+            self._connection = sqlite3.connect(self._db_path, timeout=30, check_same_thread=False)
+            self._connection.executescript(_SCHEMA)
+        return self._connection
+
+    def _get_pattern_dict(self, client_key: str, paths: list) -> dict:
+        connection = self._get_connection()
+        pattern_key_set = set(path.lower() for path in paths)
+        return {pattern_key: (change, refresh_time) for pattern_key, change, refresh_time in connection.execute(
+            'SELECT pattern_key, change, refresh_time FROM patterns WHERE client_key = ?', (client_key,))
+            if pattern_key in pattern_key_set}
+
+    @staticmethod
+    def _set_pattern_state(connection: sqlite3.Connection, client_key: str, paths: list, change: int, refresh_time):
+        if refresh_time is None:
+            connection.executemany('UPDATE patterns SET change = ? WHERE client_key = ? AND pattern_key = ?',
+                                   [(change, client_key, path.lower()) for path in paths])
+        else:
+            connection.executemany('INSERT OR REPLACE INTO patterns VALUES (?, ?, ?, ?)',
+                                   [(client_key, path.lower(), change, refresh_time) for path in paths])
+
+    @staticmethod
+    def _upsert_files(connection: sqlite3.Connection, client_key: str, fstats: list):
+        connection.executemany(
+            f'INSERT OR REPLACE INTO files VALUES (?, ?, {", ".join("?" * len(P4_FSTAT_CACHE_FIELDS))})',
+            [(client_key, fstat['depotFile'].lower()) + tuple(fstat.get(field, None)
+                                                               for field in P4_FSTAT_CACHE_FIELDS)
+             for fstat in fstats])
+
+    def _delete_pattern_files(self, connection: sqlite3.Connection, client_key: str, path: str):
+        prefix, pattern_regex = _compile_depot_pattern(path)
+        depot_file_key_list = [(client_key, depot_file_key) for depot_file_key, in connection.execute(
+            'SELECT depot_file_key FROM files WHERE client_key = ? AND depot_file_key >= ? AND depot_file_key < ?',
+            (client_key, prefix, prefix + '\uffff')) if pattern_regex.fullmatch(depot_file_key)]
+        connection.executemany('DELETE FROM files WHERE client_key = ? AND depot_file_key = ?', depot_file_key_list)
+
+    def _select_pattern_files(self, client_key: str, path: str) -> list:
+        prefix, pattern_regex = _compile_depot_pattern(path)
+        fstats = []
+        for row in self._get_connection().execute(
+                f'SELECT depot_file_key, {", ".join(P4_FSTAT_CACHE_FIELDS)} FROM files '
+                f'WHERE client_key = ? AND depot_file_key >= ? AND depot_file_key < ? ORDER BY depot_file_key',
+                (client_key, prefix, prefix + '\uffff')):
+            if pattern_regex.fullmatch(row[0]):
+                fstats.append({field: value for field, value in zip(P4_FSTAT_CACHE_FIELDS, row[1:])
+                               if value is not None})
+        return fstats
+
+
+def _compile_depot_pattern(path: str):
+    """
+    Get the lower-cased prefix of a depot path pattern before its first wildcard, and the regex of the lower-cased
+    depot files matching it
+    """
+    path = path.lower()
+    pattern_regex = re.compile(''.join('.*' if token == '...' else '[^/]*' if token == '*' or token.startswith('%%')
+                                       else re.escape(token)
+                                       for token in re.split(r'(\.\.\.|\*|%%\d)', path) if token))
+    prefix = re.split(r'\.\.\.|\*|%%\d', path, maxsplit=1)[0]
+    return prefix, pattern_regex
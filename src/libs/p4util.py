@@ -3,20 +3,58 @@
 import time
 import tempfile
 import contextlib
+import hashlib
+import heapq
+import json
+import math
+import queue
+import re
+import threading
+from multiprocessing.pool import ThreadPool
 from datetime import datetime, timedelta
 import genericpath
 import os
 from pathlib import Path
-from core.utils import create_queueHandler_logger
+from core.utils import create_queueHandler_logger, write_file_bytes_atomically
+from core.event_scope import get_event_resource
+from libs.constants import INTERMEDIATE_DIR
+from libs.p4_connection_pool import P4ConnectionPool
+from libs.p4_fstat_cache import P4FstatCache, P4_FSTAT_CACHE_MAX_AGE
 import P4
 
 
-class SyncProgress(P4.TextProgress):
-    def done(self, fail):
-        print("sync with '%s"'' % fail)
+class SyncProgress:
+    """Files and bytes synced so far by a parallel sync, reported after every synced chunk"""
+
+    def __init__(self, chunks, completed_indices):
+        self.total_file_count = sum(len(chunk) for chunk, chunk_size in chunks)
+        self.total_size = sum(chunk_size for chunk, chunk_size in chunks)
+        self.synced_file_count = sum(len(chunks[index][0]) for index in completed_indices)
+        self.synced_size = sum(chunks[index][1] for index in completed_indices)
+
+    def add_synced_chunk(self, chunk):
+        self.synced_file_count += len(chunk[0])
+        self.synced_size += chunk[1]
+
+    def __str__(self):
+        return '{0}/{1} files, {2:.1f}/{3:.1f} MB'.format(self.synced_file_count, self.total_file_count,
+                                                          self.synced_size / 2 ** 20, self.total_size / 2 ** 20)
 
 
 logger = logging.getLogger()
+# Connections shared by the helpers and nodes using the same Perforce settings
+p4_connection_pool = P4ConnectionPool()
+# Maximum number of files passed to a single p4 command by the batched helpers
+P4_COMMAND_CHUNK_SIZE = 1000
+# Connections syncing at the same time in the parallel syncs, each getting a few chunks of files
+P4_SYNC_WORKER_COUNT = 4
+P4_SYNC_CHUNKS_PER_WORKER = 4
+# Chunks of the syncs of exact file revisions in progress, so interrupted syncs resume where they stopped
+P4_SYNC_JOURNAL_DIR = INTERMEDIATE_DIR / 'PerforceSync'
+# Older journals are dropped, the files may have been synced by other means since
+P4_SYNC_JOURNAL_MAX_AGE = P4_FSTAT_CACHE_MAX_AGE
+# Fstat metadata of depot files kept across tool runs, updated from the changelists submitted since
+p4_fstat_cache = P4FstatCache(INTERMEDIATE_DIR / 'P4FstatCache.db')
 
 
 def setup_p4_logger(logger_queue, debug_mode: bool):
@@ -36,8 +74,9 @@ def p4Connect(p4inst):
     and disconnects on exit if it wasn't connected.
 
     In other words the connection state of the passed p4 instance will be preserved
-    on exit.
+    on exit. Without a p4 instance, see getP4inst.
     """
+    p4inst = getP4inst(p4inst)
     connected = p4inst.connected()
     if not connected:
         p4inst.connect()
@@ -50,12 +89,22 @@ def p4Connect(p4inst):
 
 
 def createP4Instance(user: str, password: str, port: str, client: str, charset: str) -> P4.P4:
+    """
+    Returns a P4 instance for the settings. While an event runs, it is a pooled connection held by the event until it
+    ends, so the nodes of the event reuse one connection and the following events reuse it once released
+    """
+    try:
+        p4 = _get_event_p4_connection(port, user, client, charset, password)
+        if p4 is not None:
+            return p4
+    except P4.P4Exception:
+        # Let the caller report the failure when it connects, as for non pooled instances
+        logger.warning(f'Could not connect to Perforce server {port}', exc_info=True)
     p4 = P4.P4()
     p4.user = user
     p4.password = password
     p4.port = port
     p4.charset = charset
-    # p4.progress = SyncProgress()
     p4.client = client
 
     return p4
@@ -99,12 +148,25 @@ def getP4inst(p4inst, **kwargs):
 
     This is a convenience function for methods that accept an optional p4
     instance argument and want to construct one if it is not supplied.
+    Without keyword args and while an event runs, the instance is the pooled
+    connection held by the event for the settings P4 reads from the environment.
     """
     if p4inst is None:
-        return P4.P4(**kwargs)
+        p4inst = P4.P4(**kwargs)
+        if not kwargs:
+            return _get_event_p4_connection(p4inst.port, p4inst.user, p4inst.client, p4inst.charset,
+                                            p4inst.password) or p4inst
     return p4inst
 
 
+def _get_event_p4_connection(port, user, client, charset, password):
+    """Returns the pooled connection held by the running event for the settings, None outside of an event"""
+    return get_event_resource(
+        ('p4', port, user, client, charset),
+        lambda: p4_connection_pool.acquire(port, user, client, charset, password),
+        lambda p4: p4_connection_pool.release(p4, is_broken=not p4.connected()))
+
+
 def splitrev(path):
     """
     Split the revision from a perforce pathname.
@@ -205,35 +267,13 @@ def __exit__(self, exc_type, exc_value, traceback):
 
 def getLatestRevision(f, p4inst=None):
     """
-    Syncs to the latest revision of file(s)
+    Syncs to the latest revision of file(s), see sync_in_parallel
 
     No special handling is done for paths that contain revision specifiers, meaning
     that if any path has a revision specifier, it will be synced to that revision.
     """
-    if isinstance(f, str):
-        f = [f]
-    p4inst = getP4inst(p4inst)
-    toSync = []
     logger.debug("getLatestRevision input files: %s" % f)
-    with p4Connect(p4inst) as p4:
-        for fstat in p4.run_fstat(f):
-            logger.debug(fstat)
-            if 'headRev' not in fstat:
-                # Marked for add/integrate/copy/etc
-                continue
-            if 'haveRev' not in fstat:
-                if 'delete' in fstat['headAction']:
-                    # Deleted and we don't have it
-                    continue
-                toSync.append(fstat['depotFile'])
-            elif fstat['haveRev'] != fstat['headRev']:
-                toSync.append(fstat['depotFile'])
-
-        if toSync:
-            logger.debug("Syncing:\n%s" % '\n'.join(toSync))
-            return p4.run_sync(toSync)
-
-    return []
+    return sync_in_parallel(f, p4inst)
 
 
 def lookup_rev(depotpath, change=None, description=None, p4inst=None):
@@ -402,83 +442,119 @@ def getDepotPath(path, p4inst=None):
 
 
 def p4EditOrAdd(fpaths, changeid=None, p4inst=None, exclusive=True, check_permissions=False):
-    """Marks one or more files for edit if it is tracked by p4 or add if it is not"""
+    """
+    Marks one or more files for edit if it is tracked by p4 or add if it is not
+
+    The files are synced, located, fstat-ed and opened in chunks of P4_COMMAND_CHUNK_SIZE
+    files per command rather than one file at a time. Nothing gets opened if any file
+    is opened by another user, the CheckedOutException lists all of them.
+    """
+    # if fpaths is a string wrap it in a list
+    if isinstance(fpaths, (str, os.PathLike)):
+        fpaths = [fpaths]
+    fpaths = [str(fpath) for fpath in fpaths]
     with p4Connect(getP4inst(p4inst)) as p4:
         with p4.at_exception_level(1):
-            # if fpaths is a string wrap it in a list
-            if isinstance(fpaths, (str, os.PathLike)):
-                if isinstance(fpaths, os.PathLike):
-                    fpaths = str(fpaths)
-                fpaths = [fpaths]
             expanded_fpaths = []
-            for fpath in fpaths:
+            for chunk in chunk_list(fpaths, P4_COMMAND_CHUNK_SIZE):
                 # to prevent issues with fstat we need to expand wildcards
                 # to find the local files we need to sync file patterns
-                p4inst.run_sync(fpath)
-                fpath = p4inst.run_where(fpath)[0]['path']
-                fpath = fpath.replace('%%1', '*').replace('%%2', '*')
-                if '...' in fpath or '*' in fpath:
-                    dots = fpath.index('...') if '...' in fpath else len(fpath)
-                    star = fpath.index('*') if '*' in fpath else len(fpath)
-                    first_wildcard = min([dots, star])
-                    pattern = fpath[first_wildcard:]
-                    fpath = Path(fpath[:first_wildcard])
-                    # not an exact equivalent since ... is 1+ directories and ** is 0+ directories
-                    pattern = pattern.replace('...', '**')
-                    if pattern.endswith('**'):
-                        pattern = pattern[:-3] + '**\\*'
-                    for match in fpath.rglob(pattern):
-                        if match.is_file():
-                            expanded_fpaths.append(str(match))
-                else:
-                    expanded_fpaths.append(fpath)
+                p4_fstat_cache.record_synced_revisions(p4, p4.run_sync(chunk))
+                for where in p4.run_where(chunk):
+                    if 'unmap' not in where:
+                        expanded_fpaths.extend(_expand_local_wildcards(where['path']))
+            edit_fpaths, add_fpaths = _partition_edit_and_add_files(p4, expanded_fpaths, exclusive)
+            args = ['-c', changeid] if changeid else []
             results = []
-            for fpath in expanded_fpaths:
-                if changeid:
-                    args = ['-c', changeid, fpath]
-                else:
-                    args = [fpath]
-                fstats = p4.run_fstat(fpath)
-                if fstats:
-                    fstat = fstats[0]
-                    if 'action' in fstat:
-                        if fstat.get('action') == 'branch' or fstat.get('action') == 'integrate':
-                            results.extend(p4.run_edit(*args))
-                        continue
-                    elif 'otherOpen' in fstat and (exclusive or '+l' in fstat['headType']):
-                        # check the file permissions
-                        raise CheckedOutException(
-                            "File is opened by another user ({0}): {1}".format(fstat['otherOpen'], fpath)
-                        )
-                    elif 'headAction' not in fstat or 'delete' in fstat['headAction']:
-                        # Opened for add/move by another user, or it has been deleted
-                        results.extend(p4.run_add(*args))
-                    else:
-                        results.extend(p4.run_edit(*args))
-                else:
-                    # use p4 opened -a filepath to see if another user has the file open for add
-                    opened = p4.run_opened('-a', fpath)
-                    # QUESTION - Do we want to add the file if it isn't exclusive?
-                    #            If yes, we need to check if +l is in opened[0]['type'] be for raising
-                    #            if opened and '+l' in opened[0]['type']:
-                    if opened and (exclusive or '+l' in opened[0]['type']):
-                        raise CheckedOutException(
-                            'File is opened by another user ({0}@{1}): {2}'.format(
-                                opened[0]['user'], opened[0]['client'], fpath
-                            )
-                        )
-                    results.extend(p4.run_add(*args))
-
-                if check_permissions:
-                    local = p4.run_where(fpath)[0]['path']
-                    if os.path.isfile(local):
-                        os.chmod(local, stat.S_IWRITE)
+            for chunk in chunk_list(edit_fpaths, P4_COMMAND_CHUNK_SIZE):
+                results.extend(p4.run_edit(*args, chunk))
+            for chunk in chunk_list(add_fpaths, P4_COMMAND_CHUNK_SIZE):
+                results.extend(p4.run_add(*args, chunk))
+
+            if check_permissions:
+                for fpath in edit_fpaths + add_fpaths:
+                    if os.path.isfile(fpath):
+                        os.chmod(fpath, stat.S_IWRITE)
 
             if not results:
                 return None
             return results
 
 
+def _expand_local_wildcards(fpath):
+    """Returns the local files matching a local path which may contain p4 wildcards"""
+    fpath = fpath.replace('%%1', '*').replace('%%2', '*')
+    if '...' not in fpath and '*' not in fpath:
+        return [fpath]
+    dots = fpath.index('...') if '...' in fpath else len(fpath)
+    star = fpath.index('*') if '*' in fpath else len(fpath)
+    first_wildcard = min([dots, star])
+    pattern = fpath[first_wildcard:]
+    fpath = Path(fpath[:first_wildcard])
+    # not an exact equivalent since ... is 1+ directories and ** is 0+ directories
+    pattern = pattern.replace('...', '**')
+    if pattern.endswith('**'):
+        pattern = pattern[:-3] + '**\\*'
+    return [str(match) for match in fpath.rglob(pattern) if match.is_file()]
+
+
+def _partition_edit_and_add_files(p4, fpaths, exclusive):
+    """
+    Splits local files into the ones to open for edit and the ones to open for add,
+    with one fstat per chunk of files, and one where and opened -a per chunk of files
+    unknown to the depot.
+    Raises CheckedOutException listing the files opened by another user.
+    """
+    edit_fpaths = []
+    add_fpaths = []
+    conflicts = []
+    for chunk in chunk_list(fpaths, P4_COMMAND_CHUNK_SIZE):
+        fstat_dict = {_normalize_local_path(fstat['clientFile']): fstat
+                      for fstat in p4.run_fstat(chunk) if isinstance(fstat, dict) and 'clientFile' in fstat}
+        untracked_fpaths = []
+        for fpath in chunk:
+            fstat = fstat_dict.get(_normalize_local_path(fpath), None)
+            if fstat is None:
+                untracked_fpaths.append(fpath)
+            elif 'action' in fstat:
+                if fstat.get('action') == 'branch' or fstat.get('action') == 'integrate':
+                    edit_fpaths.append(fpath)
+            elif 'otherOpen' in fstat and (exclusive or '+l' in fstat['headType']):
+                conflicts.append("File is opened by another user ({0}): {1}".format(fstat['otherOpen'], fpath))
+            elif 'headAction' not in fstat or 'delete' in fstat['headAction']:
+                # Opened for add/move by another user, or it has been deleted
+                add_fpaths.append(fpath)
+            else:
+                edit_fpaths.append(fpath)
+        if not untracked_fpaths:
+            continue
+        # use p4 opened -a to see if another user has the files open for add
+        depot_fpath_dict = {where['depotFile'].lower(): where['path'] for where in p4.run_where(untracked_fpaths)
+                            if 'unmap' not in where}
+        opened_dict = {}
+        # without files opened -a would list every opened file of the server
+        for opened in p4.run_opened('-a', list(depot_fpath_dict)) if depot_fpath_dict else []:
+            local = depot_fpath_dict.get(opened['depotFile'].lower(), None)
+            if local is not None:
+                opened_dict.setdefault(_normalize_local_path(local), opened)
+        for fpath in untracked_fpaths:
+            opened = opened_dict.get(_normalize_local_path(fpath), None)
+            # QUESTION - Do we want to add the file if it isn't exclusive?
+            if opened and (exclusive or '+l' in opened['type']):
+                conflicts.append('File is opened by another user ({0}@{1}): {2}'.format(
+                    opened['user'], opened['client'], fpath
+                ))
+            else:
+                add_fpaths.append(fpath)
+    if conflicts:
+        raise CheckedOutException('\n'.join(conflicts))
+    return edit_fpaths, add_fpaths
+
+
+def _normalize_local_path(fpath):
+    return os.path.normcase(os.path.normpath(fpath))
+
+
 def sync_and_clobber(paths, p4inst=None):
     """
     Sync files and clobber any that are locally writable or missing.
@@ -509,6 +585,243 @@ def sync_and_clobber(paths, p4inst=None):
             return result
 
 
+def sync_in_parallel(paths, p4inst=None, worker_count=P4_SYNC_WORKER_COUNT, progress_callback=None):
+    """
+    Syncs the out of date files of one or more paths to their head revision, over up to worker_count
+    pooled connections at once.
+
+    The files are split into chunks of about the same total size. Every synced chunk updates the
+    have revisions of the fstat cache, so if the sync gets interrupted, calling this again plans
+    the sync again at head: the files of the chunks already synced are skipped unless a newer
+    revision got submitted since.
+
+    Args:
+        paths (str, list): p4-compatible file patterns
+        p4inst: perforce instance, its settings are used for the other connections
+        worker_count (int): number of chunks synced at the same time
+        progress_callback (callable, optional): called with the SyncProgress after every synced chunk
+
+    Returns:
+        list: results of the sync commands
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    p4 = getP4inst(p4inst)
+    with p4Connect(p4):
+        file_revisions = _get_out_of_date_file_revisions(p4, paths)
+        chunks = _split_into_balanced_chunks(file_revisions, worker_count)
+        return _sync_chunks_in_parallel(p4, chunks, None, worker_count, progress_callback)
+
+
+def sync_file_revisions_in_parallel(file_revisions, p4inst=None, worker_count=P4_SYNC_WORKER_COUNT,
+                                    progress_callback=None, clobber_on_error=False):
+    """
+    Syncs exact file revisions, over up to worker_count pooled connections at once.
+    If the sync gets interrupted, calling this again with the same file revisions within
+    P4_SYNC_JOURNAL_MAX_AGE seconds resumes it: the chunks already synced are skipped.
+
+    Args:
+        file_revisions (list): tuples of file revision (e.g. //depot/file#3 or //depot/file#0) and size in bytes
+        p4inst: perforce instance, its settings are used for the other connections
+        worker_count (int): number of chunks synced at the same time
+        progress_callback (callable, optional): called with the SyncProgress after every synced chunk
+        clobber_on_error (bool): sync chunks failing to sync with sync_and_clobber
+
+    Returns:
+        list: results of the sync commands
+    """
+    p4 = getP4inst(p4inst)
+    with p4Connect(p4):
+        journal_path = _get_sync_journal_path(p4, [file_revision for file_revision, size in file_revisions])
+        chunks = _read_sync_journal_chunks(journal_path)
+        if chunks is None:
+            chunks = _split_into_balanced_chunks(file_revisions, worker_count)
+        return _sync_chunks_in_parallel(p4, chunks, journal_path, worker_count, progress_callback, clobber_on_error)
+
+
+def log_sync_progress(progress):
+    """Progress callback of the parallel syncs reporting to the p4 logger"""
+    logger.info(f'Synced {progress}')
+
+
+def _get_out_of_date_file_revisions(p4, paths):
+    """
+    Returns the head revision and size of the files of paths which are not synced to their head revision,
+    depot syntax paths being answered from the local fstat cache
+    """
+    file_revisions = []
+    for fstat in p4_fstat_cache.run_fstat(p4, paths):
+        if 'headRev' not in fstat:
+            # Marked for add/integrate/copy/etc
+            continue
+        if 'haveRev' not in fstat:
+            if 'delete' in fstat['headAction']:
+                # Deleted and we don't have it
+                continue
+        elif fstat['haveRev'] == fstat['headRev']:
+            continue
+        file_revisions.append(('{0}#{1}'.format(fstat['depotFile'], fstat['headRev']), int(fstat.get('fileSize', 0))))
+    return file_revisions
+
+
+def _split_into_balanced_chunks(file_revisions, worker_count):
+    """
+    Splits file revisions into chunks of about the same total size, largest files first, with a few
+    chunks per worker so the workers finishing early pick up the remaining ones
+
+    Returns:
+        list: chunks, each a tuple of its file revisions and its total size
+    """
+    chunk_count = min(len(file_revisions), max(worker_count * P4_SYNC_CHUNKS_PER_WORKER,
+                                               math.ceil(len(file_revisions) / P4_COMMAND_CHUNK_SIZE)))
+    chunk_heap = [(0, index, []) for index in range(chunk_count)]
+    for file_revision, size in sorted(file_revisions, key=lambda file_revision: -file_revision[1]):
+        chunk_size, index, chunk = heapq.heappop(chunk_heap)
+        chunk.append(file_revision)
+        heapq.heappush(chunk_heap, (chunk_size + size, index, chunk))
+    return [(sorted(chunk), chunk_size) for chunk_size, index, chunk in sorted(chunk_heap, key=lambda c: c[1])]
+
+
+def _sync_chunks_in_parallel(p4, chunks, journal_path, worker_count, progress_callback=None, clobber_on_error=False):
+    """
+    Syncs the chunks not recorded as synced in the journal, recording each chunk once synced.
+    The journal is removed once every chunk got synced, and kept if any chunk failed. Without
+    journal path every chunk is synced.
+    The chunks are synced over p4 and the pooled connections free right now, without waiting
+    for connections held by other events.
+    """
+    if not chunks:
+        return []
+    completed_indices = _start_sync_journal(journal_path, chunks) if journal_path is not None else set()
+    pending_indices = [index for index in range(len(chunks)) if index not in completed_indices]
+    progress = SyncProgress(chunks, completed_indices)
+    progress_lock = threading.Lock()
+    failed_event = threading.Event()
+    worker_p4_queue = queue.SimpleQueue()
+    worker_p4_queue.put(p4)
+    pooled_p4_list = _acquire_free_pooled_connections(p4, min(worker_count, len(pending_indices)) - 1)
+    for pooled_p4 in pooled_p4_list:
+        worker_p4_queue.put(pooled_p4)
+
+    def sync_chunk(index):
+        if failed_event.is_set():
+            return []
+        # Each connection syncs a single chunk at a time
+        worker_p4 = worker_p4_queue.get()
+        try:
+            chunk_results = _sync_chunk(worker_p4, chunks[index][0], clobber_on_error)
+        finally:
+            worker_p4_queue.put(worker_p4)
+        with progress_lock:
+            if journal_path is not None:
+                _record_synced_chunk(journal_path, index)
+            progress.add_synced_chunk(chunks[index])
+            if progress_callback is not None:
+                progress_callback(progress)
+        return chunk_results
+
+    results = []
+    try:
+        if not pooled_p4_list:
+            for index in pending_indices:
+                results.extend(sync_chunk(index))
+        else:
+            thread_pool = ThreadPool(len(pooled_p4_list) + 1)
+            try:
+                for chunk_results in thread_pool.imap_unordered(sync_chunk, pending_indices):
+                    results.extend(chunk_results)
+            except Exception:
+                # Let the running chunks finish so they get recorded, the next call resumes from there
+                failed_event.set()
+                raise
+            finally:
+                thread_pool.close()
+                thread_pool.join()
+    finally:
+        for pooled_p4 in pooled_p4_list:
+            p4_connection_pool.release(pooled_p4, is_broken=not pooled_p4.connected())
+    if journal_path is not None:
+        _remove_sync_journal(journal_path)
+    return results
+
+
+def _acquire_free_pooled_connections(p4, count):
+    """
+    Returns up to count pooled connections with the settings of p4, only the ones which
+    are free or can be opened right away
+    """
+    pooled_p4_list = []
+    for _ in range(count):
+        try:
+            pooled_p4_list.append(p4_connection_pool.acquire(p4.port, p4.user, p4.client, p4.charset, p4.password,
+                                                             timeout=0))
+        except P4.P4Exception:
+            break
+    return pooled_p4_list
+
+
+def _sync_chunk(p4, chunk, clobber_on_error):
+    try:
+        with p4.at_exception_level(1):
+            chunk_results = p4.run_sync(chunk)
+    except P4.P4Exception:
+        if not clobber_on_error:
+            raise
+        chunk_results = sync_and_clobber(chunk, p4inst=p4) or []
+    p4_fstat_cache.record_synced_revisions(p4, chunk_results)
+    return chunk_results
+
+
+def _get_sync_journal_path(p4, sync_args):
+    sync_key = '\n'.join([p4.port, p4.user, p4.client] + list(sync_args))
+    return P4_SYNC_JOURNAL_DIR / (hashlib.blake2b(sync_key.encode(), digest_size=16).hexdigest() + '.json')
+
+
+def _read_sync_journal_chunks(journal_path):
+    """
+    Returns the chunks of an interrupted sync, None if there is none. Journals older than
+    P4_SYNC_JOURNAL_MAX_AGE or unreadable are removed, the sync is then planned again
+    """
+    try:
+        if time.time() - journal_path.stat().st_mtime <= P4_SYNC_JOURNAL_MAX_AGE:
+            with open(journal_path, 'rb') as fp:
+                return [(chunk, chunk_size) for chunk, chunk_size in json.load(fp)]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        logger.warning(f'Could not read the sync journal {journal_path}, syncing again', exc_info=True)
+    _remove_sync_journal(journal_path)
+    return None
+
+
+def _start_sync_journal(journal_path, chunks):
+    """Writes the chunks of a sync unless resuming it, and returns the indices of the chunks already synced"""
+    completed_path = journal_path.with_suffix('.done')
+    if journal_path.exists():
+        try:
+            with open(completed_path, 'r') as fp:
+                # the last line may be partially written if the sync got killed
+                return set(int(line) for line in fp.read().split('\n')[:-1])
+        except OSError:
+            return set()
+    P4_SYNC_JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
+    if completed_path.exists():
+        completed_path.unlink()
+    write_file_bytes_atomically(journal_path, json.dumps(chunks).encode())
+    return set()
+
+
+def _record_synced_chunk(journal_path, index):
+    with open(journal_path.with_suffix('.done'), 'a') as fp:
+        fp.write(f'{index}\n')
+
+
+def _remove_sync_journal(journal_path):
+    for path in (journal_path, journal_path.with_suffix('.done')):
+        if path.exists():
+            path.unlink()
+
+
 def moveOutdatedFilesToNewChangeList(p4c, changeid, newchangeid=None):
     """
     Move any files in the given changelist that are not the latest revision to
@@ -759,7 +1072,7 @@ def sync_deleted(pattern, p4c):
         return
     with p4Connect(p4c):
         for chunk in chunk_list(deleted_files, 50):
-            p4c.run_sync(chunk)
+            p4_fstat_cache.record_synced_revisions(p4c, p4c.run_sync(chunk))
 
 
 def chunk_list(full_list, chunk_size):
@@ -772,7 +1085,7 @@ def delete_empty_changelists(p4c):
     delete empty changelists that are more than 1 day old
     """
     one_day = timedelta(days=1)
-    with p4c.connect():
+    with p4Connect(p4c):
         changes = p4c.run_changes('-c', p4c.client, '-u', p4c.user, '-s', 'pending')
         for change in changes:
             cl_time = datetime.fromtimestamp(float(change['time']))
@@ -800,8 +1113,9 @@ def get_non_underscored_files(pattern, banned_strings='/_', p4inst=None):
 
     Args:
         pattern (basestring): a p4-compatible file pattern.
-        banned_strings (list, optional): a list of strings that should be banned from
-            the filepaths. Not case-sensitive.
+        banned_strings (str, or list of strs, optional): a string or a list of strings that
+            should be banned from the filepaths. Not case-sensitive. Defaults to the files
+            in underscored folders.
         p4inst: perforce instance
 
     Returns:
@@ -809,14 +1123,8 @@ def get_non_underscored_files(pattern, banned_strings='/_', p4inst=None):
             banned strings in them.
     """
     p4c = getP4inst(p4inst)
-    with p4c.connect():
-        all_files = [f['depotFile'] for f in p4c.run_files('-e', pattern)]
-        approved_files = []
-        for file in all_files:
-            if any([banned_string.lower() in file.lower() for banned_string in banned_strings]):
-                continue
-            else:
-                approved_files.append(file)
+    with p4Connect(p4c):
+        approved_files = run_files_filtered(p4c, compile_path_filter(banned_strings), '-e', pattern)
     logger.info(f'Found {len(approved_files)} approved files with pattern "{pattern}"')
     return approved_files
 
@@ -831,16 +1139,16 @@ def sync_non_underscored_files(pattern, preview=False, p4inst=None):
         p4inst: perforce instance
         preview: show preview only
     """
-    file_list = get_non_underscored_files(pattern)
+    p4c = getP4inst(p4inst)
+    file_list = get_non_underscored_files(pattern, p4inst=p4c)
     if file_list:
-        p4c = getP4inst(p4inst)
-        with p4c.connect():
+        with p4Connect(p4c):
             if preview:
                 results = p4c.run_sync('-n', file_list)
                 logger.info('%s files are out-of-date and will be synced' % len(results))
             else:
                 logger.info('Syncing %s files...' % len(file_list))
-                results = p4c.run_sync(file_list)
+                results = sync_in_parallel(file_list, p4c, progress_callback=log_sync_progress)
                 logger.info('%s files were out-of-date' % len(results))
                 logger.info('Done syncing.')
     else:
@@ -860,27 +1168,84 @@ def unsync_underscored_files(patterns, p4inst=None):
     if not isinstance(patterns, list):
         patterns = [patterns]
 
+    is_not_underscored = compile_path_filter('/_')
     with p4Connect(p4inst) as p4:
-        pattern_iterator = 1
-        for p in patterns:
+        for pattern_iterator, p in enumerate(patterns, 1):
             logger.info(f'Gathering files for pattern {pattern_iterator} of {len(patterns)}: {p}')
-            filedata = [d['depotFile'] + '#0' for d in p4.run_files('-e', patterns) if '/_' in d['depotFile']]
+            filedata = [d + '#0' for d in run_files_filtered(p4, lambda d: not is_not_underscored(d), '-e', p)]
             if filedata:
-                total = len(filedata)
-                logger.info(f'Files:  {total}')
-
-                file_iterator = 0
-                for i, dpaths in enumerate(chunk_list(filedata, 1000)):
-                    file_iterator = file_iterator + 1000
-                    print(f'Chunk {i}: Files {file_iterator} of {total}')
-                    try:
-                        p4.run_sync(dpaths)
-                    except:
-                        sync_and_clobber(dpaths, p4inst=p4)
-
+                logger.info(f'Files:  {len(filedata)}')
+                sync_file_revisions_in_parallel([(dpath, 0) for dpath in filedata], p4,
+                                                progress_callback=log_sync_progress, clobber_on_error=True)
             else:
                 logger.info('Unsync list is 0 files, please check the p4 pattern.')
-            pattern_iterator += 1
+
+
+def compile_path_filter(banned_strings):
+    """
+    Returns a function telling whether a path contains none of the banned strings, not case-sensitive.
+
+    Args:
+        banned_strings (str, or list of strs): strings banned from the paths
+
+    Returns:
+        callable: function of a path returning False if the path contains any banned string
+    """
+    if isinstance(banned_strings, str):
+        banned_strings = [banned_strings]
+    banned_strings = set(banned_string.lower() for banned_string in banned_strings)
+    # a path containing a banned string also contains the banned strings it contains
+    banned_strings = tuple(banned_string for banned_string in banned_strings
+                           if not any(other != banned_string and other in banned_string for other in banned_strings))
+    if not banned_strings:
+        return lambda path: True
+    if len(banned_strings) == 1:
+        # a single string is found fastest by a compiled case-insensitive search, without lower-casing the path
+        search = re.compile(re.escape(banned_strings[0]), re.IGNORECASE).search
+        return lambda path: search(path) is None
+
+    # alternations of strings are slower in re than lower-casing the path once and looking for each string
+    def is_kept(path):
+        path = path.lower()
+        for banned_string in banned_strings:
+            if banned_string in path:
+                return False
+        return True
+
+    return is_kept
+
+
+class _DepotFileFilterHandler(P4.OutputHandler):
+    """Keeps the depot files accepted by a filter as p4 outputs them, dropping the other records"""
+
+    def __init__(self, is_kept):
+        P4.OutputHandler.__init__(self)
+        self.depot_files = []
+        self._is_kept = is_kept
+
+    def outputStat(self, stat):
+        if self._is_kept(stat['depotFile']):
+            self.depot_files.append(stat['depotFile'])
+        return P4.OutputHandler.HANDLED
+
+
+def run_files_filtered(p4, is_kept, *args):
+    """
+    Runs p4 files and returns the depot files accepted by is_kept, filtering the records as they
+    are received instead of building the list of all of them first.
+
+    Args:
+        p4: connected perforce instance
+        is_kept (callable): function of a depot file returning whether to keep it, e.g. from compile_path_filter
+        *args: arguments of p4 files
+
+    Returns:
+        list: the kept depot files
+    """
+    handler = _DepotFileFilterHandler(is_kept)
+    with p4.using_handler(handler):
+        p4.run_files(*args)
+    return handler.depot_files
 
 
 # ALIASES
@@ -9,7 +9,7 @@
 
 import psutil
 
-from core.executor import setup_executor_logger
+from core.executor import setup_executor_logger, setup_executor_parallel_mode
 from core.utils import json_load_from_file_path
 from libs.constants import NODE_EDITOR_APP_NAME, LOCALAPPDATA
 from libs.p4util import setup_p4_logger
@@ -19,8 +19,9 @@
 
 
 def main():
-    setting_file_path, packages_file_path, is_debug_mode, project_path = parse_argument()
+    setting_file_path, packages_file_path, is_debug_mode, project_path, parallel_worker_count = parse_argument()
     logger, logger_queue, queue_listener = setup_logger(is_debug_mode)
+    setup_executor_parallel_mode(parallel_worker_count)
     logger.info("***** Load Config *****")
     setting_dict = json_load_from_file_path(setting_file_path)
     packages_list = json_load_from_file_path(packages_file_path)['packages']
@@ -47,8 +48,9 @@ def parse_argument():
     packages_file_path = args.packages
     is_debug_mode = args.is_debug_mode
     project_path = args.project_path
+    parallel_worker_count = args.parallel_workers
 
-    return setting_file_path, packages_file_path, is_debug_mode, project_path
+    return setting_file_path, packages_file_path, is_debug_mode, project_path, parallel_worker_count
 
 
 def get_arg():
@@ -83,6 +85,13 @@ def get_arg():
         type=str,
     )
 
+    parser.add_argument(
+        "--parallel_workers",
+        type=int,
+        default=0,
+        help='Number of threads computing independent Pure nodes concurrently, 0 to disable'
+    )
+
     args = parser.parse_args()
     return args
 
@@ -9,7 +9,7 @@
 from multiprocessing import Queue
 from typing import Tuple
 import psutil
-from core.executor import setup_executor_logger
+from core.executor import setup_executor_logger, setup_executor_parallel_mode
 from core.utils import json_load_from_file_path
 from core.self_update import init_update_manager_ui
 
@@ -17,8 +17,9 @@
 
 
 def main():
-    setting_file_path, packages_file_path, is_debug_mode, project_path = parse_argument()
+    setting_file_path, packages_file_path, is_debug_mode, project_path, parallel_worker_count = parse_argument()
     logger, logger_queue, queue_listener = setup_logger(is_debug_mode)
+    setup_executor_parallel_mode(parallel_worker_count)
     logger.info("***** Load Config *****")
     setting_dict = json_load_from_file_path(setting_file_path)
     logger.info('**** DearPyGui Setup *****')
@@ -42,8 +43,9 @@ def parse_argument():
     packages_file_path = args.packages
     is_debug_mode = args.is_debug_mode
     project_path = args.project_path
+    parallel_worker_count = args.parallel_workers
 
-    return setting_file_path, packages_file_path, is_debug_mode, project_path
+    return setting_file_path, packages_file_path, is_debug_mode, project_path, parallel_worker_count
 
 
 def get_arg():
@@ -78,6 +80,13 @@ def get_arg():
         type=str,
     )
 
+    parser.add_argument(
+        "--parallel_workers",
+        type=int,
+        default=0,
+        help='Number of threads computing independent Pure nodes concurrently, 0 to disable'
+    )
+
     args = parser.parse_args()
     return args
 
@@ -4,6 +4,10 @@
 import os
 from libs.p4util import create_p4_inst
 
+# Workspace name generated per (user, port) when none is given, kept for the session so the pooled connection of the
+# previous runs gets reused
+generated_client_dict = {}
+
 
 class Node(BaseNode):
     """Opens a Perforce workspace"""
@@ -25,7 +29,9 @@ class Node(BaseNode):
     def run(internal_data_dict):
 
         if internal_data_dict['Client'] == '':
-            p4_client = internal_data_dict['User'] + '_' + os.environ['COMPUTERNAME'] + '_' + str(randint(100, 9999))
+            p4_client = generated_client_dict.setdefault(
+                (internal_data_dict['User'], internal_data_dict['Port']),
+                internal_data_dict['User'] + '_' + os.environ['COMPUTERNAME'] + '_' + str(randint(100, 9999)))
         else:
             p4_client = internal_data_dict['Client']
 
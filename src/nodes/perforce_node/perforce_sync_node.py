@@ -1,7 +1,7 @@
 from core.classes.node import BaseNode
 from core.enum_types import NodeTypeFlag, InputPinType
 from P4 import P4Exception
-from libs.p4util import get_latest_rev
+from libs.p4util import sync_in_parallel, log_sync_progress
 
 
 class Node(BaseNode):
@@ -21,9 +21,9 @@ def run(internal_data_dict):
         p4 = internal_data_dict['P4 Inst']
         try:
             sync_path = internal_data_dict['Sync path']
-            if sync_path:
-                get_latest_rev(sync_path, p4)
-            else:
-                get_latest_rev('', p4)
+            if not sync_path:
+                sync_path = f'//{p4.client}/...'
+            # Reports the synced files and bytes to the log as chunks get synced
+            sync_in_parallel(sync_path, p4, progress_callback=log_sync_progress)
         except P4Exception as e:
             return 4, e
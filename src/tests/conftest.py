@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from tests.headless import setup_headless_environment, is_fake_p4
+
+setup_headless_environment()
+
+
+@pytest.fixture
+def p4_server():
+    """Fake Perforce server, the P4 instances created by the tests connect to it"""
+    if not is_fake_p4():
+        pytest.skip('p4python is installed, the fake Perforce server is not in use')
+    import P4
+    server = P4.FakeServer()
+    P4.P4.default_server = server
+    yield server
+    P4.P4.default_server = P4.FakeServer()
+
+
+def pytest_addoption(parser):
+    parser.addoption('--benchmark', action='store_true', help='also run the timing benchmarks')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark: timing benchmark, only run with --benchmark')
+
+
+def pytest_collection_modifyitems(config, items):
+    """Timings depend on the load of the machine, the benchmarks only run when asked for"""
+    if config.getoption('--benchmark'):
+        return
+    skip_benchmark = pytest.mark.skip(reason='timing benchmark, run with --benchmark')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip_benchmark)
@@ -0,0 +1,389 @@
+"""
+In-memory stand-in of the p4python module, used as the P4 module by the tests and benchmarks when p4python is not
+installed. A FakeServer holds one depot (//depot/...), the have revisions of every client, the files opened by other
+users, and logs every command run against it, optionally waiting a fixed latency per command as a remote server would.
+"""
+import contextlib
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+DEPOT_ROOT = '//depot/'
+
+
+class P4Exception(Exception):
+    pass
+
+
+class OutputHandler:
+    REPORT = 0
+    HANDLED = 1
+    CANCEL = 2
+
+    def outputStat(self, stat):
+        return OutputHandler.REPORT
+
+
+class _FileRevision:
+    __slots__ = ('action', 'size', 'change', 'file_type')
+
+    def __init__(self, action, size, change, file_type):
+        self.action = action
+        self.size = size
+        self.change = change
+        self.file_type = file_type
+
+
+class FakeServer:
+    """
+    Depot, clients and command log of the fake P4 instances
+    """
+
+    def __init__(self, latency=0.0, client_root=None):
+        self.latency = latency
+        self.client_root = Path(client_root or Path(tempfile.gettempdir()) / 'fake_p4_workspace')
+        # depot file -> list of its revisions, revision n at index n - 1
+        self.revision_dict = {}
+        self.change = 0
+        # client -> {depot file lower: have revision}
+        self.have_dict = {}
+        # depot file lower -> (user, client, type, action) of the files opened by other users
+        self.other_opened_dict = {}
+        # client -> {depot file lower: action} of the files opened by the client
+        self.opened_dict = {}
+        # Syncs of any of these depot files fail, to simulate an interrupted sync
+        self.failing_sync_file_set = set()
+        self.is_down = False
+        self.connect_count = 0
+        self.connection_epoch = 0
+        self.call_log = []
+        # Number of commands waiting for the latency right now, and the most ever waiting at once
+        self.running_command_count = 0
+        self.peak_running_command_count = 0
+        self._lock = threading.RLock()
+
+    def submit(self, depot_file: str, size=1, action='edit', file_type='text') -> int:
+        """Submit a new revision of a depot file in its own changelist, returns the changelist number"""
+        with self._lock:
+            self.change += 1
+            revision_list = self.revision_dict.setdefault(depot_file, [])
+            if not revision_list and action == 'edit':
+                action = 'add'
+            revision_list.append(_FileRevision(action, size, self.change, file_type))
+            return self.change
+
+    def set_have_revision(self, client: str, depot_file: str, revision: int):
+        with self._lock:
+            have_dict = self.have_dict.setdefault(client.lower(), {})
+            if revision:
+                have_dict[depot_file.lower()] = revision
+            else:
+                have_dict.pop(depot_file.lower(), None)
+
+    def get_have_revision(self, client: str, depot_file: str) -> int:
+        return self.have_dict.get(client.lower(), {}).get(depot_file.lower(), 0)
+
+    def open_by_other(self, depot_file: str, user='other', client='other_ws', file_type='text', action='edit'):
+        self.other_opened_dict[depot_file.lower()] = (user, client, file_type, action)
+
+    def drop_connections(self):
+        """The connections made so far get dropped by the server, without their clients knowing it"""
+        self.connection_epoch += 1
+
+    def get_command_count(self, command=None) -> int:
+        with self._lock:
+            return sum(1 for name, args in self.call_log if command is None or name == command)
+
+    def clear_call_log(self):
+        with self._lock:
+            self.call_log.clear()
+
+    def get_depot_file(self, depot_file_lower: str) -> str:
+        for depot_file in self.revision_dict:
+            if depot_file.lower() == depot_file_lower:
+                return depot_file
+        return depot_file_lower
+
+    def to_depot_path(self, path, client: str) -> str:
+        path = str(path)
+        if path.startswith('//'):
+            client_root = f'//{client}/'
+            if path.lower().startswith(client_root.lower()):
+                return DEPOT_ROOT + path[len(client_root):]
+            return path
+        relative_path = os.path.relpath(os.path.normpath(path), os.path.normpath(self.client_root))
+        return DEPOT_ROOT + relative_path.replace(os.sep, '/')
+
+    def to_local_path(self, depot_path: str) -> str:
+        return os.path.join(str(self.client_root), *depot_path[len(DEPOT_ROOT):].split('/'))
+
+    def match_depot_files(self, depot_pattern: str) -> list:
+        if '...' not in depot_pattern and '*' not in depot_pattern:
+            depot_file = self.get_depot_file(depot_pattern.lower())
+            return [depot_file] if depot_file in self.revision_dict else []
+        pattern_regex = re.compile(''.join('.*' if token == '...' else '[^/]*' if token == '*' else re.escape(token)
+                                           for token in re.split(r'(\.\.\.|\*)', depot_pattern) if token),
+                                   re.IGNORECASE)
+        return sorted(depot_file for depot_file in self.revision_dict if pattern_regex.fullmatch(depot_file))
+
+
+def _split_revision(path: str):
+    """Split a file spec into its path and revision specifier, which is '' when it has none"""
+    for separator in ('#', '@'):
+        if separator in path:
+            index = path.index(separator)
+            return path[:index], path[index:]
+    return path, ''
+
+
+def _flatten_args(args) -> list:
+    flat_args = []
+    for arg in args:
+        if isinstance(arg, (list, tuple)):
+            flat_args.extend(str(item) for item in arg)
+        else:
+            flat_args.append(str(arg))
+    return flat_args
+
+
+def _split_flags(args, flags_with_value=('-T', '-c', '-m', '-s')):
+    flag_dict = {}
+    path_list = []
+    arg_iterator = iter(args)
+    for arg in arg_iterator:
+        if arg.startswith('-') and not arg.startswith('//'):
+            flag_dict[arg] = next(arg_iterator) if arg in flags_with_value else True
+        else:
+            path_list.append(arg)
+    return flag_dict, path_list
+
+
+class P4:
+    """Fake P4 instance connecting to P4.default_server"""
+    default_server = FakeServer()
+
+    def __init__(self, **kwargs):
+        self.port = kwargs.get('port', os.environ.get('P4PORT', 'fakeperforce:1666'))
+        self.user = kwargs.get('user', os.environ.get('P4USER', 'tester'))
+        self.client = kwargs.get('client', os.environ.get('P4CLIENT', 'tester_ws'))
+        self.charset = kwargs.get('charset', 'none')
+        self.password = kwargs.get('password', '')
+        self.exception_level = 2
+        self.handler = None
+        self.server = P4.default_server
+        self._connection_epoch = None
+
+    def connect(self):
+        self._wait_latency()
+        if self.server.is_down:
+            raise P4Exception(f'Connect to server failed; check $P4PORT. {self.port}')
+        with self.server._lock:
+            self.server.connect_count += 1
+        self._connection_epoch = self.server.connection_epoch
+        return self
+
+    def disconnect(self):
+        if self._connection_epoch is None:
+            raise P4Exception('not connected')
+        self._connection_epoch = None
+
+    def connected(self) -> bool:
+        return self._connection_epoch is not None
+
+    @contextlib.contextmanager
+    def at_exception_level(self, exception_level):
+        previous_exception_level = self.exception_level
+        self.exception_level = exception_level
+        try:
+            yield
+        finally:
+            self.exception_level = previous_exception_level
+
+    @contextlib.contextmanager
+    def using_handler(self, handler):
+        previous_handler = self.handler
+        self.handler = handler
+        try:
+            yield
+        finally:
+            self.handler = previous_handler
+
+    def run_info(self, *args):
+        self._start_command('info', args)
+        return [{'serverAddress': self.port, 'userName': self.user, 'clientName': self.client}]
+
+    def run_login(self, *args):
+        self._start_command('login', args)
+        return [{'User': self.user}]
+
+    def run_changes(self, *args):
+        self._start_command('changes', args)
+        with self.server._lock:
+            return [{'change': str(self.server.change), 'status': 'submitted'}] if self.server.change else []
+
+    def run_fstat(self, *args):
+        flag_dict, path_list = _split_flags(_flatten_args(self._start_command('fstat', args)))
+        field_set = set(flag_dict['-T'].split(',')) if '-T' in flag_dict else None
+        fstats = []
+        with self.server._lock:
+            for path in path_list:
+                path, revision = _split_revision(path)
+                min_change = int(revision[1:].split(',')[0].lstrip('@')) if revision.startswith('@') else 0
+                for depot_file in self.server.match_depot_files(self.server.to_depot_path(path, self.client)):
+                    revision_list = self.server.revision_dict[depot_file]
+                    if revision_list[-1].change < min_change:
+                        continue
+                    fstat = self._get_fstat(depot_file, revision_list)
+                    if field_set is not None:
+                        fstat = {field: value for field, value in fstat.items() if field in field_set}
+                    fstats.append(fstat)
+        return fstats
+
+    def run_sync(self, *args):
+        flag_dict, path_list = _split_flags(_flatten_args(self._start_command('sync', args)))
+        with self.server._lock:
+            target_list = []
+            for path in path_list:
+                path, revision = _split_revision(path)
+                for depot_file in self.server.match_depot_files(self.server.to_depot_path(path, self.client)):
+                    if depot_file.lower() in self.server.failing_sync_file_set:
+                        raise P4Exception(f'{depot_file} - sync failed')
+                    revision_list = self.server.revision_dict[depot_file]
+                    if revision in ('', '#head'):
+                        target_revision = len(revision_list)
+                    elif revision in ('#0', '#none'):
+                        target_revision = 0
+                    elif revision == '#have':
+                        target_revision = self.server.get_have_revision(self.client, depot_file)
+                    else:
+                        target_revision = int(revision[1:])
+                    target_list.append((depot_file, target_revision))
+            results = []
+            for depot_file, target_revision in target_list:
+                revision_list = self.server.revision_dict[depot_file]
+                if target_revision and revision_list[target_revision - 1].action == 'delete':
+                    target_revision = 0
+                have_revision = self.server.get_have_revision(self.client, depot_file)
+                if have_revision == target_revision and '-f' not in flag_dict:
+                    continue
+                if target_revision == 0:
+                    if not have_revision:
+                        continue
+                    action = 'deleted'
+                    reported_revision = len(revision_list)
+                else:
+                    action = 'updated' if have_revision else 'added'
+                    reported_revision = target_revision
+                results.append({'depotFile': depot_file, 'clientFile': self.server.to_local_path(depot_file),
+                                 'rev': str(reported_revision), 'action': action,
+                                 'fileSize': str(revision_list[reported_revision - 1].size)})
+                if '-n' not in flag_dict:
+                    self.server.set_have_revision(self.client, depot_file, target_revision)
+        return results
+
+    def run_where(self, *args):
+        flag_dict, path_list = _split_flags(_flatten_args(self._start_command('where', args)))
+        where_list = []
+        for path in path_list:
+            depot_path = self.server.to_depot_path(path, self.client)
+            where_list.append({'depotFile': self.server.get_depot_file(depot_path.lower()),
+                               'clientFile': f'//{self.client}/{depot_path[len(DEPOT_ROOT):]}',
+                               'path': self.server.to_local_path(depot_path)})
+        return where_list
+
+    def run_opened(self, *args):
+        flag_dict, path_list = _split_flags(_flatten_args(self._start_command('opened', args)))
+        opened_list = []
+        with self.server._lock:
+            for path in path_list:
+                depot_path = self.server.to_depot_path(_split_revision(path)[0], self.client).lower()
+                for depot_file_lower, (user, client, file_type, action) in self.server.other_opened_dict.items():
+                    if depot_file_lower == depot_path:
+                        opened_list.append({'depotFile': self.server.get_depot_file(depot_file_lower), 'user': user,
+                                            'client': client, 'type': file_type, 'action': action})
+        return opened_list
+
+    def run_edit(self, *args):
+        return self._open_files('edit', args)
+
+    def run_add(self, *args):
+        return self._open_files('add', args)
+
+    def run_files(self, *args):
+        flag_dict, path_list = _split_flags(_flatten_args(self._start_command('files', args)))
+        files = []
+        with self.server._lock:
+            for path in path_list:
+                for depot_file in self.server.match_depot_files(self.server.to_depot_path(path, self.client)):
+                    revision_list = self.server.revision_dict[depot_file]
+                    if '-e' in flag_dict and revision_list[-1].action == 'delete':
+                        continue
+                    file = {'depotFile': depot_file, 'rev': str(len(revision_list)),
+                            'change': str(revision_list[-1].change), 'action': revision_list[-1].action,
+                            'type': revision_list[-1].file_type}
+                    if self.handler is not None:
+                        handled = self.handler.outputStat(file)
+                        if handled == OutputHandler.CANCEL:
+                            return files
+                        if handled == OutputHandler.HANDLED:
+                            continue
+                    files.append(file)
+        return files
+
+    def run_diff(self, *args):
+        self._start_command('diff', args)
+        return []
+
+    def _start_command(self, command: str, args: tuple) -> tuple:
+        if self._connection_epoch is None:
+            raise P4Exception(f'{command}: not connected')
+        with self.server._lock:
+            self.server.call_log.append((command, args))
+        self._wait_latency()
+        if self._connection_epoch < self.server.connection_epoch:
+            raise P4Exception('Partner exited unexpectedly')
+        return args
+
+    def _wait_latency(self):
+        if not self.server.latency:
+            return
+        with self.server._lock:
+            self.server.running_command_count += 1
+            self.server.peak_running_command_count = max(self.server.peak_running_command_count,
+                                                          self.server.running_command_count)
+        try:
+            time.sleep(self.server.latency)
+        finally:
+            with self.server._lock:
+                self.server.running_command_count -= 1
+
+    def _get_fstat(self, depot_file: str, revision_list: list) -> dict:
+        head = revision_list[-1]
+        fstat = {'depotFile': depot_file, 'clientFile': self.server.to_local_path(depot_file),
+                 'headAction': head.action, 'headType': head.file_type, 'headRev': str(len(revision_list)),
+                 'headChange': str(head.change), 'fileSize': str(head.size)}
+        have_revision = self.server.get_have_revision(self.client, depot_file)
+        if have_revision:
+            fstat['haveRev'] = str(have_revision)
+        action = self.server.opened_dict.get(self.client.lower(), {}).get(depot_file.lower(), None)
+        if action is not None:
+            fstat['action'] = action
+        other_opened = self.server.other_opened_dict.get(depot_file.lower(), None)
+        if other_opened is not None:
+            fstat['otherOpen'] = [f'{other_opened[0]}@{other_opened[1]}']
+        return fstat
+
+    def _open_files(self, action: str, args: tuple) -> list:
+        flag_dict, path_list = _split_flags(_flatten_args(self._start_command(action, args)))
+        results = []
+        with self.server._lock:
+            opened_dict = self.server.opened_dict.setdefault(self.client.lower(), {})
+            for path in path_list:
+                depot_path = self.server.to_depot_path(path, self.client)
+                opened_dict[depot_path.lower()] = action
+                results.append({'depotFile': self.server.get_depot_file(depot_path.lower()),
+                                'clientFile': self.server.to_local_path(depot_path), 'action': action})
+        return results
@@ -0,0 +1,23 @@
+from core.classes.node import BaseNode
+from core.enum_types import NodeTypeFlag, InputPinType, OutputPinType
+
+# Number of runs of every Add Int node, to check which nodes got computed
+run_count_list = [0]
+
+
+class Node(BaseNode):
+    """Adds two integers"""
+
+    ver = '0.0.1'
+    node_label = 'Add Int'
+    node_type = NodeTypeFlag.Pure
+    pin_dict = {
+        'A': InputPinType.Int,
+        'B': InputPinType.Int,
+        'Result': OutputPinType.Int
+    }
+
+    @staticmethod
+    def run(internal_data_dict):
+        run_count_list[0] += 1
+        internal_data_dict['Result'] = (internal_data_dict['A'] or 0) + (internal_data_dict['B'] or 0)
@@ -0,0 +1,20 @@
+from core.classes.node import BaseNode
+from core.enum_types import NodeTypeFlag, InputPinType, OutputPinType
+
+
+class Node(BaseNode):
+    """Appends a string to the input array itself rather than to a copy"""
+
+    ver = '0.0.1'
+    node_label = 'Append In Place'
+    node_type = NodeTypeFlag.Blueprint
+    pin_dict = {
+        'String Array': InputPinType.StringArray,
+        'String': InputPinType.String,
+        'String Array out': OutputPinType.StringArray
+    }
+
+    @staticmethod
+    def run(internal_data_dict):
+        internal_data_dict['String Array'].append(internal_data_dict['String'])
+        internal_data_dict['String Array out'] = internal_data_dict['String Array']
@@ -0,0 +1,20 @@
+from core.classes.node import BaseNode
+from core.enum_types import NodeTypeFlag, InputPinType
+
+# Values recorded by every run, in execution order
+recorded_value_list = []
+
+
+class Node(BaseNode):
+    """Records its input value, to check what a graph executed"""
+
+    ver = '0.0.1'
+    node_label = 'Record'
+    node_type = NodeTypeFlag.Blueprint
+    pin_dict = {
+        'Value': InputPinType.WildCard
+    }
+
+    @staticmethod
+    def run(internal_data_dict):
+        recorded_value_list.append(internal_data_dict['Value'])
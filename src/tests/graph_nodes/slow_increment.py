@@ -0,0 +1,36 @@
+import threading
+import time
+
+from core.classes.node import BaseNode
+from core.enum_types import NodeTypeFlag, InputPinType, OutputPinType
+
+SLOW_INCREMENT_DURATION = 0.05
+
+# Number of Slow Increment nodes running right now, and the most ever running at once
+running_count_list = [0]
+peak_running_count_list = [0]
+_running_count_lock = threading.Lock()
+
+
+class Node(BaseNode):
+    """Increments an integer after waiting a while, as a node waiting for a server or a process would"""
+
+    ver = '0.0.1'
+    node_label = 'Slow Increment'
+    node_type = NodeTypeFlag.Pure
+    pin_dict = {
+        'A': InputPinType.Int,
+        'Result': OutputPinType.Int
+    }
+
+    @staticmethod
+    def run(internal_data_dict):
+        with _running_count_lock:
+            running_count_list[0] += 1
+            peak_running_count_list[0] = max(peak_running_count_list[0], running_count_list[0])
+        try:
+            time.sleep(SLOW_INCREMENT_DURATION)
+        finally:
+            with _running_count_lock:
+                running_count_list[0] -= 1
+        internal_data_dict['Result'] = (internal_data_dict['A'] or 0) + 1
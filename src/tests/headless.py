@@ -0,0 +1,33 @@
+"""
+Environment of the tests and benchmarks, which run outside Windows and without a Perforce server
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_headless_environment():
+    """
+    Point the app data folders to a temporary folder, make the src packages importable and use the fake Perforce
+    module when p4python is not installed
+    """
+    if os.environ.get('LOCALAPPDATA', None) is None or os.environ.get('temp', None) is None:
+        temp_dir = tempfile.mkdtemp(prefix='momotarou_tests_')
+        os.environ.setdefault('LOCALAPPDATA', temp_dir)
+        os.environ.setdefault('temp', temp_dir)
+    os.environ.setdefault('COMPUTERNAME', 'TestPC')
+    if str(SRC_DIR) not in sys.path:
+        sys.path.insert(0, str(SRC_DIR))
+    try:
+        import P4
+    except ImportError:
+        from tests import fake_p4
+        sys.modules['P4'] = fake_p4
+
+
+def is_fake_p4() -> bool:
+    import P4
+    return hasattr(P4, 'FakeServer')
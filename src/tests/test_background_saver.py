@@ -0,0 +1,143 @@
+import json
+import os
+import stat
+
+import pytest
+
+from core import background_saver
+from core.background_saver import BackgroundSaver
+from core.tool_file_cache import get_tool_file_version
+
+
+@pytest.fixture
+def write_log(monkeypatch):
+    """Paths written by the savers, and paths whose next write fails"""
+    write_log = {'written': [], 'failing': set()}
+    write_file_bytes_atomically = background_saver.write_file_bytes_atomically
+
+    def write_file(file_path, file_bytes):
+        if file_path in write_log['failing']:
+            write_log['failing'].discard(file_path)
+            raise OSError(f'{file_path} is locked')
+        write_log['written'].append(file_path)
+        write_file_bytes_atomically(file_path, file_bytes)
+
+    monkeypatch.setattr(background_saver, 'write_file_bytes_atomically', write_file)
+    return write_log
+
+
+class _Tab:
+    """Tracks its last save as the node editors do"""
+
+    def __init__(self):
+        self.generation = 0
+        self.saved_state = None
+
+    def save(self, saver: BackgroundSaver, tool_path):
+        if self.saved_state == (self.generation, tool_path) and tool_path.exists():
+            return
+        saved_state = (self.generation, tool_path)
+
+        def mark_saved():
+            self.saved_state = saved_state
+        saver.submit(tool_path, {'generation': self.generation}, is_compact=False, on_saved=mark_saved)
+
+
+def test_burst_of_saves_is_written_once(tmp_path, write_log):
+    saver = BackgroundSaver(coalescing_delay=0.05)
+    saved_list = []
+    tool_path = tmp_path / 'Tool.mtool'
+    for index in range(50):
+        saver.submit(tool_path, {'index': index}, is_compact=False,
+                     on_saved=lambda index=index: saved_list.append(index))
+    saver.stop()
+    assert write_log['written'] == [tool_path]
+    assert json.loads(tool_path.read_text())['index'] == 49
+    assert saved_list == [49]
+
+
+def test_unchanged_content_is_not_rewritten(tmp_path, write_log):
+    saver = BackgroundSaver(coalescing_delay=0)
+    tool_path = tmp_path / 'Tool.mtool'
+    saved_list = []
+    for _ in range(3):
+        saver.submit(tool_path, {'value': 1}, is_compact=False, on_saved=lambda: saved_list.append(tool_path))
+        saver.flush()
+    saver.stop()
+    assert write_log['written'] == [tool_path]
+    assert saver.get_metrics()['skipped_count'] == 2
+    # Skipped saves leave the file holding the value, so they count as saved
+    assert len(saved_list) == 3
+
+
+def test_failed_save_is_written_by_the_next_save(tmp_path, write_log):
+    saver = BackgroundSaver(coalescing_delay=0)
+    tool_path = tmp_path / 'Tool.mtool'
+    tab = _Tab()
+    tab.save(saver, tool_path)
+    saver.flush()
+    tab.generation += 1
+    write_log['failing'].add(tool_path)
+    tab.save(saver, tool_path)
+    saver.flush()
+    assert saver.get_metrics()['failed_count'] == 1
+    assert tab.saved_state == (0, tool_path)
+    # The edit did not reach the file, saving again has to write it
+    tab.save(saver, tool_path)
+    saver.flush()
+    tab.save(saver, tool_path)
+    saver.stop()
+    assert write_log['written'] == [tool_path, tool_path]
+    assert json.loads(tool_path.read_text())['generation'] == 1
+    assert tab.saved_state == (1, tool_path)
+
+
+def test_file_changed_externally_is_rewritten(tmp_path, write_log):
+    saver = BackgroundSaver(coalescing_delay=0)
+    tool_path = tmp_path / 'Tool.mtool'
+    saver.submit(tool_path, {'value': 1}, is_compact=False)
+    saver.flush()
+    saved_bytes = tool_path.read_bytes()
+    # Synced from the depot, same size but another content
+    tool_path.write_bytes(saved_bytes.replace(b'1', b'2'))
+    file_stat = tool_path.stat()
+    os.utime(tool_path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 1_000_000_000))
+    saver.submit(tool_path, {'value': 1}, is_compact=False)
+    saver.stop()
+    assert write_log['written'] == [tool_path, tool_path]
+    assert tool_path.read_bytes() == saved_bytes
+
+
+def test_copied_file_is_writable_when_its_source_is_read_only(tmp_path, write_log):
+    saver = BackgroundSaver(coalescing_delay=0)
+    source_path = tmp_path / 'Synced.mtool'
+    source_path.write_text(json.dumps({'value': 1}))
+    # Synced from the depot without being checked out
+    source_path.chmod(stat.S_IREAD)
+    tool_path = tmp_path / 'Saved As' / 'Synced.mtool'
+    tool_path.parent.mkdir()
+    saver.submit_copy(tool_path, source_path)
+    saver.flush()
+    assert tool_path.read_bytes() == source_path.read_bytes()
+    assert tool_path.stat().st_ino != source_path.stat().st_ino
+    assert tool_path.stat().st_mode & stat.S_IWRITE
+    saver.submit(tool_path, {'value': 2}, is_compact=False)
+    saver.stop()
+    assert json.loads(tool_path.read_text()) == {'value': 2}
+    assert json.loads(source_path.read_text()) == {'value': 1}
+    assert saver.get_metrics()['copied_count'] == 1
+
+
+def test_saved_tool_is_read_again_by_the_tool_file_cache(tmp_path, write_log):
+    saver = BackgroundSaver(coalescing_delay=0)
+    tool_path = tmp_path / 'Tool.mtool'
+    saver.submit(tool_path, {'value': 1}, is_compact=False)
+    saver.flush()
+    cached_tool_bytes = get_tool_file_version(tool_path).tool_bytes
+    file_stat = tool_path.stat()
+    saver.submit(tool_path, {'value': 2}, is_compact=False)
+    saver.stop()
+    # Same size, rewritten within the modification time resolution
+    os.utime(tool_path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns))
+    assert get_tool_file_version(tool_path).tool_bytes != cached_tool_bytes
+    assert json.loads(get_tool_file_version(tool_path).tool_bytes) == {'value': 2}
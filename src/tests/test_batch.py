@@ -0,0 +1,24 @@
+from core.batch import execute_event_batch
+from tests.graph_nodes import record
+from tests.tool_builder import ToolBuilder
+
+
+def _build_record_name_tool():
+    tool_builder = ToolBuilder()
+    tool_builder.add_var('Name', 'String', 'default', is_exposed=True, regex='[a-z]+')
+    event_node = tool_builder.add_event('Record name')
+    record_node = tool_builder.add_node('tests.graph_nodes.record')
+    tool_builder.link_flow(event_node, 'Exec Out', record_node)
+    tool_builder.link_data(tool_builder.add_get_var_node('Name', 'String'), 'String out', record_node, 'Value')
+    return tool_builder.get_tool_data(), event_node['uuid']
+
+
+def test_invalid_rows_do_not_abort_the_batch():
+    tool_data, event_tag = _build_record_name_tool()
+    record.recorded_value_list.clear()
+    row_list = [{'Name': 'alice'}, {'Name': 5}, {'Name': 'Bob'}, {'Name': ['carol']}, {}]
+    result_list = list(execute_event_batch(tool_data, event_tag, row_list, worker_count=1))
+    assert [result['status'] for result in result_list] == ['success', 'invalid', 'invalid', 'invalid', 'success']
+    assert result_list[1]['message'] == 'Incorrect input value for Name'
+    assert result_list[0]['outputs'] == {'Name': 'alice'}
+    assert record.recorded_value_list == ['alice', 'default']
@@ -0,0 +1,145 @@
+import os
+
+import pytest
+
+from core import compile_cache
+from core.execution_plan import ExecutionContext
+from core.executor import execute_event
+from core.tool_file import write_tool_file
+from core.tool_file_cache import invalidate_tool_file
+from tests.graph_nodes import record
+from tests.tool_builder import ToolBuilder
+
+
+@pytest.fixture
+def compiled_tools_dir(tmp_path, monkeypatch):
+    compiled_tools_dir = tmp_path / 'CompiledTools'
+    monkeypatch.setattr(compile_cache, 'COMPILED_TOOLS_DIR', compiled_tools_dir)
+    compile_cache.compiled_tool_registry.clear()
+    yield compiled_tools_dir
+    compile_cache.compiled_tool_registry.clear()
+
+
+@pytest.fixture
+def compile_count_list(monkeypatch):
+    """Tool data of every compile, to count the cache misses"""
+    compile_count_list = []
+    compile_tool = compile_cache.compile_tool
+
+    def counting_compile_tool(tool_data):
+        compile_count_list.append(tool_data)
+        return compile_tool(tool_data)
+
+    monkeypatch.setattr(compile_cache, 'compile_tool', counting_compile_tool)
+    return compile_count_list
+
+
+def _write_record_tool(tool_path, b_value: int = 3) -> str:
+    """Write a tool recording 2 + b_value then its exposed Count var, returns the tag of its event"""
+    tool_builder = ToolBuilder()
+    tool_builder.add_var('Count', 'Int', 7, is_exposed=True)
+    event_node = tool_builder.add_event('Record')
+    add_node = tool_builder.add_node('tests.graph_nodes.add_int', A=2, B=b_value)
+    sum_record_node = tool_builder.add_node('tests.graph_nodes.record')
+    get_count_node = tool_builder.add_get_var_node('Count', 'Int')
+    count_record_node = tool_builder.add_node('tests.graph_nodes.record')
+    tool_builder.link_data(add_node, 'Result', sum_record_node, 'Value')
+    tool_builder.link_data(get_count_node, 'Int out', count_record_node, 'Value')
+    tool_builder.link_flow(event_node, 'Exec Out', sum_record_node)
+    tool_builder.link_flow(sum_record_node, 'Exec Out', count_record_node)
+    write_tool_file(tool_path, tool_builder.get_tool_data())
+    invalidate_tool_file(tool_path)
+    return event_node['uuid']
+
+
+def _run_compiled_tool(compiled_tool, event_tag: str, var_values: dict) -> list:
+    record.recorded_value_list.clear()
+    plan = compiled_tool.plan
+    assert execute_event(event_tag, plan, ExecutionContext(plan, var_values))[0] == 1
+    return list(record.recorded_value_list)
+
+
+def test_unchanged_tool_is_compiled_once(tmp_path, compiled_tools_dir, compile_count_list):
+    tool_path = tmp_path / 'Tool.mtool'
+    event_tag = _write_record_tool(tool_path)
+    first_compiled_tool = compile_cache.load_compiled_tool(tool_path)[1]
+    assert compile_cache.load_compiled_tool(tool_path)[1] is first_compiled_tool
+    compile_cache.compiled_tool_registry.clear()
+    return_message, disk_compiled_tool = compile_cache.load_compiled_tool(tool_path)
+    assert return_message == (1, '')
+    assert disk_compiled_tool is not first_compiled_tool
+    assert len(compile_count_list) == 1
+    assert _run_compiled_tool(disk_compiled_tool, event_tag, {'Count': 9}) == [5, 9]
+    # The var default is still shared by the var nodes once loaded from disk, not written by the previous run
+    assert _run_compiled_tool(disk_compiled_tool, event_tag, {}) == [5, 7]
+    assert disk_compiled_tool.vars_data == first_compiled_tool.vars_data
+
+
+def test_changed_tool_is_compiled_again(tmp_path, compiled_tools_dir, compile_count_list):
+    tool_path = tmp_path / 'Tool.mtool'
+    _write_record_tool(tool_path)
+    compile_cache.load_compiled_tool(tool_path)
+    event_tag = _write_record_tool(tool_path, b_value=40)
+    compiled_tool = compile_cache.load_compiled_tool(tool_path)[1]
+    assert len(compile_count_list) == 2
+    assert _run_compiled_tool(compiled_tool, event_tag, {}) == [42, 7]
+
+
+def test_artifact_of_a_node_changing_version_is_discarded(tmp_path, compiled_tools_dir, compile_count_list,
+                                                          monkeypatch):
+    tool_path = tmp_path / 'Tool.mtool'
+    _write_record_tool(tool_path)
+    compile_cache.load_compiled_tool(tool_path)
+    compile_cache.compiled_tool_registry.clear()
+    monkeypatch.setattr(record.Node, 'ver', '0.0.2')
+    compile_cache.load_compiled_tool(tool_path)
+    assert len(compile_count_list) == 2
+    # Saved again with the new version, so it is a disk hit from now on
+    compile_cache.compiled_tool_registry.clear()
+    compile_cache.load_compiled_tool(tool_path)
+    assert len(compile_count_list) == 2
+
+
+def test_unreadable_artifact_is_compiled_again(tmp_path, compiled_tools_dir, compile_count_list):
+    tool_path = tmp_path / 'Tool.mtool'
+    event_tag = _write_record_tool(tool_path)
+    compile_cache.load_compiled_tool(tool_path)
+    compile_cache.compiled_tool_registry.clear()
+    artifact_path, = compiled_tools_dir.iterdir()
+    artifact_path.write_bytes(b'\x80\x04not json')
+    compiled_tool = compile_cache.load_compiled_tool(tool_path)[1]
+    assert len(compile_count_list) == 2
+    assert _run_compiled_tool(compiled_tool, event_tag, {}) == [5, 7]
+
+
+def _load_tool_artifact(tool_path, tool_bytes: bytes, modified_time_ns=None):
+    """Compile or load a tool from disk, returns the path of its artifact"""
+    tool_path.write_bytes(tool_bytes)
+    invalidate_tool_file(tool_path)
+    compile_cache.load_compiled_tool(tool_path)
+    content_hash = next(reversed(compile_cache.compiled_tool_registry))
+    compile_cache.compiled_tool_registry.clear()
+    artifact_path = compile_cache._get_compiled_tool_file_path(content_hash)
+    if modified_time_ns is not None:
+        # Ordered whatever the time resolution of the file system
+        os.utime(artifact_path, ns=(modified_time_ns, modified_time_ns))
+    return artifact_path
+
+
+def test_least_recently_used_artifacts_are_pruned(tmp_path, compiled_tools_dir, compile_count_list, monkeypatch):
+    tool_path = tmp_path / 'Tool.mtool'
+    tool_bytes_list = []
+    for b_value in range(3):
+        _write_record_tool(tool_path, b_value)
+        tool_bytes_list.append(tool_path.read_bytes())
+    first_artifact_path = _load_tool_artifact(tool_path, tool_bytes_list[0], modified_time_ns=1)
+    monkeypatch.setattr(compile_cache, 'MAX_COMPILED_TOOLS_DISK_SIZE', first_artifact_path.stat().st_size * 2 + 100)
+    previous_format_path = compiled_tools_dir / 'previous.pickle'
+    previous_format_path.write_bytes(b'')
+    second_artifact_path = _load_tool_artifact(tool_path, tool_bytes_list[1], modified_time_ns=2)
+    assert set(compiled_tools_dir.iterdir()) == {first_artifact_path, second_artifact_path}
+    # Loaded from disk, the first artifact becomes the most recently used one
+    assert _load_tool_artifact(tool_path, tool_bytes_list[0]) == first_artifact_path
+    assert len(compile_count_list) == 2
+    third_artifact_path = _load_tool_artifact(tool_path, tool_bytes_list[2])
+    assert set(compiled_tools_dir.iterdir()) == {first_artifact_path, third_artifact_path}
@@ -0,0 +1,56 @@
+import random
+import time
+
+import pytest
+
+from core.data_loader import refresh_core_data_with_json_dict
+from core.executor import execute_event
+from tests.graph_nodes import record
+from tests.tool_builder import ToolBuilder
+
+BENCHMARK_NODE_COUNT_LIST = [1_000, 10_000, 50_000]
+
+
+def _build_record_chain_tool(node_count: int):
+    """
+    Build a flow of Record nodes, each recording the sum of its own Add Int node, returns the tool data and the tag
+    of its event
+    """
+    tool_builder = ToolBuilder()
+    event_node = previous_node = tool_builder.add_event('Record sums')
+    for index in range(node_count // 2):
+        record_node = tool_builder.add_node('tests.graph_nodes.record')
+        add_node = tool_builder.add_node('tests.graph_nodes.add_int', A=index, B=1)
+        tool_builder.link_data(add_node, 'Result', record_node, 'Value')
+        tool_builder.link_flow(previous_node, 'Exec Out', record_node)
+        previous_node = record_node
+    return tool_builder.get_tool_data(), event_node['uuid']
+
+
+def _get_compile_time(node_count: int) -> float:
+    tool_data, _ = _build_record_chain_tool(node_count)
+    start_time = time.perf_counter()
+    assert refresh_core_data_with_json_dict(tool_data, {}, is_checking_regex=False)[0] == 1
+    return time.perf_counter() - start_time
+
+
+@pytest.mark.parametrize('is_shuffled', [False, True])
+def test_links_resolve_to_their_pins(is_shuffled):
+    tool_data, event_tag = _build_record_chain_tool(2_000)
+    if is_shuffled:
+        # Links are resolved by pin uuid, whatever the order of the nodes in the file
+        random.Random(0).shuffle(tool_data['nodes'])
+    assert refresh_core_data_with_json_dict(tool_data, {}, is_checking_regex=False)[0] == 1
+    record.recorded_value_list.clear()
+    assert execute_event(event_tag)[0] == 1
+    assert record.recorded_value_list == list(range(1, 1_001))
+
+
+@pytest.mark.benchmark
+def test_compile_time_grows_linearly_with_the_node_count():
+    compile_time_list = [min(_get_compile_time(node_count) for _ in range(3)) if node_count < 10_000 else
+                         _get_compile_time(node_count) for node_count in BENCHMARK_NODE_COUNT_LIST]
+    time_per_node_list = [compile_time / node_count
+                          for compile_time, node_count in zip(compile_time_list, BENCHMARK_NODE_COUNT_LIST)]
+    # The nested scans took a time per node growing with the node count, 50 times more from 1k to 50k nodes
+    assert max(time_per_node_list) < time_per_node_list[0] * 4
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from core.data_loader import refresh_core_data_with_json_dict
+from core.executor import execute_event
+from tests.graph_nodes import add_int, record
+from tests.tool_builder import ToolBuilder
+
+ITERATION_NUM = 100
+GET_VAR_NODE_COUNT = 50
+BENCHMARK_ITERATION_NUM = 10_000
+BENCHMARK_GET_VAR_NODE_COUNT = 5_000
+
+
+def _load_tool(tool_builder: ToolBuilder):
+    assert refresh_core_data_with_json_dict(tool_builder.get_tool_data(), {}, is_checking_regex=False)[0] == 1
+    record.recorded_value_list.clear()
+    add_int.run_count_list[0] = 0
+
+
+def _link_flows(tool_builder: ToolBuilder, node_list: list):
+    for source_node, destination_node in zip(node_list, node_list[1:]):
+        tool_builder.link_flow(source_node, 'Exec Out', destination_node)
+
+
+def test_set_var_invalidates_only_its_downstream_nodes():
+    tool_builder = ToolBuilder()
+    tool_builder.add_var('Counter', 'Int', 0)
+    tool_builder.add_var('Offset', 'Int', 5)
+    event_node = tool_builder.add_event('Set counter')
+    get_counter_node = tool_builder.add_get_var_node('Counter', 'Int')
+    add_node_list = [tool_builder.add_node('tests.graph_nodes.add_int', B=10),
+                     tool_builder.add_node('tests.graph_nodes.add_int', B=20),
+                     tool_builder.add_node('tests.graph_nodes.add_int', B=0)]
+    # Both first Add Int nodes read the Counter value
+    tool_builder.link_data(get_counter_node, 'Int out', add_node_list[0], 'A')
+    tool_builder.link_data(get_counter_node, 'Int out', add_node_list[1], 'A')
+    tool_builder.link_data(tool_builder.add_get_var_node('Offset', 'Int'), 'Int out', add_node_list[2], 'A')
+    flow_node_list = [event_node]
+    for add_node in add_node_list:
+        flow_node_list.append(tool_builder.add_node('tests.graph_nodes.record'))
+        tool_builder.link_data(add_node, 'Result', flow_node_list[-1], 'Value')
+    flow_node_list.append(tool_builder.add_set_var_node('Counter', 'Int', Int_in=7))
+    for add_node in add_node_list:
+        flow_node_list.append(tool_builder.add_node('tests.graph_nodes.record'))
+        tool_builder.link_data(add_node, 'Result', flow_node_list[-1], 'Value')
+    _link_flows(tool_builder, flow_node_list)
+    _load_tool(tool_builder)
+
+    assert execute_event(event_node['uuid'])[0] == 1
+    assert record.recorded_value_list == [10, 20, 5, 17, 27, 5]
+    # The Add Int node reading Offset is not computed again
+    assert add_int.run_count_list[0] == 5
+
+
+def _load_counter_loop_tool(iteration_num: int, get_var_node_count: int) -> str:
+    """
+    Load a loop incrementing the Counter var, then recording the sum of many other Get Counter nodes, returns the tag
+    of its event
+    """
+    tool_builder = ToolBuilder()
+    tool_builder.add_var('Counter', 'Int', 0)
+    event_node = tool_builder.add_event('Count')
+    sequence_node = tool_builder.add_node('nodes.flow_control_node.node_sequence')
+    do_n_node = tool_builder.add_node('nodes.flow_control_node.node_do_n', N=iteration_num)
+    increment_node = tool_builder.add_node('tests.graph_nodes.add_int', B=1)
+    tool_builder.link_data(tool_builder.add_get_var_node('Counter', 'Int'), 'Int out', increment_node, 'A')
+    set_counter_node = tool_builder.add_set_var_node('Counter', 'Int')
+    tool_builder.link_data(increment_node, 'Result', set_counter_node, 'Int in')
+    # Sum of get_var_node_count Get Counter nodes, only computed once the loop is done
+    sum_node = None
+    for _ in range(get_var_node_count):
+        add_node = tool_builder.add_node('tests.graph_nodes.add_int')
+        tool_builder.link_data(tool_builder.add_get_var_node('Counter', 'Int'), 'Int out', add_node, 'A')
+        if sum_node is not None:
+            tool_builder.link_data(sum_node, 'Result', add_node, 'B')
+        sum_node = add_node
+    record_node = tool_builder.add_node('tests.graph_nodes.record')
+    tool_builder.link_data(sum_node, 'Result', record_node, 'Value')
+    tool_builder.link_flow(event_node, 'Exec Out', sequence_node)
+    tool_builder.link_flow(sequence_node, 'Then 0', do_n_node)
+    tool_builder.link_flow(do_n_node, 'Exit', set_counter_node)
+    tool_builder.link_flow(sequence_node, 'Then 1', record_node)
+    _load_tool(tool_builder)
+    return event_node['uuid']
+
+
+def test_set_var_in_a_loop_leaves_the_other_get_var_nodes_alone():
+    assert execute_event(_load_counter_loop_tool(ITERATION_NUM, GET_VAR_NODE_COUNT))[0] == 1
+    assert record.recorded_value_list == [ITERATION_NUM * GET_VAR_NODE_COUNT]
+    assert add_int.run_count_list[0] == ITERATION_NUM + GET_VAR_NODE_COUNT
+
+
+@pytest.mark.benchmark
+def test_set_var_in_a_loop_does_not_scan_the_other_get_var_nodes():
+    event_tag = _load_counter_loop_tool(BENCHMARK_ITERATION_NUM, BENCHMARK_GET_VAR_NODE_COUNT)
+    start_time = time.perf_counter()
+    assert execute_event(event_tag)[0] == 1
+    elapsed_time = time.perf_counter() - start_time
+    assert record.recorded_value_list == [BENCHMARK_ITERATION_NUM * BENCHMARK_GET_VAR_NODE_COUNT]
+    # Far from scanning the 5k Get Counter nodes at each of the 10k sets
+    assert elapsed_time < 5
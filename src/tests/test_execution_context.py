@@ -0,0 +1,67 @@
+from multiprocessing.pool import ThreadPool
+
+from core.data_loader import refresh_core_data_with_json_dict
+from core.execution_plan import ExecutionContext
+from core.executor import execute_event, get_execution_plan
+from tests.graph_nodes import record
+from tests.tool_builder import ToolBuilder
+
+RUN_COUNT = 200
+
+
+def _load_append_names_tool() -> str:
+    """
+    Load a tool appending Name in place to the Names var and to an unconnected pin default value, returns the tag of
+    its event
+    """
+    tool_builder = ToolBuilder()
+    tool_builder.add_var('Names', 'StringArray', ['seed'])
+    tool_builder.add_var('Name', 'String', '', is_exposed=True)
+    event_node = tool_builder.add_event('Append names')
+    append_to_var_node = tool_builder.add_node('tests.graph_nodes.append_in_place')
+    tool_builder.link_data(tool_builder.add_get_var_node('Names', 'StringArray'), 'String Array',
+                           append_to_var_node, 'String Array')
+    tool_builder.link_data(tool_builder.add_get_var_node('Name', 'String'), 'String out', append_to_var_node, 'String')
+    set_names_node = tool_builder.add_set_var_node('Names', 'StringArray')
+    tool_builder.link_data(append_to_var_node, 'String Array out', set_names_node, 'String Array in')
+    append_to_pin_node = tool_builder.add_node('tests.graph_nodes.append_in_place', String_Array=['pin'])
+    tool_builder.link_data(tool_builder.add_get_var_node('Name', 'String'), 'String out', append_to_pin_node, 'String')
+    record_node = tool_builder.add_node('tests.graph_nodes.record')
+    tool_builder.link_data(append_to_pin_node, 'String Array out', record_node, 'Value')
+    tool_builder.link_flow(event_node, 'Exec Out', append_to_var_node)
+    tool_builder.link_flow(append_to_var_node, 'Exec Out', set_names_node)
+    tool_builder.link_flow(set_names_node, 'Exec Out', append_to_pin_node)
+    tool_builder.link_flow(append_to_pin_node, 'Exec Out', record_node)
+    assert refresh_core_data_with_json_dict(tool_builder.get_tool_data(), {}, is_checking_regex=False)[0] == 1
+    return event_node['uuid']
+
+
+def test_concurrent_runs_do_not_share_mutable_values():
+    event_tag = _load_append_names_tool()
+    plan = get_execution_plan()
+    record.recorded_value_list.clear()
+
+    def run(index):
+        context = ExecutionContext(plan, {'Name': f'name_{index}'})
+        assert execute_event(event_tag, plan, context)[0] == 1
+        return context.var_value_dict['Names'][0]
+
+    with ThreadPool(8) as thread_pool:
+        names_list = thread_pool.map(run, range(RUN_COUNT))
+    assert names_list == [['seed', f'name_{index}'] for index in range(RUN_COUNT)]
+    assert sorted(recorded_value[1] for recorded_value in record.recorded_value_list) == \
+        sorted(f'name_{index}' for index in range(RUN_COUNT))
+    assert all(recorded_value[0] == 'pin' and len(recorded_value) == 2
+               for recorded_value in record.recorded_value_list)
+    # The next runs still start from the defaults of the plan
+    assert run('last') == ['seed', 'name_last']
+
+
+def test_bound_var_values_are_not_mutated():
+    event_tag = _load_append_names_tool()
+    plan = get_execution_plan()
+    names = ['bound']
+    context = ExecutionContext(plan, {'Names': names, 'Name': 'appended'})
+    execute_event(event_tag, plan, context)
+    assert names == ['bound']
+    assert context.var_value_dict['Names'][0] == ['bound', 'appended']
@@ -0,0 +1,58 @@
+import tracemalloc
+
+from core.data_loader import refresh_core_data_with_json_dict
+from core.execution_plan import ExecutionContext
+from core.executor import execute_event, get_execution_plan
+from tests.graph_nodes import record
+from tests.tool_builder import ToolBuilder
+
+
+def _run_and_get_peak_memory(event_tag: str) -> tuple:
+    """Run an event, returns its context and the peak of the memory allocated while it ran"""
+    plan = get_execution_plan()
+    context = ExecutionContext(plan)
+    tracemalloc.start()
+    try:
+        assert execute_event(event_tag, plan, context)[0] == 1
+        return context, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _load_do_n_tool(iteration_num: int) -> str:
+    tool_builder = ToolBuilder()
+    tool_builder.add_var('Last Index', 'Int', -1)
+    event_node = tool_builder.add_event('Loop')
+    do_n_node = tool_builder.add_node('nodes.flow_control_node.node_do_n', N=iteration_num)
+    set_node = tool_builder.add_set_var_node('Last Index', 'Int')
+    tool_builder.link_data(do_n_node, 'Index', set_node, 'Int in')
+    tool_builder.link_flow(event_node, 'Exec Out', do_n_node)
+    tool_builder.link_flow(do_n_node, 'Exit', set_node)
+    assert refresh_core_data_with_json_dict(tool_builder.get_tool_data(), {}, is_checking_regex=False)[0] == 1
+    return event_node['uuid']
+
+
+def test_do_n_anchor_memory_does_not_grow_with_n():
+    peak_memory_list = []
+    for iteration_num in (1_000, 100_000):
+        context, peak_memory = _run_and_get_peak_memory(_load_do_n_tool(iteration_num))
+        assert context.var_value_dict['Last Index'][0] == iteration_num - 1
+        peak_memory_list.append(peak_memory)
+    # Anchors made up front for every iteration took megabytes for 100k iterations
+    assert peak_memory_list[1] < peak_memory_list[0] * 2 + 64 * 1024
+
+
+def test_for_each_runs_its_body_then_completed():
+    tool_builder = ToolBuilder()
+    event_node = tool_builder.add_event('Loop')
+    for_each_node = tool_builder.add_node('nodes.flow_control_node.node_for_each', String_Array=['a', 'b', 'c'])
+    body_record_node = tool_builder.add_node('tests.graph_nodes.record')
+    tool_builder.link_data(for_each_node, 'Array Str Element', body_record_node, 'Value')
+    completed_record_node = tool_builder.add_node('tests.graph_nodes.record', Value='completed')
+    tool_builder.link_flow(event_node, 'Exec Out', for_each_node)
+    tool_builder.link_flow(for_each_node, 'Loop Body', body_record_node)
+    tool_builder.link_flow(for_each_node, 'Completed', completed_record_node)
+    assert refresh_core_data_with_json_dict(tool_builder.get_tool_data(), {}, is_checking_regex=False)[0] == 1
+    record.recorded_value_list.clear()
+    _run_and_get_peak_memory(event_node['uuid'])
+    assert record.recorded_value_list == ['a', 'b', 'c', 'completed']
@@ -0,0 +1,92 @@
+import json
+import time
+from collections import OrderedDict
+
+import pytest
+
+pytest.importorskip('dearpygui')
+dill = pytest.importorskip('dill')
+
+from ui.NodeEditor import node_utils  # noqa: E402
+from ui.NodeEditor.node_utils import project_node_info_for_export  # noqa: E402
+
+PIN_COUNT_PER_NODE = 4
+
+
+class _Pin:
+    """Stands for a live pin instance, holding its dearpygui tags"""
+
+    def __init__(self, pin_tag: str):
+        self.pin_tag = pin_tag
+        self.value_tag = f'{pin_tag}_value'
+        self.connected_link_list = []
+
+
+class _Node:
+    """Stands for a live node instance, with internal data and settings the export leaves out"""
+
+    def __init__(self, node_tag: str):
+        self.node_tag = node_tag
+        self.internal_data = {'String Array': [f'{node_tag}_{index}' for index in range(20)], 'Int': 1}
+        self.setting_dict = {'input_window_width': 100, 'theme': list(range(50))}
+        self.pin_list = [OrderedDict(uuid=f'{node_tag}_pin_{index}', pin_instance=_Pin(f'{node_tag}_pin_{index}'),
+                                     label=f'Pin {index}', meta_type=1, type=2, value='value')
+                         for index in range(PIN_COUNT_PER_NODE)]
+
+
+@pytest.fixture(autouse=True)
+def node_positions(monkeypatch):
+    monkeypatch.setattr(node_utils.dpg, 'get_item_pos', lambda tag: [len(tag), 20])
+
+
+def _build_node_dict(node_count: int) -> dict:
+    node_info_list = []
+    for index in range(node_count):
+        node = _Node(f'node_{index}')
+        node_info_list.append({'uuid': node.node_tag, 'label': f'Node {index}', 'node_instance': node,
+                               'pins': node.pin_list, 'type': 1, 'import_path': 'nodes.exec_node.cmd_node',
+                               'position': {'x': 0, 'y': 0}})
+    return {'nodes': node_info_list}
+
+
+def _export_with_dill_deep_copy(node_dict: dict) -> dict:
+    """The export made before project_node_info_for_export, from a deep copy of the whole node dict"""
+    export_dict = dill.loads(dill.dumps(node_dict))
+    for node_info in export_dict['nodes']:
+        node_info.pop('node_instance')
+        for pin_info in node_info['pins']:
+            pin_info.pop('pin_instance')
+        node_info['position']['x'], node_info['position']['y'] = node_utils.dpg.get_item_pos(node_info['uuid'])
+    return export_dict
+
+
+def _export_with_projection(node_dict: dict) -> dict:
+    return {'nodes': [project_node_info_for_export(node_info) for node_info in node_dict['nodes']]}
+
+
+@pytest.mark.parametrize('node_count', [1, 50])
+def test_projection_exports_as_the_deep_copy_did(node_count):
+    node_dict = _build_node_dict(node_count)
+    assert json.dumps(_export_with_projection(node_dict)) == json.dumps(_export_with_dill_deep_copy(node_dict))
+
+
+@pytest.mark.benchmark
+def test_projection_is_faster_than_the_deep_copy():
+    node_dict = _build_node_dict(5_000)
+    start_time = time.perf_counter()
+    _export_with_dill_deep_copy(node_dict)
+    deep_copy_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    _export_with_projection(node_dict)
+    projection_time = time.perf_counter() - start_time
+    assert projection_time * 5 < deep_copy_time
+
+
+def test_projection_shares_no_mutable_data_with_the_node_dict():
+    node_dict = _build_node_dict(2)
+    export_dict = _export_with_projection(node_dict)
+    export_dict['nodes'][0]['pins'][0]['value'] = 'changed'
+    export_dict['nodes'][0]['position']['x'] = -1
+    assert node_dict['nodes'][0]['pins'][0]['value'] == 'value'
+    assert node_dict['nodes'][0]['position'] == {'x': 0, 'y': 0}
+    assert 'pin_instance' in node_dict['nodes'][0]['pins'][0]
@@ -0,0 +1,122 @@
+import threading
+from contextvars import copy_context
+from multiprocessing.pool import ThreadPool
+
+import pytest
+
+from core.event_scope import event_scope, get_event_resource
+from libs.p4_connection_pool import P4ConnectionPool
+
+SETTINGS = ('fakeperforce:1666', 'tester', 'tester_ws', 'none')
+
+
+@pytest.fixture
+def pool(p4_server, monkeypatch):
+    import P4
+    from libs import p4util
+    pool = P4ConnectionPool(max_size=2, p4_factory=P4.P4)
+    monkeypatch.setattr(p4util, 'p4_connection_pool', pool)
+    yield pool
+    pool.close()
+
+
+def test_acquired_connection_is_not_handed_out_again(pool, p4_server):
+    first_p4 = pool.acquire(*SETTINGS)
+    second_p4 = pool.acquire(*SETTINGS)
+    assert first_p4 is not second_p4
+    pool.release(first_p4)
+    assert pool.acquire(*SETTINGS) is first_p4
+    assert p4_server.connect_count == 2
+
+
+def test_full_pool_never_disconnects_acquired_connections(pool):
+    import P4
+    acquired_p4_list = [pool.acquire(*SETTINGS), pool.acquire(*SETTINGS)]
+    with pytest.raises(P4.P4Exception):
+        pool.acquire(*SETTINGS, timeout=0)
+    assert all(p4.connected() for p4 in acquired_p4_list)
+
+
+def test_dropped_idle_connection_gets_reconnected(p4_server):
+    import P4
+    pool = P4ConnectionPool(health_check_interval=0, p4_factory=P4.P4)
+    p4 = pool.acquire(*SETTINGS)
+    pool.release(p4)
+    p4_server.drop_connections()
+    assert pool.acquire(*SETTINGS) is p4
+    p4.run_info()
+    assert p4_server.connect_count == 2
+
+
+def test_event_holds_its_connection_until_it_ends(pool, p4_server):
+    from libs.p4util import createP4Instance
+    with event_scope():
+        p4 = createP4Instance(SETTINGS[1], '', SETTINGS[0], SETTINGS[2], SETTINGS[3])
+        assert createP4Instance(SETTINGS[1], '', SETTINGS[0], SETTINGS[2], SETTINGS[3]) is p4
+        # Not idle while the event runs, so nobody else can get it
+        other_p4 = pool.acquire(*SETTINGS)
+        assert other_p4 is not p4
+        pool.release(other_p4)
+    with event_scope():
+        assert createP4Instance(SETTINGS[1], '', SETTINGS[0], SETTINGS[2], SETTINGS[3]) in (p4, other_p4)
+    assert p4_server.connect_count == 2
+
+
+def test_concurrent_events_get_their_own_connection(pool):
+    from libs.p4util import createP4Instance
+    barrier = threading.Barrier(2)
+
+    def run_event(_):
+        with event_scope():
+            p4 = createP4Instance(SETTINGS[1], '', SETTINGS[0], SETTINGS[2], SETTINGS[3])
+            # Both events hold their connection at the same time
+            barrier.wait(timeout=5)
+            return p4
+
+    with ThreadPool(2) as thread_pool:
+        p4_list = thread_pool.map(run_event, range(2))
+    assert p4_list[0] is not p4_list[1]
+    assert pool.connection_count == 2
+
+
+def test_outside_of_events_instances_are_not_pooled(pool):
+    from libs.p4util import createP4Instance, getP4inst
+    p4 = createP4Instance(SETTINGS[1], '', SETTINGS[0], SETTINGS[2], SETTINGS[3])
+    assert not p4.connected()
+    assert not getP4inst(None).connected()
+    assert pool.connection_count == 0
+
+
+def test_sync_workers_never_get_the_event_connection(pool):
+    from libs.p4util import createP4Instance, _acquire_free_pooled_connections
+    with event_scope():
+        p4 = createP4Instance(SETTINGS[1], '', SETTINGS[0], SETTINGS[2], SETTINGS[3])
+        worker_p4_list = _acquire_free_pooled_connections(p4, 3)
+        # The pool holds 2 connections at most, one of them being held by the event
+        assert len(worker_p4_list) == 1 and worker_p4_list[0] is not p4
+        for worker_p4 in worker_p4_list:
+            pool.release(worker_p4)
+
+
+def test_node_threads_of_an_event_get_their_own_resource():
+    released_list = []
+    acquired_count = [0]
+    acquired_lock = threading.Lock()
+
+    def acquire():
+        with acquired_lock:
+            acquired_count[0] += 1
+            return object()
+
+    def get_resource():
+        return get_event_resource('resource', acquire, released_list.append)
+
+    with event_scope():
+        main_resource = get_resource()
+        with ThreadPool(4) as thread_pool:
+            worker_resource_list = thread_pool.starmap(
+                lambda run, function: run(function), [(copy_context().run, get_resource) for _ in range(16)])
+        assert main_resource not in worker_resource_list
+        assert len(released_list) == 0
+    assert get_resource() is None
+    assert len(released_list) == acquired_count[0] == len(set(worker_resource_list)) + 1
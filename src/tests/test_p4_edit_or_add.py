@@ -0,0 +1,107 @@
+import math
+
+import pytest
+
+from libs import p4util
+from libs.p4util import CheckedOutException
+
+FILE_COUNT = 2500
+
+
+@pytest.fixture
+def p4(p4_server):
+    import P4
+    p4 = P4.P4()
+    p4.connect()
+    yield p4
+    p4.disconnect()
+
+
+def _submit_files_of_every_state(p4_server, p4, file_count) -> list:
+    """
+    Files cycling through the states p4EditOrAdd tells apart, returns their local paths
+    """
+    fpath_list = []
+    for index in range(file_count):
+        depot_file = f'//depot/Content/file_{index:05}.uasset'
+        state = index % 9
+        file_type = 'binary+l' if state in (2, 6) else 'text'
+        if state in (1, 2):
+            # Unknown to the depot, opened for add by another user
+            p4_server.open_by_other(depot_file, file_type=file_type, action='add')
+        elif state >= 3:
+            p4_server.submit(depot_file, file_type=file_type)
+            if state == 4:
+                p4_server.submit(depot_file, action='delete')
+            elif state in (5, 6):
+                p4_server.open_by_other(depot_file, file_type=file_type)
+            elif state in (7, 8):
+                action = 'edit' if state == 7 else 'integrate'
+                p4_server.opened_dict.setdefault(p4.client.lower(), {})[depot_file.lower()] = action
+        fpath_list.append(p4_server.to_local_path(depot_file))
+    return fpath_list
+
+
+def _partition_one_file_at_a_time(p4, fpaths, exclusive):
+    """The rules p4EditOrAdd applied with an fstat, and an opened -a for untracked files, per file"""
+    edit_fpaths = []
+    add_fpaths = []
+    conflicts = []
+    for fpath in fpaths:
+        fstats = p4.run_fstat(fpath)
+        if fstats:
+            fstat = fstats[0]
+            if 'action' in fstat:
+                if fstat.get('action') == 'branch' or fstat.get('action') == 'integrate':
+                    edit_fpaths.append(fpath)
+            elif 'otherOpen' in fstat and (exclusive or '+l' in fstat['headType']):
+                conflicts.append("File is opened by another user ({0}): {1}".format(fstat['otherOpen'], fpath))
+            elif 'headAction' not in fstat or 'delete' in fstat['headAction']:
+                add_fpaths.append(fpath)
+            else:
+                edit_fpaths.append(fpath)
+        else:
+            opened = p4.run_opened('-a', fpath)
+            if opened and (exclusive or '+l' in opened[0]['type']):
+                conflicts.append('File is opened by another user ({0}@{1}): {2}'.format(
+                    opened[0]['user'], opened[0]['client'], fpath))
+            else:
+                add_fpaths.append(fpath)
+    return edit_fpaths, add_fpaths, conflicts
+
+
+@pytest.mark.parametrize('exclusive', [True, False])
+def test_partition_matches_the_per_file_rules(p4_server, p4, exclusive):
+    fpath_list = _submit_files_of_every_state(p4_server, p4, 90)
+    edit_fpaths, add_fpaths, conflicts = _partition_one_file_at_a_time(p4, fpath_list, exclusive)
+    assert edit_fpaths and add_fpaths and conflicts
+    with pytest.raises(CheckedOutException) as exception_info:
+        p4util._partition_edit_and_add_files(p4, fpath_list, exclusive)
+    # Every conflict gets reported, where the per file rules stopped at the first one
+    assert sorted(str(exception_info.value).split('\n')) == sorted(conflicts)
+
+    conflict_free_fpath_list = [fpath for fpath in fpath_list if not any(conflict.endswith(f': {fpath}')
+                                                                         for conflict in conflicts)]
+    partition = p4util._partition_edit_and_add_files(p4, conflict_free_fpath_list, exclusive)
+    reference_partition = _partition_one_file_at_a_time(p4, conflict_free_fpath_list, exclusive)
+    # The untracked files of a chunk come after its tracked ones
+    assert [sorted(fpaths) for fpaths in partition] == [sorted(fpaths) for fpaths in reference_partition[:2]]
+
+
+def test_edit_or_add_uses_a_few_round_trips_per_chunk(p4_server, p4):
+    fpath_list = _submit_files_of_every_state(p4_server, p4, FILE_COUNT)
+    fpath_list = [fpath for index, fpath in enumerate(fpath_list) if index % 9 not in (2, 6)]
+    edit_fpaths, add_fpaths, conflicts = _partition_one_file_at_a_time(p4, fpath_list, False)
+    assert not conflicts
+    # One sync, where and open per file, plus the fstat and opened -a counted above
+    per_file_round_trip_count = p4_server.get_command_count() + len(fpath_list) * 3
+    p4_server.clear_call_log()
+
+    results = p4util.p4EditOrAdd(fpath_list, changeid='1', p4inst=p4, exclusive=False)
+    assert len(results) == len(edit_fpaths) + len(add_fpaths)
+    chunk_count = math.ceil(len(fpath_list) / p4util.P4_COMMAND_CHUNK_SIZE)
+    # sync, where and fstat of every chunk, then where and opened -a of its untracked files
+    assert p4_server.get_command_count() == chunk_count * 5 + \
+        math.ceil(len(edit_fpaths) / p4util.P4_COMMAND_CHUNK_SIZE) + \
+        math.ceil(len(add_fpaths) / p4util.P4_COMMAND_CHUNK_SIZE)
+    assert p4_server.get_command_count() * 100 < per_file_round_trip_count
@@ -0,0 +1,65 @@
+import random
+import time
+
+import pytest
+
+from libs import p4util
+from libs.p4util import compile_path_filter
+
+PATH_COUNT = 2_000
+BENCHMARK_PATH_COUNT = 1_000_000
+FOLDER_NAMES = ['Art', 'Characters', '_working', 'Textures', 'Meshes', '_Source', 'Anim', 'Props', 'Env', 'Temp']
+BANNED_STRINGS_LIST = [[], ['/_'], ['/_', '/temp/', '.PSD', '/source/'], ['/_', '/_working/']]
+# Banned strings matched across letter cases, at the end of the path, or only as part of a folder name
+EDGE_CASE_DEPOT_FILES = ['//depot/Game/TEMP/file.uasset', '//depot/Game/Art/file.PSD', '//depot/Game/Art_/file.psd',
+                         '//depot/Game/Art/_', '//depot/Game/Source_Art/file.uasset', '//depot/_Game/file.uasset']
+
+
+def _generate_depot_files(path_count: int) -> list:
+    random_generator = random.Random(0)
+    return [f'//depot/Game/{"/".join(random_generator.choices(FOLDER_NAMES, k=random_generator.randint(2, 5)))}'
+            f'/file_{index}.{random_generator.choice(["uasset", "psd"])}' for index in range(path_count)]
+
+
+def _filter_with_any(depot_files, banned_strings):
+    """The filter get_non_underscored_files used before compile_path_filter"""
+    return [depot_file for depot_file in depot_files
+            if not any([banned_string.lower() in depot_file.lower() for banned_string in banned_strings])]
+
+
+@pytest.mark.parametrize('banned_strings', BANNED_STRINGS_LIST)
+def test_compiled_filter_matches_any(banned_strings):
+    depot_files = _generate_depot_files(PATH_COUNT) + EDGE_CASE_DEPOT_FILES
+    is_kept = compile_path_filter(banned_strings)
+    assert [depot_file for depot_file in depot_files if is_kept(depot_file)] == \
+        _filter_with_any(depot_files, banned_strings)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('banned_strings', BANNED_STRINGS_LIST)
+def test_compiled_filter_is_faster_than_any(banned_strings):
+    depot_files = _generate_depot_files(BENCHMARK_PATH_COUNT)
+    start_time = time.perf_counter()
+    reference_depot_files = _filter_with_any(depot_files, banned_strings)
+    reference_time = time.perf_counter() - start_time
+    is_kept = compile_path_filter(banned_strings)
+    start_time = time.perf_counter()
+    kept_depot_files = [depot_file for depot_file in depot_files if is_kept(depot_file)]
+    compiled_time = time.perf_counter() - start_time
+    assert kept_depot_files == reference_depot_files
+    assert compiled_time < reference_time
+
+
+def test_default_bans_underscored_folders(p4_server):
+    import P4
+    for depot_file in ('//depot/Game/Art/file.uasset', '//depot/Game/_working/file.psd', '//depot/Game/Env_01/a.uasset',
+                       '//depot/Game/art/_Source/file.psd'):
+        p4_server.submit(depot_file)
+    p4_server.submit('//depot/Game/Props/deleted.uasset')
+    p4_server.submit('//depot/Game/Props/deleted.uasset', action='delete')
+    # The default string used to be iterated as the banned strings '/' and '_', which banned every depot file
+    assert _filter_with_any(list(p4_server.revision_dict), '/_') == []
+    assert p4util.get_non_underscored_files('//depot/...', p4inst=P4.P4()) == \
+        ['//depot/Game/Art/file.uasset', '//depot/Game/Env_01/a.uasset']
+    assert p4util.get_non_underscored_files('//depot/...', ['/_', '/art/'], p4inst=P4.P4()) == \
+        ['//depot/Game/Env_01/a.uasset']
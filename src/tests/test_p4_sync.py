@@ -0,0 +1,155 @@
+import os
+import time
+
+import pytest
+
+from libs import p4util
+from libs.p4_connection_pool import P4ConnectionPool
+from libs.p4_fstat_cache import P4FstatCache
+
+FILE_COUNT = 32
+
+
+@pytest.fixture
+def p4(p4_server, tmp_path, monkeypatch):
+    import P4
+    monkeypatch.setattr(p4util, 'p4_fstat_cache', P4FstatCache(tmp_path / 'P4FstatCache.db'))
+    monkeypatch.setattr(p4util, 'p4_connection_pool', P4ConnectionPool(p4_factory=P4.P4))
+    monkeypatch.setattr(p4util, 'P4_SYNC_JOURNAL_DIR', tmp_path / 'PerforceSync')
+    for index in range(FILE_COUNT):
+        p4_server.submit(f'//depot/Content/file_{index:02}.uasset', size=(index + 1) * 1024)
+    p4 = P4.P4()
+    p4.connect()
+    yield p4
+    p4util.p4_connection_pool.close()
+    p4util.p4_fstat_cache.close()
+
+
+def _get_out_of_date_files(p4_server, p4):
+    return {depot_file for depot_file, revision_list in p4_server.revision_dict.items()
+            if p4_server.get_have_revision(p4.client, depot_file) != len(revision_list)}
+
+
+def _fail_last_chunk(p4_server, file_revisions):
+    """Make the sync fail once on the last of the chunks synced one after another"""
+    last_chunk = p4util._split_into_balanced_chunks(file_revisions, 1)[-1][0]
+    p4_server.failing_sync_file_set.add(last_chunk[0].split('#')[0].lower())
+
+
+def _sync_from_scratch(p4_server, p4, connection_pool: P4ConnectionPool) -> tuple:
+    """Sync every depot file, returns the results and the time taken"""
+    for depot_file in p4_server.revision_dict:
+        p4_server.set_have_revision(p4.client, depot_file, 0)
+    p4util.p4_fstat_cache.clear()
+    p4_server.clear_call_log()
+    p4_server.peak_running_command_count = 0
+    p4util.p4_connection_pool = connection_pool
+    start_time = time.perf_counter()
+    try:
+        results = p4util.sync_in_parallel('//depot/...', p4, worker_count=4)
+    finally:
+        connection_pool.close()
+    return results, time.perf_counter() - start_time
+
+
+def test_parallel_sync_overlaps_the_server_latency(p4_server, p4):
+    import P4
+    p4_server.latency = 0.02
+    # Without any free pooled connection, every chunk goes through the caller's connection
+    serial_results, _ = _sync_from_scratch(p4_server, p4, P4ConnectionPool(max_size=0))
+    assert len(serial_results) == FILE_COUNT
+    assert p4_server.peak_running_command_count == 1
+    parallel_results, _ = _sync_from_scratch(p4_server, p4, P4ConnectionPool(p4_factory=P4.P4))
+    assert sorted(result['depotFile'] for result in parallel_results) == \
+        sorted(result['depotFile'] for result in serial_results)
+    assert not _get_out_of_date_files(p4_server, p4)
+    # 16 chunks synced one at a time, then 4 at a time once the 3 other connections are opened
+    assert p4_server.get_command_count('sync') == 16
+    assert 1 < p4_server.peak_running_command_count <= 4
+
+
+@pytest.mark.benchmark
+def test_parallel_sync_takes_less_time(p4_server, p4):
+    import P4
+    p4_server.latency = 0.02
+    _, serial_time = _sync_from_scratch(p4_server, p4, P4ConnectionPool(max_size=0))
+    _, parallel_time = _sync_from_scratch(p4_server, p4, P4ConnectionPool(p4_factory=P4.P4))
+    assert parallel_time < serial_time * 0.75
+
+
+def test_interrupted_sync_resumes_at_head(p4_server, p4):
+    import P4
+    p4_server.failing_sync_file_set.add('//depot/content/file_00.uasset')
+    with pytest.raises(P4.P4Exception):
+        p4util.sync_in_parallel('//depot/...', p4, worker_count=4)
+    p4_server.failing_sync_file_set.clear()
+    pending_files = _get_out_of_date_files(p4_server, p4)
+    synced_files = set(p4_server.revision_dict) - pending_files
+    assert pending_files and synced_files
+    # A file of a chunk synced before the interruption gets a new revision
+    updated_file = sorted(synced_files)[0]
+    p4_server.submit(updated_file)
+
+    results = p4util.sync_in_parallel('//depot/...', p4, worker_count=4)
+    assert sorted(result['depotFile'] for result in results) == sorted(pending_files | {updated_file})
+    assert not _get_out_of_date_files(p4_server, p4)
+
+
+def test_sync_of_file_revisions_resumes_from_its_journal(p4_server, p4):
+    import P4
+    file_revisions = [(f'{depot_file}#1', 1024) for depot_file in p4_server.revision_dict]
+    _fail_last_chunk(p4_server, file_revisions)
+    with pytest.raises(P4.P4Exception):
+        p4util.sync_file_revisions_in_parallel(file_revisions, p4, worker_count=1)
+    p4_server.failing_sync_file_set.clear()
+    pending_files = _get_out_of_date_files(p4_server, p4)
+
+    p4_server.clear_call_log()
+    results = p4util.sync_file_revisions_in_parallel(file_revisions, p4, worker_count=1)
+    assert sorted(result['depotFile'] for result in results) == sorted(pending_files)
+    # Only the chunk which was not synced yet
+    assert p4_server.get_command_count('sync') == 1
+    assert not list(p4util.P4_SYNC_JOURNAL_DIR.iterdir())
+
+
+def test_expired_sync_journal_is_planned_again(p4_server, p4):
+    import P4
+    file_revisions = [(f'{depot_file}#1', 1024) for depot_file in p4_server.revision_dict]
+    _fail_last_chunk(p4_server, file_revisions)
+    with pytest.raises(P4.P4Exception):
+        p4util.sync_file_revisions_in_parallel(file_revisions, p4, worker_count=1)
+    p4_server.failing_sync_file_set.clear()
+    journal_path = p4util._get_sync_journal_path(p4, [file_revision for file_revision, size in file_revisions])
+    expired_time = time.time() - p4util.P4_SYNC_JOURNAL_MAX_AGE - 1
+    os.utime(journal_path, (expired_time, expired_time))
+
+    p4_server.clear_call_log()
+    p4util.sync_file_revisions_in_parallel(file_revisions, p4, worker_count=1)
+    # Every chunk synced again, the files already at the revision being skipped by the server
+    assert p4_server.get_command_count('sync') == 4
+    assert not _get_out_of_date_files(p4_server, p4)
+
+
+def _get_cached_have_revision(p4, depot_file):
+    fstat = next(fstat for fstat in p4util.p4_fstat_cache.run_fstat(p4, '//depot/...')
+                 if fstat['depotFile'] == depot_file)
+    return fstat.get('haveRev', None)
+
+
+def test_edit_or_add_records_synced_revisions(p4_server, p4):
+    depot_file = '//depot/Content/file_00.uasset'
+    assert _get_cached_have_revision(p4, depot_file) is None
+    p4util.p4EditOrAdd(p4_server.to_local_path(depot_file), p4inst=p4)
+    assert p4_server.get_have_revision(p4.client, depot_file) == 1
+    assert _get_cached_have_revision(p4, depot_file) == '1'
+
+
+def test_sync_deleted_records_removed_files(p4_server, p4):
+    depot_file = '//depot/Content/file_01.uasset'
+    p4.run_sync('//depot/...')
+    p4_server.submit(depot_file, action='delete')
+    assert _get_cached_have_revision(p4, depot_file) == '1'
+    p4util.sync_deleted('//depot/...', p4)
+    assert p4_server.get_have_revision(p4.client, depot_file) == 0
+    # No change got submitted since, so the cached record is read as it was updated
+    assert _get_cached_have_revision(p4, depot_file) is None
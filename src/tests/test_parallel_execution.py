@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from core import executor
+from core.data_loader import refresh_core_data_with_json_dict
+from core.executor import execute_event, setup_executor_parallel_mode
+from tests.graph_nodes import record, slow_increment
+from tests.graph_nodes.slow_increment import SLOW_INCREMENT_DURATION
+from tests.tool_builder import ToolBuilder
+
+SLOW_NODE_COUNT = 8
+WORKER_COUNT = 4
+
+
+@pytest.fixture
+def sequential_mode_after():
+    yield
+    setup_executor_parallel_mode(0)
+
+
+def _load_sum_of_slow_nodes_tool() -> str:
+    """
+    Load a tool recording the sum of independent Slow Increment nodes, followed by 2 dependent ones, returns the
+    tag of its event
+    """
+    tool_builder = ToolBuilder()
+    event_node = tool_builder.add_event('Sum')
+    sum_node = tool_builder.add_node('tests.graph_nodes.slow_increment', A=0)
+    for index in range(1, SLOW_NODE_COUNT):
+        add_node = tool_builder.add_node('tests.graph_nodes.add_int')
+        tool_builder.link_data(sum_node, 'Result', add_node, 'A')
+        tool_builder.link_data(tool_builder.add_node('tests.graph_nodes.slow_increment', A=index), 'Result',
+                               add_node, 'B')
+        sum_node = add_node
+    for _ in range(2):
+        slow_node = tool_builder.add_node('tests.graph_nodes.slow_increment')
+        tool_builder.link_data(sum_node, 'Result', slow_node, 'A')
+        sum_node = slow_node
+    record_node = tool_builder.add_node('tests.graph_nodes.record')
+    tool_builder.link_data(sum_node, 'Result', record_node, 'Value')
+    tool_builder.link_flow(event_node, 'Exec Out', record_node)
+    assert refresh_core_data_with_json_dict(tool_builder.get_tool_data(), {}, is_checking_regex=False)[0] == 1
+    return event_node['uuid']
+
+
+def _run_with_worker_count(event_tag: str, worker_count: int) -> float:
+    setup_executor_parallel_mode(worker_count)
+    slow_increment.peak_running_count_list[0] = 0
+    start_time = time.perf_counter()
+    assert execute_event(event_tag)[0] == 1
+    return time.perf_counter() - start_time
+
+
+def test_independent_pure_nodes_run_concurrently(sequential_mode_after):
+    event_tag = _load_sum_of_slow_nodes_tool()
+    record.recorded_value_list.clear()
+    _run_with_worker_count(event_tag, 1)
+    assert executor.parallel_thread_pool is None
+    assert slow_increment.peak_running_count_list[0] == 1
+    _run_with_worker_count(event_tag, WORKER_COUNT)
+    assert 1 < slow_increment.peak_running_count_list[0] <= WORKER_COUNT
+    expected_sum = sum(range(1, SLOW_NODE_COUNT + 1)) + 2
+    assert record.recorded_value_list == [expected_sum, expected_sum]
+
+
+@pytest.mark.benchmark
+def test_independent_pure_nodes_take_less_time_in_parallel(sequential_mode_after):
+    event_tag = _load_sum_of_slow_nodes_tool()
+    sequential_time = _run_with_worker_count(event_tag, 1)
+    parallel_time = _run_with_worker_count(event_tag, WORKER_COUNT)
+    assert sequential_time >= (SLOW_NODE_COUNT + 2) * SLOW_INCREMENT_DURATION
+    # 2 levels of 4 independent nodes, then the 2 dependent nodes one after another
+    assert parallel_time < (SLOW_NODE_COUNT // WORKER_COUNT + 2 + 1.5) * SLOW_INCREMENT_DURATION
+
+
+def test_failing_pure_node_stops_the_event(sequential_mode_after):
+    tool_builder = ToolBuilder()
+    event_node = tool_builder.add_event('Fail')
+    record_node = tool_builder.add_node('tests.graph_nodes.record')
+    add_node = tool_builder.add_node('tests.graph_nodes.add_int', B=1)
+    tool_builder.link_data(tool_builder.add_node('tests.graph_nodes.slow_increment', A='not an int'), 'Result',
+                           add_node, 'A')
+    tool_builder.link_data(tool_builder.add_node('tests.graph_nodes.slow_increment', A=1), 'Result', add_node, 'B')
+    tool_builder.link_data(add_node, 'Result', record_node, 'Value')
+    tool_builder.link_flow(event_node, 'Exec Out', record_node)
+    assert refresh_core_data_with_json_dict(tool_builder.get_tool_data(), {}, is_checking_regex=False)[0] == 1
+    record.recorded_value_list.clear()
+    setup_executor_parallel_mode(WORKER_COUNT)
+    # As in the sequential evaluation, the error is raised on the calling thread
+    with pytest.raises(RuntimeWarning):
+        execute_event(event_node['uuid'])
+    assert record.recorded_value_list == []
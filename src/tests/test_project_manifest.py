@@ -0,0 +1,149 @@
+import json
+import os
+
+import pytest
+
+from core import project_manifest
+from core.project_manifest import load_project_manifest, get_project_manifest_path
+from core.tool_file import write_tool_file
+from core.tool_file_cache import invalidate_tool_file
+from tests.tool_builder import ToolBuilder
+
+
+def _build_tool_data(*event_name_list) -> dict:
+    tool_builder = ToolBuilder()
+    tool_builder.add_var('Name', 'String', 'default', is_exposed=True)
+    tool_builder.add_var('Internal', 'Int', 0)
+    for event_name in event_name_list:
+        tool_builder.add_event(event_name)
+    return tool_builder.get_tool_data()
+
+
+def _write_project(project_path, tool_dict: dict):
+    """Write the tools keyed by tool name, and a project listing them in the same order"""
+    for tool_name, tool_data in tool_dict.items():
+        write_tool_file(project_path.parent / f'{tool_name}.mtool', tool_data, is_compact=tool_name == 'Compact')
+        invalidate_tool_file(project_path.parent / f'{tool_name}.mtool')
+    project_path.write_text(json.dumps({tool_name: f'{tool_name}.mtool' for tool_name in tool_dict}))
+
+
+@pytest.fixture
+def project_path(tmp_path):
+    project_path = tmp_path / 'Project.mproject'
+    _write_project(project_path, {'Build': _build_tool_data('Build', 'Clean'), 'Compact': _build_tool_data('Sync')})
+    return project_path
+
+
+@pytest.fixture
+def tool_read_list(monkeypatch):
+    """Paths of the tool files read by the manifest"""
+    tool_read_list = []
+    get_tool_file_version = project_manifest.get_tool_file_version
+
+    def get_read_tool_file_version(tool_path):
+        tool_read_list.append(tool_path.name)
+        return get_tool_file_version(tool_path)
+
+    monkeypatch.setattr(project_manifest, 'get_tool_file_version', get_read_tool_file_version)
+    return tool_read_list
+
+
+def _get_event_labels(tool_summary_dict: dict) -> dict:
+    return {tool_name: list(tool_summary['events'].values()) for tool_name, tool_summary in tool_summary_dict.items()}
+
+
+def test_manifest_lists_events_and_exposed_vars(project_path, tool_read_list):
+    tool_summary_dict = load_project_manifest(project_path)
+    assert _get_event_labels(tool_summary_dict) == {'Build': ['Build', 'Clean'], 'Compact': ['Sync']}
+    assert tool_summary_dict['Compact']['tool_path'] == project_path.parent / 'Compact.mtool'
+    assert [var_info['name'][0] for var_info in tool_summary_dict['Build']['vars'].values()] == ['Name']
+    assert tool_read_list == ['Build.mtool', 'Compact.mtool']
+    manifest = json.loads(get_project_manifest_path(project_path).read_text())
+    assert manifest['version'] == project_manifest.PROJECT_MANIFEST_VERSION
+    assert list(manifest['tools']) == ['Build', 'Compact']
+
+
+def test_unchanged_project_reads_no_tool_file(project_path, tool_read_list):
+    first_tool_summary_dict = load_project_manifest(project_path)
+    manifest_path = get_project_manifest_path(project_path)
+    os.utime(manifest_path, ns=(1, 1))
+    tool_read_list.clear()
+    assert load_project_manifest(project_path) == first_tool_summary_dict
+    assert tool_read_list == []
+    assert manifest_path.stat().st_mtime_ns == 1
+
+
+def test_touched_tool_is_hashed_but_not_decoded_again(project_path, tool_read_list, monkeypatch):
+    first_tool_summary_dict = load_project_manifest(project_path)
+    build_tool_path = project_path.parent / 'Build.mtool'
+    build_tool_stat = build_tool_path.stat()
+    os.utime(build_tool_path, ns=(build_tool_stat.st_atime_ns, build_tool_stat.st_mtime_ns + 1_000_000_000))
+    # Decoding the tool again would fail
+    monkeypatch.setattr(project_manifest, '_construct_manifest_entry', None)
+    tool_read_list.clear()
+    assert load_project_manifest(project_path) == first_tool_summary_dict
+    assert tool_read_list == ['Build.mtool']
+    # The new modification time is saved, the next load reads nothing
+    tool_read_list.clear()
+    load_project_manifest(project_path)
+    assert tool_read_list == []
+
+
+def test_stale_entries_are_rebuilt(project_path, tool_read_list):
+    load_project_manifest(project_path)
+    build_tool_path = project_path.parent / 'Build.mtool'
+    build_tool_bytes = build_tool_path.read_bytes()
+    _write_project(project_path, {'Compact': _build_tool_data('Sync', 'Submit'), 'Build': _build_tool_data()})
+    # Rewritten with the same content
+    build_tool_path.write_bytes(build_tool_bytes)
+    tool_read_list.clear()
+    tool_summary_dict = load_project_manifest(project_path)
+    assert _get_event_labels(tool_summary_dict) == {'Compact': ['Sync', 'Submit'], 'Build': ['Build', 'Clean']}
+    assert tool_read_list == ['Compact.mtool', 'Build.mtool']
+    assert list(json.loads(get_project_manifest_path(project_path).read_text())['tools']) == ['Compact', 'Build']
+
+
+@pytest.mark.parametrize('manifest_text', ['', '{"version": 1, "tools": ', '{"version": 0, "tools": {}}'])
+def test_unreadable_or_outdated_manifest_is_rebuilt(project_path, tool_read_list, manifest_text):
+    get_project_manifest_path(project_path).write_text(manifest_text)
+    assert _get_event_labels(load_project_manifest(project_path)) == {'Build': ['Build', 'Clean'],
+                                                                      'Compact': ['Sync']}
+    assert tool_read_list == ['Build.mtool', 'Compact.mtool']
+    tool_read_list.clear()
+    load_project_manifest(project_path)
+    assert tool_read_list == []
+
+
+def test_project_is_listed_when_the_manifest_cannot_be_written(project_path, tool_read_list, monkeypatch):
+    def write_read_only_file(file_path, file_bytes):
+        raise PermissionError(f'{file_path} is read-only')
+
+    monkeypatch.setattr(project_manifest, 'write_file_bytes_atomically', write_read_only_file)
+    for _ in range(2):
+        assert _get_event_labels(load_project_manifest(project_path)) == {'Build': ['Build', 'Clean'],
+                                                                          'Compact': ['Sync']}
+    assert not get_project_manifest_path(project_path).exists()
+    assert tool_read_list == ['Build.mtool', 'Compact.mtool'] * 2
+
+
+def test_tabs_are_built_from_the_manifest_once_activated(project_path, tool_read_list):
+    pytest.importorskip('dearpygui')
+    from ui.ToolsViewer.tools_viewer_project import ToolsViewer
+    load_project_manifest(project_path)
+    tool_read_list.clear()
+    tools_viewer = ToolsViewer.__new__(ToolsViewer)
+    tools_viewer.tab_dict = {}
+    imported_tab_list = []
+    tools_viewer._init_new_tab_and_get_child_window_id = lambda tab_name: (f'{tab_name} tab', f'{tab_name} window')
+    tools_viewer._import_tool_to_tab = lambda window_id, tool_summary: imported_tab_list.append(
+        (window_id, list(tool_summary['events'].values())))
+    tools_viewer._batch_open_tools_in_project(project_path)
+    assert list(tools_viewer.tab_dict) == ['Build', 'Compact']
+    assert imported_tab_list == [('Build window', ['Build', 'Clean'])]
+    tools_viewer.update_current_tab_name_by_tab_id('Compact tab')
+    tools_viewer.update_current_tab_name_by_tab_id('Build tab')
+    tools_viewer.update_current_tab_name_by_tab_id('Compact tab')
+    assert imported_tab_list == [('Build window', ['Build', 'Clean']), ('Compact window', ['Sync'])]
+    assert tools_viewer.tab_dict['Compact']['tool_path'] == project_path.parent / 'Compact.mtool'
+    # Listed and built from the manifest alone
+    assert tool_read_list == []
@@ -0,0 +1,50 @@
+import sys
+
+from core.data_loader import refresh_core_data_with_json_dict
+from core.executor import execute_event
+from tests.graph_nodes import add_int, record
+from tests.tool_builder import ToolBuilder
+
+PURE_CHAIN_LENGTH = 10_000
+LOOP_ITERATION_NUM = 100_000
+
+
+def test_long_pure_chain_is_computed_without_recursion():
+    tool_builder = ToolBuilder()
+    event_node = tool_builder.add_event('Sum chain')
+    previous_add_node = tool_builder.add_node('tests.graph_nodes.add_int', A=0, B=1)
+    for _ in range(PURE_CHAIN_LENGTH - 1):
+        add_node = tool_builder.add_node('tests.graph_nodes.add_int', B=1)
+        tool_builder.link_data(previous_add_node, 'Result', add_node, 'A')
+        previous_add_node = add_node
+    record_node = tool_builder.add_node('tests.graph_nodes.record')
+    tool_builder.link_data(previous_add_node, 'Result', record_node, 'Value')
+    tool_builder.link_flow(event_node, 'Exec Out', record_node)
+    # Far deeper than the recursion limit, loading and running used to recurse once per node
+    assert PURE_CHAIN_LENGTH > sys.getrecursionlimit()
+    assert refresh_core_data_with_json_dict(tool_builder.get_tool_data(), {}, is_checking_regex=False)[0] == 1
+    record.recorded_value_list.clear()
+    add_int.run_count_list[0] = 0
+    assert execute_event(event_node['uuid'])[0] == 1
+    assert record.recorded_value_list == [PURE_CHAIN_LENGTH]
+    assert add_int.run_count_list[0] == PURE_CHAIN_LENGTH
+
+
+def test_long_loop_runs_without_recursion():
+    tool_builder = ToolBuilder()
+    event_node = tool_builder.add_event('Loop')
+    do_n_node = tool_builder.add_node('nodes.flow_control_node.node_do_n', N=LOOP_ITERATION_NUM)
+    sequence_node = tool_builder.add_node('nodes.flow_control_node.node_sequence')
+    add_node = tool_builder.add_node('tests.graph_nodes.add_int', B=1)
+    record_node = tool_builder.add_node('tests.graph_nodes.record')
+    tool_builder.link_data(do_n_node, 'Index', add_node, 'A')
+    tool_builder.link_data(add_node, 'Result', record_node, 'Value')
+    tool_builder.link_flow(event_node, 'Exec Out', do_n_node)
+    tool_builder.link_flow(do_n_node, 'Exit', sequence_node)
+    tool_builder.link_flow(sequence_node, 'Then 0', record_node)
+    assert refresh_core_data_with_json_dict(tool_builder.get_tool_data(), {}, is_checking_regex=False)[0] == 1
+    record.recorded_value_list.clear()
+    assert execute_event(event_node['uuid'])[0] == 1
+    assert len(record.recorded_value_list) == LOOP_ITERATION_NUM
+    assert record.recorded_value_list[:3] == [1, 2, 3]
+    assert record.recorded_value_list[-1] == LOOP_ITERATION_NUM
@@ -0,0 +1,101 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from core import run
+from core.tool_file import write_tool_file
+from tests.graph_nodes import record
+from tests.headless import SRC_DIR
+from tests.tool_builder import ToolBuilder
+
+
+def _build_greet_tool() -> dict:
+    """Tool recording its exposed Name and Count vars, and failing on its Fail event"""
+    tool_builder = ToolBuilder()
+    tool_builder.add_var('Name', 'String', 'default', is_exposed=True)
+    tool_builder.add_var('Count', 'Int', 1, is_exposed=True)
+    greet_event_node = tool_builder.add_event('Greet')
+    name_record_node = tool_builder.add_node('tests.graph_nodes.record')
+    count_record_node = tool_builder.add_node('tests.graph_nodes.record')
+    tool_builder.link_data(tool_builder.add_get_var_node('Name', 'String'), 'String out', name_record_node, 'Value')
+    tool_builder.link_data(tool_builder.add_get_var_node('Count', 'Int'), 'Int out', count_record_node, 'Value')
+    tool_builder.link_flow(greet_event_node, 'Exec Out', name_record_node)
+    tool_builder.link_flow(name_record_node, 'Exec Out', count_record_node)
+    fail_event_node = tool_builder.add_event('Fail')
+    fail_record_node = tool_builder.add_node('tests.graph_nodes.record')
+    tool_builder.link_data(tool_builder.add_node('tests.graph_nodes.add_int', A='not an int', B=1), 'Result',
+                           fail_record_node, 'Value')
+    tool_builder.link_flow(fail_event_node, 'Exec Out', fail_record_node)
+    return tool_builder.get_tool_data()
+
+
+@pytest.fixture
+def project_path(tmp_path):
+    """Project of an empty tool followed by the greet tool"""
+    write_tool_file(tmp_path / 'Empty.mtool', ToolBuilder().get_tool_data())
+    write_tool_file(tmp_path / 'Greet.mtool', _build_greet_tool(), is_compact=True)
+    project_path = tmp_path / 'Project.mproject'
+    project_path.write_text(json.dumps({'Empty': 'Empty.mtool', 'Greet': 'Greet.mtool'}))
+    return project_path
+
+
+def _run_main(monkeypatch, *arg_list) -> int:
+    monkeypatch.setattr(sys, 'argv', ['run.py'] + [str(arg) for arg in arg_list])
+    record.recorded_value_list.clear()
+    return run.main()
+
+
+def test_event_runs_with_the_exposed_var_values(project_path, tmp_path, monkeypatch):
+    assert _run_main(monkeypatch, project_path, '--tool', 'Greet', '--event', 'Greet') == 0
+    assert record.recorded_value_list == ['default', 1]
+    var_file_path = tmp_path / 'vars.json'
+    var_file_path.write_text(json.dumps({'Name': 'file', 'Count': 2}))
+    monkeypatch.setenv(run.ENV_VAR_PREFIX + 'NAME', 'environment')
+    monkeypatch.setenv(run.ENV_VAR_PREFIX + 'COUNT', '3')
+    # Environment, then var file, then CLI args
+    assert _run_main(monkeypatch, project_path, '--tool', 'Greet', '--event', 'Event Greet', '--var_file',
+                     var_file_path, '--var', 'Name=cli') == 0
+    assert record.recorded_value_list == ['cli', 2]
+
+
+def test_tool_file_runs_without_project(project_path, monkeypatch):
+    monkeypatch.setenv(run.ENV_VAR_PREFIX + 'COUNT', '3')
+    assert _run_main(monkeypatch, project_path.parent / 'Greet.mtool', '--event', 'Greet',
+                     '--parallel_workers', 2) == 0
+    assert record.recorded_value_list == ['default', 3]
+
+
+@pytest.mark.parametrize('arg_list', [['--tool', 'Missing', '--event', 'Greet'],
+                                      ['--tool', 'Greet', '--event', 'Missing'],
+                                      # The first tool of the project has no Greet event
+                                      ['--event', 'Greet'],
+                                      ['--tool', 'Greet', '--event', 'Greet', '--var', 'Count=many'],
+                                      ['--tool', 'Greet', '--event', 'Greet', '--var', 'Count']])
+def test_invalid_arguments_exit_with_code_2(project_path, monkeypatch, arg_list):
+    assert _run_main(monkeypatch, project_path, *arg_list) == 2
+    assert record.recorded_value_list == []
+
+
+def test_failing_event_exits_with_code_1(project_path, monkeypatch):
+    assert _run_main(monkeypatch, project_path, '--tool', 'Greet', '--event', 'Fail') == 1
+    assert record.recorded_value_list == []
+
+
+def test_exit_code_of_the_module(project_path):
+    """Run as documented, in a process of its own holding the test environment"""
+    def run_module(*arg_list):
+        return subprocess.run([sys.executable, '-c', 'import sys; from tests.headless import '
+                               'setup_headless_environment; setup_headless_environment(); from core.run import main; '
+                               'sys.exit(main())', str(project_path), '--tool', 'Greet', *arg_list],
+                              cwd=SRC_DIR, env=dict(os.environ), capture_output=True, text=True)
+
+    completed_process = run_module('--event', 'Greet', '--var', 'Name=alice')
+    assert completed_process.returncode == 0, completed_process.stderr
+    completed_process = run_module('--event', 'Fail')
+    assert completed_process.returncode == 1, completed_process.stderr
+    completed_process = run_module('--event', 'Missing')
+    assert completed_process.returncode == 2
+    assert 'Could not find event Missing' in completed_process.stderr
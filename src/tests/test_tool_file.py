@@ -0,0 +1,86 @@
+import json
+import sys
+
+import pytest
+
+from core import tool_file
+from core.tool_file import ToolCodec, ToolCompression
+from tests.tool_builder import ToolBuilder
+
+CODEC_COMPRESSION_LIST = [(codec, compression) for codec in (ToolCodec.Json, ToolCodec.MsgPack)
+                          for compression in (ToolCompression.NoCompression, ToolCompression.Zlib,
+                                              ToolCompression.Zstd)]
+
+
+@pytest.fixture
+def tool_data() -> dict:
+    """Tool data as read from a JSON .mtool file, with events, vars, flows and data links"""
+    tool_builder = ToolBuilder()
+    tool_builder.add_var('Count', 'Int', 7, is_exposed=True)
+    event_node = tool_builder.add_event('Record')
+    add_node = tool_builder.add_node('tests.graph_nodes.add_int', A=2, B=3)
+    record_node = tool_builder.add_node('tests.graph_nodes.record')
+    tool_builder.link_data(add_node, 'Result', record_node, 'Value')
+    tool_builder.link_flow(event_node, 'Exec Out', record_node)
+    tool_builder.add_event('Unused')
+    return json.loads(tool_file.encode_tool_bytes(tool_builder.get_tool_data()))
+
+
+@pytest.mark.parametrize('codec, compression', CODEC_COMPRESSION_LIST)
+def test_compact_round_trip(tool_data, codec, compression):
+    tool_bytes = tool_file.encode_compact_tool_bytes(tool_data, codec, compression)
+    assert tool_bytes.startswith(tool_file.COMPACT_TOOL_MAGIC)
+    assert tool_file.decode_tool_bytes(tool_bytes) == tool_data
+    assert tool_file.decode_tool_summary(tool_bytes) == tool_file.decode_tool_summary(
+        tool_file.encode_tool_bytes(tool_data))
+
+
+def test_summary_lists_events_in_node_order(tool_data):
+    tool_summary = tool_file.decode_tool_summary(tool_file.encode_compact_tool_bytes(tool_data))
+    assert list(tool_summary['events'].values()) == ['Record', 'Unused']
+    assert tool_summary['vars'] == tool_data['vars']
+
+
+def test_compact_format_falls_back_without_optional_dependencies(tool_data, monkeypatch):
+    msgpack_zstd_tool_bytes = tool_file.encode_compact_tool_bytes(tool_data, ToolCodec.MsgPack,
+                                                                  ToolCompression.Zstd)
+    monkeypatch.setattr(tool_file, 'msgpack', None)
+    monkeypatch.setattr(tool_file, 'zstandard', None)
+    tool_bytes = tool_file.encode_compact_tool_bytes(tool_data)
+    assert tool_file._unpack_compact_tool_prefix(tool_bytes)[:2] == (ToolCodec.Json, ToolCompression.Zlib)
+    assert tool_file.decode_tool_bytes(tool_bytes) == tool_data
+    with pytest.raises(ValueError, match='pip install zstandard'):
+        tool_file.decode_tool_bytes(msgpack_zstd_tool_bytes)
+    with pytest.raises(ValueError, match='pip install msgpack'):
+        tool_file.encode_compact_tool_bytes(tool_data, ToolCodec.MsgPack, ToolCompression.Zlib)
+
+
+def _run_converter(monkeypatch, *arg_list) -> int:
+    monkeypatch.setattr(sys, 'argv', ['tool_file.py'] + [str(arg) for arg in arg_list])
+    return tool_file.main()
+
+
+def test_converter_converts_in_place_both_ways(tool_data, tmp_path, monkeypatch):
+    tool_path_list = [tmp_path / 'First.mtool', tmp_path / 'Second.mtool']
+    for tool_path in tool_path_list:
+        tool_file.write_tool_file(tool_path, tool_data)
+    assert _run_converter(monkeypatch, *tool_path_list, '--format', 'compact') == 0
+    for tool_path in tool_path_list:
+        assert tool_file.is_compact_tool_file(tool_path)
+        assert tool_file.load_tool_file(tool_path) == tool_data
+    assert _run_converter(monkeypatch, *tool_path_list, '--format', 'json') == 0
+    for tool_path in tool_path_list:
+        assert not tool_file.is_compact_tool_file(tool_path)
+        assert json.loads(tool_path.read_bytes()) == tool_data
+
+
+def test_converter_reports_unreadable_files(tool_data, tmp_path, monkeypatch):
+    broken_tool_path = tmp_path / 'Broken.mtool'
+    broken_tool_path.write_bytes(b'{"nodes": [')
+    tool_path = tmp_path / 'Tool.mtool'
+    tool_file.write_tool_file(tool_path, tool_data)
+    assert _run_converter(monkeypatch, broken_tool_path, tool_path, '--format', 'compact') == 1
+    assert broken_tool_path.read_bytes() == b'{"nodes": ['
+    assert tool_file.load_tool_file(tool_path) == tool_data
+    with pytest.raises(SystemExit):
+        _run_converter(monkeypatch, tool_path, '--format', 'yaml')
@@ -0,0 +1,225 @@
+import time
+
+import pytest
+
+from ui.NodeEditor.undo_journal import UndoJournal, UndoAction, UndoActionType
+
+BENCHMARK_NODE_COUNT = 2_000
+
+
+class _Graph:
+    """
+    Live node graph applying the undo actions as NodeEditor._apply_undo_action does: re-created nodes get new tags,
+    mapped from the journal tags they were recorded with
+    """
+
+    def __init__(self, undo_journal: UndoJournal):
+        self.undo_journal = undo_journal
+        # node tag -> pin tags
+        self.node_dict = {}
+        # (source pin tag, destination pin tag)
+        self.link_set = set()
+        self.pin_value_dict = {}
+        self.live_pin_set = set()
+        self._created_count = 0
+
+    def add_node(self, pin_count=2) -> str:
+        self._created_count += 1
+        node_tag = f'node_{self._created_count}'
+        self.node_dict[node_tag] = [f'{node_tag}_pin_{index}' for index in range(pin_count)]
+        self.live_pin_set.update(self.node_dict[node_tag])
+        return node_tag
+
+    def delete_node(self, node_tag: str):
+        self.live_pin_set.difference_update(self.node_dict.pop(node_tag))
+
+    def get_node_undo_data(self, node_tag: str) -> dict:
+        return {'uuid': self.undo_journal.get_journal_tag(node_tag),
+                'pins': [self.undo_journal.get_journal_tag(pin_tag) for pin_tag in self.node_dict[node_tag]]}
+
+    def get_link_undo_data(self, link: tuple) -> dict:
+        return {'source_pin': self.undo_journal.get_journal_tag(link[0]),
+                'destination_pin': self.undo_journal.get_journal_tag(link[1])}
+
+    def record(self, action_type: UndoActionType, data: dict):
+        self.undo_journal.record(UndoAction(action_type, self, data))
+
+    def remove_node(self, node_tag: str):
+        """Remove a node and its links in one group, as deleting a selected node does"""
+        self.undo_journal.begin_group()
+        pin_tag_set = set(self.node_dict[node_tag])
+        for link in sorted(link for link in self.link_set if link[0] in pin_tag_set or link[1] in pin_tag_set):
+            self.record(UndoActionType.RemoveLink, self.get_link_undo_data(link))
+            self.link_set.discard(link)
+        self.record(UndoActionType.RemoveNode, self.get_node_undo_data(node_tag))
+        self.delete_node(node_tag)
+        self.undo_journal.end_group()
+
+    def apply_group(self, is_undo: bool) -> bool:
+        group = self.undo_journal.pop_undo_group() if is_undo else self.undo_journal.pop_redo_group()
+        if group is None:
+            return False
+        for action in (reversed(group) if is_undo else group):
+            self._apply_action(action, is_undo)
+        return True
+
+    def _apply_action(self, action: UndoAction, is_undo: bool):
+        data = action.data
+        get_live_tag = self.undo_journal.get_live_tag
+        is_adding = (action.action_type in (UndoActionType.AddNode, UndoActionType.AddLink)) != is_undo
+        if action.action_type in (UndoActionType.AddNode, UndoActionType.RemoveNode):
+            if is_adding:
+                node_tag = self.add_node(len(data['pins']))
+                self.undo_journal.map_tag(data['uuid'], node_tag)
+                for journal_pin_tag, pin_tag in zip(data['pins'], self.node_dict[node_tag]):
+                    self.undo_journal.map_tag(journal_pin_tag, pin_tag)
+            else:
+                self.delete_node(get_live_tag(data['uuid']))
+        elif action.action_type in (UndoActionType.AddLink, UndoActionType.RemoveLink):
+            link = (get_live_tag(data['source_pin']), get_live_tag(data['destination_pin']))
+            assert link[0] in self.live_pin_set and link[1] in self.live_pin_set
+            if is_adding:
+                self.link_set.add(link)
+            else:
+                self.link_set.remove(link)
+        elif action.action_type == UndoActionType.EditPinValue:
+            self.pin_value_dict[(get_live_tag(data['node']), data['pin'])] = \
+                data['old_value'] if is_undo else data['new_value']
+
+
+def _record_pin_value_edit(graph: _Graph, node_tag: str, old_value, new_value):
+    graph.record(UndoActionType.EditPinValue, {'node': graph.undo_journal.get_journal_tag(node_tag), 'pin': 'Value',
+                                               'old_value': old_value, 'new_value': new_value})
+    graph.pin_value_dict[(node_tag, 'Value')] = new_value
+
+
+def test_actions_of_a_group_are_undone_together():
+    undo_journal = UndoJournal()
+    graph = _Graph(undo_journal)
+    source_node_tag, destination_node_tag = graph.add_node(), graph.add_node()
+    link = (graph.node_dict[source_node_tag][1], graph.node_dict[destination_node_tag][0])
+    graph.link_set.add(link)
+    graph.remove_node(destination_node_tag)
+    assert not graph.link_set
+    assert graph.apply_group(is_undo=True)
+    assert len(graph.node_dict) == 2 and len(graph.link_set) == 1
+    assert not undo_journal.can_undo and undo_journal.can_redo
+
+
+def test_nested_groups_close_with_the_outermost_one():
+    undo_journal = UndoJournal()
+    graph = _Graph(undo_journal)
+    undo_journal.begin_group()
+    graph.record(UndoActionType.AddNode, graph.get_node_undo_data(graph.add_node()))
+    undo_journal.begin_group()
+    graph.record(UndoActionType.AddNode, graph.get_node_undo_data(graph.add_node()))
+    assert not undo_journal.end_group()
+    assert not undo_journal.can_undo
+    assert undo_journal.end_group()
+    assert graph.apply_group(is_undo=True)
+    assert not graph.node_dict
+    # An empty group records nothing
+    undo_journal.begin_group()
+    assert not undo_journal.end_group()
+    assert not undo_journal.can_undo
+
+
+def test_successive_edits_of_a_pin_are_undone_at_once():
+    undo_journal = UndoJournal()
+    graph = _Graph(undo_journal)
+    node_tag = graph.add_node()
+    for old_value, new_value in (('', 'a'), ('a', 'ab'), ('ab', 'abc')):
+        _record_pin_value_edit(graph, node_tag, old_value, new_value)
+    graph.apply_group(is_undo=True)
+    assert graph.pin_value_dict[(node_tag, 'Value')] == ''
+    assert not undo_journal.can_undo
+    graph.apply_group(is_undo=False)
+    assert graph.pin_value_dict[(node_tag, 'Value')] == 'abc'
+    # An undo / redo ends the merging, the next edit is undone on its own
+    _record_pin_value_edit(graph, node_tag, 'abc', 'abcd')
+    graph.apply_group(is_undo=True)
+    assert graph.pin_value_dict[(node_tag, 'Value')] == 'abc'
+
+
+def test_oldest_groups_are_dropped_past_max_undo_steps():
+    undo_journal = UndoJournal(max_undo_steps=3)
+    graph = _Graph(undo_journal)
+    for _ in range(5):
+        graph.record(UndoActionType.AddNode, graph.get_node_undo_data(graph.add_node()))
+    undo_count = 0
+    while graph.apply_group(is_undo=True):
+        undo_count += 1
+    assert undo_count == 3
+    assert sorted(graph.node_dict) == ['node_1', 'node_2']
+
+
+def test_new_edit_clears_the_redo_groups():
+    undo_journal = UndoJournal()
+    graph = _Graph(undo_journal)
+    graph.record(UndoActionType.AddNode, graph.get_node_undo_data(graph.add_node()))
+    graph.apply_group(is_undo=True)
+    assert undo_journal.can_redo
+    graph.record(UndoActionType.AddNode, graph.get_node_undo_data(graph.add_node()))
+    assert not undo_journal.can_redo
+    assert not graph.apply_group(is_undo=False)
+
+
+def test_tags_of_a_re_created_node_map_to_its_journal_tags():
+    undo_journal = UndoJournal()
+    graph = _Graph(undo_journal)
+    source_node_tag, removed_node_tag = graph.add_node(), graph.add_node()
+    graph.link_set.add((graph.node_dict[source_node_tag][1], graph.node_dict[removed_node_tag][0]))
+    graph.remove_node(removed_node_tag)
+
+    graph.apply_group(is_undo=True)
+    re_created_node_tag = next(node_tag for node_tag in graph.node_dict if node_tag != source_node_tag)
+    assert re_created_node_tag != removed_node_tag
+    assert undo_journal.get_live_tag(removed_node_tag) == re_created_node_tag
+    assert undo_journal.get_journal_tag(re_created_node_tag) == removed_node_tag
+    assert graph.link_set == {(graph.node_dict[source_node_tag][1], graph.node_dict[re_created_node_tag][0])}
+
+    # Redo removes the re-created node and its link, then undo re-creates it once more under another tag
+    graph.apply_group(is_undo=False)
+    assert list(graph.node_dict) == [source_node_tag] and not graph.link_set
+    graph.apply_group(is_undo=True)
+    last_node_tag = next(node_tag for node_tag in graph.node_dict if node_tag != source_node_tag)
+    assert last_node_tag not in (removed_node_tag, re_created_node_tag)
+    assert undo_journal.get_live_tag(removed_node_tag) == last_node_tag
+    assert undo_journal.get_journal_tag(last_node_tag) == removed_node_tag
+    # The tags of the previous re-creation are no longer mapped
+    assert undo_journal.get_journal_tag(re_created_node_tag) == re_created_node_tag
+    assert undo_journal.get_live_tag(graph.node_dict[last_node_tag][0]) == graph.node_dict[last_node_tag][0]
+    assert undo_journal.get_live_tag(f'{removed_node_tag}_pin_0') == graph.node_dict[last_node_tag][0]
+    # Edits of the re-created node are recorded with its journal tag
+    _record_pin_value_edit(graph, last_node_tag, None, 1)
+    graph.apply_group(is_undo=True)
+    assert graph.pin_value_dict[(last_node_tag, 'Value')] is None
+
+
+def test_closed_tab_actions_are_discarded():
+    undo_journal = UndoJournal()
+    graph, closed_graph = _Graph(undo_journal), _Graph(undo_journal)
+    graph.record(UndoActionType.AddNode, graph.get_node_undo_data(graph.add_node()))
+    closed_graph.record(UndoActionType.AddNode, closed_graph.get_node_undo_data(closed_graph.add_node()))
+    undo_journal.discard_node_editor(closed_graph)
+    assert graph.apply_group(is_undo=True)
+    assert not undo_journal.can_undo
+
+
+@pytest.mark.benchmark
+def test_undo_of_a_2k_node_removal_takes_milliseconds():
+    undo_journal = UndoJournal()
+    graph = _Graph(undo_journal)
+    node_tag_list = [graph.add_node() for _ in range(BENCHMARK_NODE_COUNT)]
+    for source_node_tag, destination_node_tag in zip(node_tag_list, node_tag_list[1:]):
+        graph.link_set.add((graph.node_dict[source_node_tag][1], graph.node_dict[destination_node_tag][0]))
+    undo_journal.begin_group()
+    for node_tag in node_tag_list:
+        graph.remove_node(node_tag)
+    undo_journal.end_group()
+    start_time = time.perf_counter()
+    graph.apply_group(is_undo=True)
+    undo_time = time.perf_counter() - start_time
+    assert len(graph.node_dict) == BENCHMARK_NODE_COUNT and len(graph.link_set) == BENCHMARK_NODE_COUNT - 1
+    # Journal and tag mapping side only, the widgets of the re-created nodes are not built here
+    assert undo_time < 0.1
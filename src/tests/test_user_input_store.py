@@ -0,0 +1,49 @@
+import json
+import time
+
+from core.user_input_store import UserInputStore
+
+FLUSH_DELAY = 0.2
+TAB_SWITCH_COUNT = 100
+
+
+def _switch_tabs(store: UserInputStore, switch_count: int):
+    """Store the inputs of the tab being left, as the Tools Viewer does on every tab switch"""
+    for index in range(switch_count):
+        store.update_tab_user_inputs(f'Tab {index % 4}', {'Path': f'path_{index}'})
+
+
+def test_tab_switches_are_written_once_per_flush_delay(tmp_path):
+    store = UserInputStore(tmp_path / 'UserInputs.json', flush_delay=FLUSH_DELAY)
+    start_time = time.perf_counter()
+    _switch_tabs(store, TAB_SWITCH_COUNT)
+    elapsed_time = time.perf_counter() - start_time
+    time.sleep(FLUSH_DELAY * 2)
+    # The switches took less than a flush delay, the timer wrote all of them at once
+    assert elapsed_time < FLUSH_DELAY
+    assert store.write_count == 1
+    user_input_dict = json.loads(store.file_path.read_text())
+    assert user_input_dict['Tab 3'] == {'Path': f'path_{TAB_SWITCH_COUNT - 1}'}
+    store.close()
+    assert store.write_count == 1
+
+
+def test_unchanged_inputs_are_not_written(tmp_path):
+    store = UserInputStore(tmp_path / 'UserInputs.json', flush_delay=FLUSH_DELAY)
+    store.update_tab_user_inputs('Tab', {'Path': 'path'})
+    store.close()
+    for _ in range(10):
+        store.update_tab_user_inputs('Tab', {'Path': 'path'})
+    store.close()
+    assert store.write_count == 1
+
+
+def test_stores_sharing_the_file_keep_the_tabs_of_each_other(tmp_path):
+    file_path = tmp_path / 'UserInputs.json'
+    node_editor_store = UserInputStore(file_path, flush_delay=FLUSH_DELAY)
+    tools_viewer_store = UserInputStore(file_path, flush_delay=FLUSH_DELAY)
+    node_editor_store.update_tab_user_inputs('Node Editor Tab', {'Path': 'a'})
+    tools_viewer_store.update_tab_user_inputs('Tools Viewer Tab', {'Path': 'b'})
+    node_editor_store.close()
+    tools_viewer_store.close()
+    assert json.loads(file_path.read_text()) == {'Node Editor Tab': {'Path': 'a'}, 'Tools Viewer Tab': {'Path': 'b'}}
@@ -0,0 +1,93 @@
+"""
+Builds tool data as saved in .mtool files, with the pins of every node taken from its node module
+"""
+from importlib import import_module
+from typing import Optional
+
+from core.enum_types import NodeTypeFlag, InputPinType, OutputPinType, PinMetaType
+from core.utils import generate_uuid
+
+
+class ToolBuilder:
+    def __init__(self):
+        self._node_list = []
+        self._flow_list = []
+        self._data_link_list = []
+        self._event_dict = {}
+        self._var_dict = {}
+
+    def add_node(self, import_path: str, label: Optional[str] = None, **input_values) -> dict:
+        """
+        Add a node
+
+        :param import_path: module of the node
+        :param label: label of the node, defaults to the node label of the module
+        :param input_values: values of the input pins keyed by pin label, with spaces as underscores
+        :return: node data
+        """
+        node_class = import_module(import_path).Node
+        pin_list = []
+        if node_class.node_type & NodeTypeFlag.Event:
+            pin_list.append(_create_pin('Exec Out', PinMetaType.FlowOut, OutputPinType.Exec))
+        if node_class.node_type & NodeTypeFlag.Exec:
+            pin_list.append(_create_pin('Exec In', PinMetaType.FlowIn, InputPinType.Exec))
+            pin_list.append(_create_pin('Exec Out', PinMetaType.FlowOut, OutputPinType.Exec))
+        for pin_label, pin_type in node_class.pin_dict.items():
+            if pin_type is None:
+                pin_list.append(_create_pin(pin_label, PinMetaType.DataOut, None))
+            elif isinstance(pin_type, InputPinType):
+                meta_type = PinMetaType.FlowIn if pin_type == InputPinType.Exec else PinMetaType.DataIn
+                pin_list.append(_create_pin(pin_label, meta_type, pin_type,
+                                            input_values.get(pin_label.replace(' ', '_'), None)))
+            else:
+                meta_type = PinMetaType.FlowOut if pin_type == OutputPinType.Exec else PinMetaType.DataOut
+                pin_list.append(_create_pin(pin_label, meta_type, pin_type))
+        node_data = {'uuid': generate_uuid(), 'label': label or node_class.node_label, 'pins': pin_list,
+                     'type': int(node_class.node_type), 'import_path': import_path, 'position': {'x': 0, 'y': 0}}
+        self._node_list.append(node_data)
+        return node_data
+
+    def add_event(self, event_name: str) -> dict:
+        event_node = self.add_node('nodes._internal.event_node', f'Event {event_name}')
+        self._event_dict[event_node['uuid']] = None
+        return event_node
+
+    def add_var(self, var_name: str, var_type: str, default_value, is_exposed=False, regex='.*'):
+        self._var_dict[generate_uuid()] = {'name': [var_name], 'type': [var_type], 'value': [None],
+                                           'default_value': [default_value], 'is_exposed': [is_exposed],
+                                           'regex': [regex]}
+
+    def add_get_var_node(self, var_name: str, var_type: str) -> dict:
+        return self.add_node(f'nodes._internal.get_{var_type.lower()}_var', f'Get {var_name}')
+
+    def add_set_var_node(self, var_name: str, var_type: str, **input_values) -> dict:
+        return self.add_node(f'nodes._internal.set_{var_type.lower()}_var', f'Set {var_name}', **input_values)
+
+    def link_flow(self, source_node: dict, source_pin_label: str, destination_node: dict):
+        destination_pin = next(pin for pin in destination_node['pins'] if pin['meta_type'] == PinMetaType.FlowIn)
+        self._flow_list.append([_get_pin(source_node, source_pin_label)['uuid'], destination_pin['uuid']])
+        if source_node['uuid'] in self._event_dict:
+            self._event_dict[source_node['uuid']] = destination_node['uuid']
+
+    def link_data(self, source_node: dict, source_pin_label: str, destination_node: dict,
+                  destination_pin_label: str):
+        self._data_link_list.append([_get_pin(source_node, source_pin_label)['uuid'],
+                                     _get_pin(destination_node, destination_pin_label)['uuid']])
+
+    def get_tool_data(self) -> dict:
+        return {'nodes': self._node_list, 'flows': self._flow_list, 'data_links': self._data_link_list,
+                'events': dict(self._event_dict), 'vars': self._var_dict}
+
+
+def _create_pin(label: str, meta_type: PinMetaType, pin_type, value=None) -> dict:
+    pin_data = {'uuid': generate_uuid(), 'label': label, 'meta_type': int(meta_type),
+                'type': None if pin_type is None else int(pin_type)}
+    if meta_type == PinMetaType.DataIn:
+        pin_data['value'] = value
+    elif meta_type == PinMetaType.DataOut:
+        pin_data['default_value'] = None
+    return pin_data
+
+
+def _get_pin(node_data: dict, pin_label: str) -> dict:
+    return next(pin for pin in node_data['pins'] if pin['label'] == pin_label)
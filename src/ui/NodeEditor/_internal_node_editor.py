@@ -1,9 +1,12 @@
-import dill
 from copy import deepcopy
-from core.enum_types import InputPinType, OutputPinType
+from pathlib import Path
+from typing import Optional, Callable
+from core.enum_types import InputPinType, OutputPinType, PinMetaType
 from ui.NodeEditor.node_utils import *
+from core.tool_file import load_tool_file
+from ui.NodeEditor.undo_journal import UndoAction, UndoActionType
 from multiprocessing import Queue
-from core.utils import create_queueHandler_logger, json_load_from_file_path, \
+from core.utils import create_queueHandler_logger, \
     generate_uuid, log_on_return_message, get_var_default_value_on_type, is_var_type_of_primitive_types, \
     is_var_type_of_string_based, cache_undo_action
 
@@ -105,6 +108,14 @@ def __init__(self,
         self._var_dict = OrderedDict([])
         # list of all item registries declared that will get deleted after the node graph termination
         self.item_registry_dict = {}
+        # Bumped on every edit of the node graph, so saves can skip the tools left untouched
+        self._modification_generation = 0
+        # Modification state and tool path of the last save of this node graph
+        self._saved_state = None
+        # Tool imported once the tab gets first activated, the tabs of an opened project are built on demand
+        self.pending_tool_path: Optional[Path] = None
+        # Tool data of the pending tool when parsed ahead in the background
+        self.pending_tool_data_result = None
         self._id = dpg.add_node_editor(
             callback=self.callback_link,
             delink_callback=self.callback_delink,
@@ -138,6 +149,8 @@ def add_node_from_module(self, node_module, pos=(0, 0), override_label=''):
         intermediate_node = self._prepare_intermediate_node(node_module, pos, override_label)
         node = intermediate_node.create_node()
         self._store_new_node_data(node)
+        if not self.node_editor_project_instance.init_flag:
+            self._record_undo_action(UndoActionType.AddNode, self._get_node_undo_data(self._node_dict['nodes'][-1]))
         return node
 
     def _prepare_intermediate_node(self, node_module, pos, label: str):
@@ -201,6 +214,8 @@ def _store_new_node_data(self, node):
         """
         if node.node_type == NodeTypeFlag.Event:
             self._update_splitter_event(node)
+        node.pin_value_edit_listener = self.record_pin_value_edits
+        self.mark_modified()
         self.node_instance_dict[node.node_tag] = node
         self._add_node_info_to_node_dict(node)
         self.node_flow_link_dict = sort_flow_link_dict(self.flow_link_list)
@@ -258,11 +273,23 @@ def callback_tool_save(self, sender, app_data):
         file_path = app_data['file_path_name']
         self._refresh_node_editor_data()
         tobe_exported_dict = self._construct_export_dict()
-        return_message = save_dict_to_json(tobe_exported_dict, file_path)
+        return_message = save_tool_dict_to_file(tobe_exported_dict, file_path)
         if sender == 'NG_file_save':
             log_on_return_message(logger=self.logger, action=action,
                                   return_message=return_message)
 
+    def get_export_snapshot(self) -> dict:
+        """
+        Construct an export dict sharing no mutable data with this node graph, so it can be serialized on another thread
+
+        :return: dictionary to be exported to file
+        """
+        self._refresh_node_editor_data()
+        export_dict = self._construct_export_dict()
+        export_dict['events'] = dict(export_dict['events'])
+        export_dict['vars'] = deepcopy(export_dict['vars'])
+        return export_dict
+
     def _refresh_node_editor_data(self):
         """
         Refresh all internal data to reflect latest node statuses
@@ -278,8 +305,6 @@ def _clean_up_nodes_and_update_pins_values(self):
         for node_info in self._node_dict['nodes']:
             # Update the is exposed status of the nodes and the pins value
             update_pins_values_in_node_dict(node_info)
-            # Clean up non-primitive value from node internal data
-            eliminate_non_primitive_internal_node_data(node_info['node_instance'])
 
     def _refresh_event_order_in_node_dict(self):
         """
@@ -301,11 +326,9 @@ def _construct_export_dict(self) -> dict:
 
         :return: dictionary to be exported to file
         """
-        # Deep copying existing node dict, so we don't mistakenly modify it
-        export_dict = dill.loads(dill.dumps(self._node_dict))
+        # Project the exported fields only, node instances and their internal data are never copied
+        export_dict = {'nodes': [project_node_info_for_export(node_info) for node_info in self._node_dict['nodes']]}
         self._update_necessary_entries_export_dict(export_dict)
-        # Remove redundancies, such as node / pin instances
-        prepare_node_info_for_export(export_dict)
 
         return export_dict
 
@@ -372,17 +395,39 @@ def callback_tool_import(self, sender, app_data):
         if not self.node_editor_project_instance.init_flag:
             log_on_return_message(self.logger, action, return_message)
 
-    def _tool_import(self, file_path):  # Import means to append the existing node graph
+    def import_pending_tool(self):
+        """
+        Build the node graph of a tab opened on demand from its pending tool
+
+        :return:
         """
-        Rtool import to current node graph
+        tool_path = self.pending_tool_path
+        tool_data = None
+        if self.pending_tool_data_result is not None:
+            try:
+                tool_data = self.pending_tool_data_result.get()
+            except Exception:
+                self.logger.debug(f'Could not parse {tool_path} ahead, parsing it again', exc_info=True)
+        self.pending_tool_path = None
+        self.pending_tool_data_result = None
+        return_message = self._tool_import(tool_path, tool_data)
+        if return_message[0] != 1:
+            log_on_return_message(self.logger, 'Tool Import', return_message)
+        # Freshly imported tools match their files, the next save does not need to rewrite them
+        self.mark_saved(tool_path)
+
+    def _tool_import(self, file_path, tool_data: Optional[dict] = None):
+        """
+        Rtool import to current node graph, import means to append the existing node graph
 
         :param file_path: Rtool file path
+        :param tool_data: tool data already parsed from the file
         :return:
         """
-        # Read JSON
-        imported_dict = json_load_from_file_path(file_path)
-        if imported_dict is None:
-            return 0, 'Could not load Json file!'
+        # Read JSON or compact tool file
+        imported_dict = load_tool_file(file_path) if tool_data is None else tool_data
+        if not imported_dict:
+            return 0, 'Could not load tool file!'
         # prepare a pin_mapping dict that lets functions know which pins linked together
         pin_mapping_dict = {}
         # -----------Initialize Variables -----------
@@ -509,6 +554,7 @@ def add_link_from_sourcePin_to_destinationPin(self, source_pin_tag, destination_
             link = self._add_data_link_from_source_pin_to_destination_pin(prepared_link_info)
 
         if link:
+            self._record_link_undo_action(UndoActionType.AddLink, link)
             return 1, f"New link created from {link.source_pin_instance.pin_tag} to {link.destination_pin_instance.pin_tag}"
         else:
             return 0, f'No link established'
@@ -555,6 +601,7 @@ def _create_flow_link_if_not_duplicate(self, link_info):
             return None
 
     def _reflect_new_flow_link_to_all_data(self, link):
+        self.mark_modified()
         self._append_flow_link_to_list(link)
         reflect_new_link_to_pins(link)
         self._update_new_event_if_source_is_event_node(link)
@@ -581,6 +628,7 @@ def _create_data_link_if_not_duplicate(self, link_info):
             return None
 
     def _reflect_new_data_link_to_all_data(self, link):
+        self.mark_modified()
         self._append_data_link_to_list(link)
         reflect_new_link_to_pins(link)
 
@@ -611,12 +659,14 @@ def _get_link_from_id(self, link_id) -> Tuple[Link, bool]:
 
     @cache_undo_action
     def remove_data_link(self, link: Link):
+        self._record_link_undo_action(UndoActionType.RemoveLink, link)
         self._remove_data_link_in_all_data_bases(link)
         self._reflect_remove_data_link_on_connected_pins(link)
         return 1,
 
     def _remove_data_link_in_all_data_bases(self, link: Link):
         dpg.delete_item(link.link_id)
+        self.mark_modified()
         self.data_link_list.remove(link)
         self._refresh_link_dict()
 
@@ -651,11 +701,13 @@ def _reflect_remove_link_on_destination_pin(link: Link):
 
     @cache_undo_action
     def remove_flow_link(self, link: Link):
+        self._record_link_undo_action(UndoActionType.RemoveLink, link)
         self._remove_flow_link_in_all_data_bases(link)
         self._reflect_remove_flow_link_on_connected_pins(link)
 
     def _remove_flow_link_in_all_data_bases(self, link: Link):
         dpg.delete_item(link.link_id)
+        self.mark_modified()
         self._flow_link_list.remove(link)
         self._refresh_link_dict()
 
@@ -672,6 +724,7 @@ def _reflect_remove_flow_link_on_source_pin(self, link: Link):
 
     @cache_undo_action
     def add_var(self, var_info: dict, default_value=None, default_is_exposed_flag=False, regex=None):
+        self.mark_modified()
         # Save one for the splitter's var_dict
         self._splitter_var_dict.update(var_info)
         var_tag: str = list(var_info.keys())[0]
@@ -698,6 +751,8 @@ def add_var(self, var_info: dict, default_value=None, default_is_exposed_flag=Fa
                     'is_exposed': [default_is_exposed_flag if default_is_exposed_flag is not None else False],
                     'regex': [regex]
                 }})
+            if not self.node_editor_project_instance.init_flag:
+                self._record_undo_action(UndoActionType.AddVar, self._get_var_undo_data(var_tag))
         else:  # Refresh UI
             self._var_dict[var_tag]['name'][0] = var_name[0]
             self._var_dict[var_tag]['type'][0] = var_type[0]
@@ -721,3 +776,149 @@ def delete_item_registry(self, item_tag: str):
         dpg.delete_item(registry_id)
         self.item_registry_dict.pop(item_tag)
 
+
+    def mark_modified(self):
+        self._modification_generation += 1
+
+    def get_unmodified_saved_tool_path(self) -> Optional[Path]:
+        """
+        Get the tool file this node graph was last saved to, if it did not get modified since
+
+        :return: path of the last saved tool file, None if modified since or never saved
+        """
+        if self._saved_state is None or self._saved_state[0] != self._get_modification_state():
+            return None
+        return self._saved_state[1]
+
+    def mark_saved(self, tool_path: Path):
+        self._saved_state = (self._get_modification_state(), tool_path)
+
+    def get_mark_saved_callback(self, tool_path: Path) -> Callable[[], None]:
+        """
+        Get a callback marking this node graph saved to a tool file as it is now, to be called once the file got
+        written, so a save failing on the way does not get the node graph skipped by the next saves
+
+        :param tool_path: path of the tool file being written
+        :return: callback without argument
+        """
+        saved_state = (self._get_modification_state(), tool_path)
+
+        def mark_saved():
+            self._saved_state = saved_state
+        return mark_saved
+
+    def _get_modification_state(self) -> tuple:
+        # Vars and events are also renamed, reordered or exposed from the splitter and details panel, comparing them
+        # is cheaper than tracking every of these widgets
+        return self._modification_generation, repr((list(self._event_dict.items()), list(self._var_dict.items())))
+
+    def _record_undo_action(self, action_type: UndoActionType, data: dict):
+        """
+        Record an edit of this node graph to the project undo journal, edits made while importing or applying undo /
+        redo are not recorded
+
+        :param action_type: type of the edit
+        :param data: data needed to apply the edit or its inverse, with journal tags
+        :return:
+        """
+        if self.node_editor_project_instance.init_flag:
+            return
+        self.node_editor_project_instance.undo_journal.record(UndoAction(action_type, self, data))
+
+    def _get_node_undo_data(self, node_info: dict) -> dict:
+        undo_journal = self.node_editor_project_instance.undo_journal
+        node_undo_data = project_node_info_for_export(node_info)
+        node_undo_data['uuid'] = undo_journal.get_journal_tag(node_undo_data['uuid'])
+        for pin_info in node_undo_data['pins']:
+            pin_info['uuid'] = undo_journal.get_journal_tag(pin_info['uuid'])
+        return node_undo_data
+
+    def _get_var_undo_data(self, var_tag: str) -> dict:
+        var_info = self._var_dict[var_tag]
+        return {
+            'var_tag': self.node_editor_project_instance.undo_journal.get_journal_tag(var_tag),
+            'var_info': {key: list(var_info[key]) for key in ('name', 'type', 'default_value', 'is_exposed', 'regex')}
+        }
+
+    def _record_link_undo_action(self, action_type: UndoActionType, link: Link):
+        undo_journal = self.node_editor_project_instance.undo_journal
+        self._record_undo_action(action_type, {
+            'source_pin': undo_journal.get_journal_tag(link.source_pin_instance.pin_tag),
+            'destination_pin': undo_journal.get_journal_tag(link.destination_pin_instance.pin_tag)
+        })
+
+    def record_node_removal(self, node_info: dict):
+        self.mark_modified()
+        if self.node_editor_project_instance.init_flag:
+            return
+        update_pins_values_in_node_dict(node_info)
+        self._record_undo_action(UndoActionType.RemoveNode, self._get_node_undo_data(node_info))
+
+    def record_var_removal(self, var_tag: str):
+        self.mark_modified()
+        if self.node_editor_project_instance.init_flag:
+            return
+        self._record_undo_action(UndoActionType.RemoveVar, self._get_var_undo_data(var_tag))
+
+    def record_pin_value_edits(self, node):
+        """
+        Pin value edit listener of the nodes, records the input pins whose value differs from the last known one
+
+        :param node: node instance whose pin values got edited
+        :return:
+        """
+        for pin_info in node.pin_list:
+            if pin_info['meta_type'] != PinMetaType.DataIn or 'value' not in pin_info:
+                continue
+            new_value = dpg_get_value(pin_info['pin_instance'].value_tag)
+            if new_value == pin_info['value']:
+                continue
+            self.mark_modified()
+            self._record_undo_action(UndoActionType.EditPinValue, {
+                'node': self.node_editor_project_instance.undo_journal.get_journal_tag(node.node_tag),
+                'pin': pin_info['label'],
+                'old_value': pin_info['value'],
+                'new_value': new_value
+            })
+            pin_info['value'] = new_value
+
+    def restore_node_from_undo_data(self, node_undo_data: dict):
+        """
+        Re-create a node recorded in the undo journal and map its journal tags to the new node and pin tags
+
+        :param node_undo_data: node info with journal tags
+        :return:
+        """
+        undo_journal = self.node_editor_project_instance.undo_journal
+        added_node = self._add_node_with_imported_info(node_undo_data)
+        if added_node is None:
+            raise RuntimeError(f'Could not re-create node {node_undo_data["label"]}')
+        undo_journal.map_tag(node_undo_data['uuid'], added_node.node_tag)
+        pin_mapping_dict = {}
+        add_pin_mapping_entries(node_undo_data['pins'], added_node, pin_mapping_dict)
+        for journal_pin_tag, pin_tag in pin_mapping_dict.items():
+            undo_journal.map_tag(journal_pin_tag, pin_tag)
+        for pin_undo_data in node_undo_data['pins']:
+            if pin_undo_data.get('value', None) is not None:
+                self.set_pin_value(added_node.node_tag, pin_undo_data['label'], pin_undo_data['value'])
+
+    def set_pin_value(self, node_tag: str, pin_label: str, value):
+        node = self.node_instance_dict[node_tag]
+        for pin_info in node.pin_list:
+            if pin_info['label'] == pin_label and 'value' in pin_info:
+                dpg_set_value(pin_info['pin_instance'].value_tag, value)
+                pin_info['value'] = value
+                self.mark_modified()
+                break
+        node.update_internal_input_data()
+
+    def remove_link_between_pins(self, source_pin_tag: str, destination_pin_tag: str):
+        for link in self._data_link_list:
+            if link.source_pin_instance.pin_tag == source_pin_tag and \
+                link.destination_pin_instance.pin_tag == destination_pin_tag:
+                return self.remove_data_link(link)
+        for link in self._flow_link_list:
+            if link.source_pin_instance.pin_tag == source_pin_tag and \
+                link.destination_pin_instance.pin_tag == destination_pin_tag:
+                return self.remove_flow_link(link)
+        raise RuntimeError(f'Could not find link from {source_pin_tag} to {destination_pin_tag}')
@@ -67,6 +67,9 @@ def mouse_left_click_handler(node_editor):
         cache_last_selected_node_pos(node_editor, selected_nodes)
         if not is_cursor_inside_node_graph(node_editor.node_editor_bb) and selected_nodes:
             dpg.clear_selected_nodes(node_editor.current_node_editor_instance.id)
+        elif selected_nodes:
+            # Selected nodes may get dragged, which is not reported by dpg
+            node_editor.current_node_editor_instance.mark_modified()
 
 
 def mouse_right_click_handler(node_editor):
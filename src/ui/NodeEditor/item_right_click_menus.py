@@ -136,11 +136,16 @@ def callback_variable_delete(sender, app_data, user_data):
     _node_list = []
     for node in _current_node_editor_instance.node_instance_dict.values():
         _node_list.append(node)
-    for node in _node_list:
-        if _var_name in node.node_label:
-            delete_selected_node(_master_node_editor_instance, node.id)
+    # Undo the var deletion and its nodes deletion at once
+    _master_node_editor_instance.undo_journal.begin_group()
+    try:
+        for node in _node_list:
+            if _var_name in node.node_label:
+                delete_selected_node(_master_node_editor_instance, node.id)
 
-    delete_var_dict_entry(_master_node_editor_instance, _var_tag)
+        delete_var_dict_entry(_master_node_editor_instance, _var_tag)
+    finally:
+        _master_node_editor_instance.end_undo_group()
 
 
 def delete_var_dict_entry(master_inst, var_tag):
@@ -148,6 +153,7 @@ def delete_var_dict_entry(master_inst, var_tag):
     _current_node_editor_instance = _master_node_editor_instance.current_node_editor_instance
     _splitter_panel = _current_node_editor_instance.splitter_panel
     _var_tag = var_tag
+    _current_node_editor_instance.record_var_removal(_var_tag)
     # Delete var from the var dicts
     _current_node_editor_instance.var_dict.pop(_var_tag)
     _current_node_editor_instance.splitter_var_dict.pop(_var_tag)
@@ -139,12 +139,15 @@ def _update_log_window():
 
 def destroy_project_and_get_update_status(node_editor_project: NodeEditor) -> bool:
     node_editor_project.update_cached_user_inputs_files_with_current_tab()
+    node_editor_project.user_input_store.close()
     node_editor_project.cache_as_last_project()
     is_schedule_update = node_editor_project.is_schedule_for_update
     for node in node_editor_project.current_node_editor_instance.node_instance_dict.values():
         node.on_node_deletion()
     node_editor_project.thread_pool.close()
     node_editor_project.thread_pool.join()
+    # Finish pending saves before exiting
+    node_editor_project.background_saver.stop()
     # Remove cache folder
     shutil.rmtree(CACHE_DIR)
     dpg.destroy_context()
@@ -8,14 +8,15 @@
 from ui.NodeEditor.splitter import Splitter
 from ui.NodeEditor.details_panel import DetailPanel
 from ui.NodeEditor._internal_node_editor import DPGNodeEditor
-from ui.NodeEditor.item_right_click_menus import tab_right_click_menu
+from ui.NodeEditor.item_right_click_menus import tab_right_click_menu, delete_var_dict_entry
+from ui.NodeEditor.undo_journal import UndoJournal, UndoAction, UndoActionType
 from core.classes.node import NodeModule
-from ui.NodeEditor.node_utils import construct_var_node_label, construct_module_name_from_var_action_and_type
+from ui.NodeEditor.node_utils import construct_var_node_label, construct_module_name_from_var_action_and_type, \
+    delete_selected_node
 from collections import OrderedDict
 import os
 import subprocess
 from pathlib import Path
-import shutil
 from importlib import import_module
 from copy import deepcopy
 import traceback
@@ -24,7 +25,10 @@
     is_string_contains_special_characters, warn_file_dialog_and_reshow_widget, create_directory_if_not_existed, \
     trigger_init_flag, dpg_get_value
 from core.data_loader import refresh_core_data_with_json_dict
-from core.executor import execute_event
+from core.tool_file import load_tool_file
+from core.background_saver import BackgroundSaver
+from core.user_input_store import UserInputStore
+from core.executor import execute_event, get_execution_plan
 from core.self_update import is_user_schedule_update_task
 from libs.constants import CACHE_DIR, RECENT_PROJECTS_STORAGE_FILE_PATH, LAST_SESSIONS_DIR, NODE_EDITOR_LOG_DIR
 
@@ -49,14 +53,6 @@ def node_editor_bb(self, value: List[tuple]):
     def node_editor_tab_dict(self) -> OrderedDict:
         return self._node_editor_tab_dict
 
-    @property
-    def cache_revision_path_list(self) -> list:
-        # Remove cache dir if the list length exceeds maximum capacity
-        if len(self._cache_revision_path_list) >= self._setting_dict['MAX_CACHE_REVISIONS']:
-            to_remove_dir: Path = self._cache_revision_path_list.pop(0)
-            shutil.rmtree(to_remove_dir)
-        return self._cache_revision_path_list
-
     @property
     def init_flag(self) -> bool:
         return self._init_flag
@@ -66,12 +62,22 @@ def init_flag(self, value: bool):
         self._init_flag = value
 
     @property
-    def undo_streak(self) -> int:
-        return self._undo_streak
+    def undo_journal(self) -> UndoJournal:
+        return self._undo_journal
+
+    @property
+    def background_saver(self) -> BackgroundSaver:
+        return self._background_saver
 
-    @undo_streak.setter
-    def undo_streak(self, value: int):
-        self._undo_streak = value
+    @property
+    def user_input_store(self) -> UserInputStore:
+        # One store per project, replaced when the project gets renamed or another one opened
+        if self._user_input_store is None or self._user_input_store.file_path != self.cached_user_inputs_file_path:
+            if self._user_input_store is not None:
+                self._user_input_store.close()
+            self._user_input_store = UserInputStore(self.cached_user_inputs_file_path,
+                                                    self._setting_dict.get('USER_INPUT_FLUSH_DELAY', 1.0), self.logger)
+        return self._user_input_store
 
     @property
     def tools_path(self) -> Path:
@@ -112,11 +118,13 @@ def __init__(
         self._node_editor_bb = [(), ()]
         self.project_name = 'MyMomotarouProject'
         self.project_folder_path = CACHE_DIR / self.project_name
-        self._cache_revision_path_list = []
-        self._undo_streak = 0
+        self._undo_journal = UndoJournal(self._setting_dict.get('MAX_UNDO_STEPS', 100))
         # ------- LOGGING ______
         self.logging_queue = logging_queue
         self.logger = create_queueHandler_logger(__name__, logging_queue, self._use_debug_print)
+        # Tools are serialized and written off the UI thread, bursts of saves are written once
+        self._background_saver = BackgroundSaver(self._setting_dict.get('SAVE_COALESCING_DELAY', 0.3), self.logger)
+        self._user_input_store = None
         # ------- UPDATE CHECK ------
         self.is_schedule_for_update = False
         self._check_for_update()
@@ -287,9 +295,7 @@ def callback_import_tool_to_current_tab(self, sender, app_data):
         self.current_node_editor_instance.callback_tool_import(sender, app_data)
 
     def get_cached_user_inputs(self) -> dict:
-        user_inputs_data = json_load_from_file_path(self.cached_user_inputs_file_path)
-        tab_label = dpg.get_item_label(self.current_tab_id)
-        return user_inputs_data.get(tab_label, {})
+        return self.user_input_store.get_tab_user_inputs(dpg.get_item_label(self.current_tab_id))
 
     def _add_handler_registry(self):
         """
@@ -306,8 +312,7 @@ def _add_handler_registry(self):
 
     def _init_cached_user_inputs_file(self):
         if not self.cached_user_inputs_file_path.exists():
-            to_export_dict = self._get_current_tab_user_inputs()
-            json_write_to_file_path(self.cached_user_inputs_file_path, to_export_dict)
+            self.update_cached_user_inputs_files_with_current_tab()
 
     def _get_current_tab_user_inputs(self) -> dict:
         exposed_var_dict = {}
@@ -348,10 +353,9 @@ def clean_old_node_graph_registry_item(self, _old_node_editor_instance):
             _old_node_editor_instance.item_registry_dict.update({'tab_registry': _tab_register_id})
 
     def update_cached_user_inputs_files_with_current_tab(self):
-        _to_update_user_inputs_dict = json_load_from_file_path(self.cached_user_inputs_file_path)
-        _current_tab_user_inputs_value = self._get_current_tab_user_inputs()
-        _to_update_user_inputs_dict.update(_current_tab_user_inputs_value)
-        json_write_to_file_path(self.cached_user_inputs_file_path, _to_update_user_inputs_dict)
+        # Written in the background, at most once per flush delay
+        for tab_name, user_inputs in self._get_current_tab_user_inputs().items():
+            self.user_input_store.update_tab_user_inputs(tab_name, user_inputs)
 
     def update_current_tab_id_and_instance(self, tab_id: int, is_open_tool=False):
         _selected_tab = dpg.get_item_label(tab_id)
@@ -364,6 +368,32 @@ def update_current_tab_id_and_instance(self, tab_id: int, is_open_tool=False):
         except KeyError:
             self.logger.exception('Could not query current node editor instance:')
             return -1
+        if self.current_node_editor_instance.pending_tool_path is not None:
+            self._import_pending_tool_to_current_tab()
+
+    def _import_pending_tool_to_current_tab(self):
+        # Importing is not an undoable edit, keep the flag as is when already importing a project
+        is_init = self._init_flag
+        self._init_flag = True
+        try:
+            self.current_node_editor_instance.import_pending_tool()
+        finally:
+            self._init_flag = is_init
+        self._preload_next_pending_tool()
+
+    def _preload_next_pending_tool(self):
+        """Parse the tool of the tab next to the current one in the background, likely to be opened next"""
+        node_editor_instance_list = [tab_info['node_editor_instance']
+                                     for tab_info in self._node_editor_tab_dict.values()]
+        current_index = node_editor_instance_list.index(self.current_node_editor_instance)
+        for node_editor_instance in node_editor_instance_list[current_index + 1:] + \
+                node_editor_instance_list[:current_index]:
+            if node_editor_instance.pending_tool_path is None:
+                continue
+            if node_editor_instance.pending_tool_data_result is None:
+                node_editor_instance.pending_tool_data_result = self.thread_pool.apply_async(
+                    load_tool_file, (node_editor_instance.pending_tool_path,))
+            return
 
     def refresh_node_editor_dict(self):
         self._check_all_tabs_and_trigger_deletion_if_found_closed()
@@ -386,6 +416,7 @@ def _check_all_tabs_and_trigger_deletion_if_found_closed(self):
     def _delete_tab(self, tab_info, tab_name):
         node_editor_instance = tab_info['node_editor_instance']
         self._node_editor_tab_dict.pop(tab_name)
+        self._undo_journal.discard_node_editor(node_editor_instance)
         # Delete all registry that stored in the node graph
         for registry_id in node_editor_instance.item_registry_dict.values():
             dpg.delete_item(registry_id)
@@ -580,7 +611,6 @@ def _create_new_project(self, project_file_path: Path) -> Tuple[int, object]:
             self._update_project_data(project_file_path)
             tab_id, node_editor_instance = self.callback_add_tab('', app_data='Default', user_data=(0, self.tab_bar_id))
             self.update_current_tab_id_and_instance(tab_id)
-            self.project_save_to_folder(is_cache=True)
             self.cache_as_recent_project()
         except:
             return 4, traceback.format_exc()
@@ -597,6 +627,8 @@ def callback_project_open(self, sender, app_data):
 
     @trigger_init_flag
     def _open_new_project(self, project_file_path: Path) -> Tuple[int, object]:
+        # The project may have been saved a moment ago, read it only once written
+        self._background_saver.flush()
         if not project_file_path.exists():
             return 4, f'Project file {project_file_path} not found!'
         try:
@@ -605,7 +637,6 @@ def _open_new_project(self, project_file_path: Path) -> Tuple[int, object]:
             self._clear_cache()
             self._update_project_data(project_file_path.parent)
             self._batch_import_tools_to_project(project_file_path)
-            self.project_save_to_folder(is_cache=True)
             self.cache_as_recent_project()
         except:
             return 4, traceback.format_exc()
@@ -628,13 +659,13 @@ def _batch_import_tools_to_project(self, project_file_path: Path, default_openin
         _first_tab_id = 0
         for tool_name, tool_path in project_dict.items():
             self.callback_add_tab(0, tool_name, (0, self.tab_bar_id))
-            self.current_node_editor_instance = self._node_editor_tab_dict[tool_name]['node_editor_instance']
-            self.current_node_editor_instance.callback_tool_import('project_open', {
-                'file_path_name': project_file_path.parent / tool_path})
+            # The node graph is only built once the tab gets activated
+            self._node_editor_tab_dict[tool_name]['node_editor_instance'].pending_tool_path = \
+                project_file_path.parent / tool_path
             if i == 0:
                 _first_tab_id = self._node_editor_tab_dict[tool_name]['id']
-            self.clean_splitter_items()
             i += 1
+        self.clean_splitter_items()
         if default_opening_tab_name:
             self._select_default_opening_tab(default_opening_tab_name)
         else:
@@ -656,52 +687,97 @@ def callback_undo_action(self, sender):
             action = dpg.get_item_label(sender)
         else:
             action = 'Undo action'
-        return_message = self._open_project_to_revision(is_undo=True)
+        return_message = self._apply_undo_group(is_undo=True)
         log_on_return_message(self.logger, action, return_message)
 
-    @trigger_init_flag
-    def _open_project_to_revision(self, is_undo: bool):
-        try:
-            cached_project_file_path = self._get_cached_project_file_path(is_undo)
-            if cached_project_file_path is None:
-                return 0, ''
-            current_tab_label = dpg.get_item_label(self.current_tab_id)
-            self._clean_current_project()
-            self._batch_import_tools_to_project(cached_project_file_path, current_tab_label)
-        except:
-            return 4, traceback.format_exc()
-        return 1, ''
-
-    def _get_cached_project_file_path(self, is_undo: bool):
-        if is_undo:
-            if self.undo_streak >= len(self._cache_revision_path_list) - 1:
-                return None
-            self.undo_streak += 1
-            index = - (self.undo_streak + 1)
-        else:
-            if self.undo_streak <= 0:
-                return None
-            index = - self.undo_streak
-            self.undo_streak -= 1
-        return self._cache_revision_path_list[index] / (self.project_name + '.mproject')
-
     def callback_redo_action(self, sender):
         if sender:
             action = dpg.get_item_label(sender)
         else:
             action = 'Redo action'
-        return_message = self._open_project_to_revision(is_undo=False)
+        return_message = self._apply_undo_group(is_undo=False)
         log_on_return_message(self.logger, action, return_message)
 
-    def reset_undo_streak(self):
-        while self.undo_streak != 0:
-            to_remove_dir: Path = self._cache_revision_path_list.pop()
-            shutil.rmtree(to_remove_dir)
-            self.undo_streak -= 1
+    @trigger_init_flag
+    def _apply_undo_group(self, is_undo: bool):
+        """
+        Apply the inverse of the last recorded group of edits, or re-apply the last undone one, on the live node graphs
+
+        :param is_undo: undo if True, redo otherwise
+        :return: return message
+        """
+        if is_undo:
+            undo_group = self._undo_journal.pop_undo_group()
+        else:
+            undo_group = self._undo_journal.pop_redo_group()
+        if undo_group is None:
+            return 0, ''
+        try:
+            for undo_action in (reversed(undo_group) if is_undo else undo_group):
+                self._select_node_editor_tab(undo_action.node_editor)
+                self._apply_undo_action(undo_action, is_undo)
+            self.detail_panel.refresh_ui_with_selected_node_info()
+        except Exception:
+            # The graph no longer matches the journal, later undo steps cannot be applied safely
+            self._undo_journal.clear()
+            return 4, traceback.format_exc()
+        return 1, ''
+
+    def _select_node_editor_tab(self, node_editor_instance):
+        if self.current_node_editor_instance is node_editor_instance:
+            return
+        for tab_info in self._node_editor_tab_dict.values():
+            if tab_info['node_editor_instance'] is node_editor_instance:
+                self.callback_on_tab_bar_change(0, tab_info['id'])
+                dpg.set_value(self.tab_bar_id, tab_info['id'])
+                return
+
+    def _apply_undo_action(self, undo_action: UndoAction, is_undo: bool):
+        node_editor_instance = undo_action.node_editor
+        action_type = undo_action.action_type
+        data = undo_action.data
+        # Undoing a removal adds back, redoing it removes again
+        is_adding = (action_type in (UndoActionType.AddNode, UndoActionType.AddLink, UndoActionType.AddVar)) \
+            != is_undo
+        if action_type in (UndoActionType.AddNode, UndoActionType.RemoveNode):
+            if is_adding:
+                node_editor_instance.restore_node_from_undo_data(data)
+            else:
+                node_tag = self._undo_journal.get_live_tag(data['uuid'])
+                delete_selected_node(self, node_editor_instance.node_instance_dict[node_tag].id)
+        elif action_type in (UndoActionType.AddLink, UndoActionType.RemoveLink):
+            source_pin_tag = self._undo_journal.get_live_tag(data['source_pin'])
+            destination_pin_tag = self._undo_journal.get_live_tag(data['destination_pin'])
+            if is_adding:
+                node_editor_instance.add_link_from_sourcePin_to_destinationPin(source_pin_tag, destination_pin_tag)
+            else:
+                node_editor_instance.remove_link_between_pins(source_pin_tag, destination_pin_tag)
+        elif action_type == UndoActionType.EditPinValue:
+            node_editor_instance.set_pin_value(self._undo_journal.get_live_tag(data['node']), data['pin'],
+                                               data['old_value'] if is_undo else data['new_value'])
+        elif action_type in (UndoActionType.AddVar, UndoActionType.RemoveVar):
+            if is_adding:
+                self._restore_var_from_undo_data(node_editor_instance, data)
+            else:
+                delete_var_dict_entry(self, self._undo_journal.get_live_tag(data['var_tag']))
+
+    def _restore_var_from_undo_data(self, node_editor_instance, var_undo_data: dict):
+        var_info = var_undo_data['var_info']
+        self.splitter_panel.add_var('', '', var_info['name'][0],
+                                    default_value=var_info['default_value'][0],
+                                    var_type=var_info['type'][0],
+                                    default_is_exposed_flag=var_info['is_exposed'][0],
+                                    regex=var_info['regex'][0])
+        # The var got a new tag, the last one added to the node editor
+        self._undo_journal.map_tag(var_undo_data['var_tag'], next(reversed(node_editor_instance.var_dict)))
+        self.splitter_panel.exposed_var_dict = deepcopy(node_editor_instance.var_dict)
+
+    def end_undo_group(self):
+        """Close the undo group of a node editor operation"""
+        self._undo_journal.end_group()
 
     def _clear_cache(self):
-        self._undo_streak = 0
-        self.cache_revision_path_list.clear()
+        self._undo_journal.clear()
         # shutil.rmtree(CACHE_DIR)
 
     def callback_project_save(self, sender):
@@ -715,31 +791,13 @@ def callback_project_save(self, sender):
         return_message = self.project_save_to_folder()
         log_on_return_message(self.logger, action, return_message)
 
-    def project_save_to_folder(self, is_cache=False) -> Tuple[int, object]:
-        if is_cache:
-            try:
-                self._cache_project_states()
-            except Exception:
-                return 4, traceback.format_exc()
-        else:
-            try:
-                self._save_project_to_folder()
-            except Exception:
-                return 4, traceback.format_exc()
+    def project_save_to_folder(self) -> Tuple[int, object]:
+        try:
+            self._save_project_to_folder()
+        except Exception:
+            return 4, traceback.format_exc()
         return 1, ''
 
-    def _cache_project_states(self):
-        self.refresh_node_editor_dict()
-        self._construct_cache_folder_and_save_project_states()
-
-    def _construct_cache_folder_and_save_project_states(self):
-        cache_revision_dir = CACHE_DIR / generate_uuid()
-        tools_path = cache_revision_dir / 'tools'
-        self._construct_tools_folder(tools_path)
-        project_file_path = cache_revision_dir / (self.project_name + '.mproject')
-        self._save_project_file(project_file_path)
-        self.cache_revision_path_list.append(cache_revision_dir)
-
     def _save_project_to_folder(self):
         self.refresh_node_editor_dict()
         self._delete_tool_files_if_not_used()
@@ -749,8 +807,11 @@ def _delete_tool_files_if_not_used(self):
         tools_path = self.tools_path
         if not tools_path.exists():
             return None
+        # Renamed tabs that were never activated still import from their previous file
+        pending_tool_path_list = [tab_info['node_editor_instance'].pending_tool_path
+                                  for tab_info in self._node_editor_tab_dict.values()]
         for tool_file in tools_path.glob('*.mtool'):
-            if self._node_editor_tab_dict.get(tool_file.name, None) is None:
+            if self._node_editor_tab_dict.get(tool_file.stem, None) is None and tool_file not in pending_tool_path_list:
                 tool_file.unlink()
 
     def _construct_project_folder_and_save(self):
@@ -760,11 +821,27 @@ def _construct_project_folder_and_save(self):
         self._save_project_file(project_file_path)
 
     def _construct_tools_folder(self, tools_path: Path):
+        """
+        Save the tool of every tab, only the tabs modified since they were last saved to the same file get serialized
+
+        :param tools_path: folder receiving the tool files
+        :return:
+        """
         create_directory_if_not_existed(tools_path)
         for child_node_graph_name, child_node_graph_info in self._node_editor_tab_dict.items():
-            child_node_graph_path = construct_tool_path_from_tools_path_and_tool_name(tools_path, child_node_graph_name)
-            child_node_graph_info['node_editor_instance'].callback_tool_save('',
-                                                                             {'file_path_name': child_node_graph_path})
+            node_editor_instance = child_node_graph_info['node_editor_instance']
+            child_node_graph_path = Path(construct_tool_path_from_tools_path_and_tool_name(tools_path,
+                                                                                            child_node_graph_name))
+            if node_editor_instance.pending_tool_path is not None:
+                # Never activated, the tool file it was opened from is still up to date
+                if node_editor_instance.pending_tool_path != child_node_graph_path:
+                    self._background_saver.submit_copy(child_node_graph_path, node_editor_instance.pending_tool_path)
+                continue
+            if node_editor_instance.get_unmodified_saved_tool_path() == child_node_graph_path and \
+                child_node_graph_path.exists():
+                continue
+            self._background_saver.submit(child_node_graph_path, node_editor_instance.get_export_snapshot(),
+                                          on_saved=node_editor_instance.get_mark_saved_callback(child_node_graph_path))
 
     def _save_project_file(self, project_file_path: Path):
         tools_path = Path('tools')
@@ -772,7 +849,7 @@ def _save_project_file(self, project_file_path: Path):
         for tool_name in self._node_editor_tab_dict.keys():
             tool_path = construct_tool_path_from_tools_path_and_tool_name(tools_path, tool_name)
             tool_list.append((tool_name, tool_path))
-        json_write_to_file_path(project_file_path, OrderedDict(tool_list))
+        self._background_saver.submit(project_file_path, OrderedDict(tool_list), is_compact=False)
 
     def cache_as_recent_project(self):
         recent_project_data = json_load_from_file_path(RECENT_PROJECTS_STORAGE_FILE_PATH)
@@ -808,14 +885,15 @@ def callback_compile_current_node_graph(self):
         action = 'Compile node graph'
         self.current_node_editor_instance.callback_tool_save('',
                                                              app_data={'file_path_name': cache_file_path})
-        data_dict = json_load_from_file_path(cache_file_path)
+        data_dict = load_tool_file(cache_file_path)
         return_message = refresh_core_data_with_json_dict(data_dict)
         log_on_return_message(self.logger, action, return_message)
         if return_message[0] == 1:  # compile success
             return 1
 
     def subprocess_execution_event(self, event_tag):
-        self.thread_pool.apply_async(execute_event, (event_tag,))
+        # Compile on the calling thread so a graph reloaded before the event starts cannot leak into this run
+        self.thread_pool.apply_async(execute_event, (event_tag, get_execution_plan()))
         # Uncomment below if you want to execute event synchronously
         # execute_event(event_tag)
 
@@ -1,7 +1,8 @@
 import dearpygui.dearpygui as dpg
 from core.enum_types import NodeTypeFlag
 from ui.NodeEditor.utils import sort_data_link_dict, sort_flow_link_dict
-from core.utils import dpg_set_value, dpg_get_value, json_write_to_file_path
+from core.utils import dpg_set_value, dpg_get_value
+from core.tool_file import write_tool_file, is_compact_tool_file
 import traceback
 from core.classes.link import Link, LinkInfo
 from core.classes.pin import PinInfo
@@ -10,6 +11,15 @@
 
 
 def delete_selected_node(node_editor, node_id=None):
+    # Links removed along with the node are recorded in the same undo group, so one undo brings both back
+    node_editor.undo_journal.begin_group()
+    try:
+        _delete_selected_node(node_editor, node_id)
+    finally:
+        node_editor.end_undo_group()
+
+
+def _delete_selected_node(node_editor, node_id=None):
     if node_id is None:
         # Get item ID from the first selected node
         _item_id = dpg.get_selected_nodes(node_editor.current_node_editor_instance.id)[0]
@@ -68,6 +78,7 @@ def delete_selected_node(node_editor, node_id=None):
     # Cleanup node info in node_dict
     for node_info in node_editor.current_node_editor_instance.node_dict['nodes']:
         if node_info['uuid'] == node_tag:
+            node_editor.current_node_editor_instance.record_node_removal(node_info)
             try:
                 node_editor.current_node_editor_instance.node_dict['nodes'].remove(node_info)
                 break
@@ -149,20 +160,6 @@ def update_pins_values_in_node_dict(node_info):
         pin_info.update({'value': dpg_get_value(pin_info['pin_instance'].value_tag)})
 
 
-def eliminate_non_primitive_internal_node_data(node_instance):
-    """
-    Set value to None if found non-primitive type in internal node data
-
-    :param node_instance: instance of the node for inspection
-    :return:
-    """
-    # Clears out complex structs inside nodes' internal_data since pickle can't handle serializing them
-    for key in node_instance.internal_data.keys():
-        if node_instance.internal_data[key].__class__ in [str, int, float, type(None), list]:
-            continue
-        node_instance.internal_data[key] = None
-
-
 def reset_var_values_to_none(var_dict):
     """
     Reset all variables' values to None
@@ -175,33 +172,39 @@ def reset_var_values_to_none(var_dict):
         var_info['value'][0] = None
 
 
-def prepare_node_info_for_export(in_dict):
+def project_node_info_for_export(node_info) -> dict:
     """
-    Remove redundancies and update node's position to reflect current states
+    Copy only the exported fields of a node info, leaving out node / pin instances and reading the current position
 
-    :param dict in_dict: to be exported dict
-    :return:
+    :param dict node_info: node info from the node dict
+    :return: node info to be exported
     """
-    for node in in_dict['nodes']:
-        # Remove redundant entries : node_instance
-        node.pop('node_instance')
-        # Remove redundant entries : pin_instances
-        for pin in node['pins']:
-            pin.pop('pin_instance')
-        # Update node position
-        node['position']['x'], node['position']['y'] = dpg.get_item_pos(node['uuid'])
-
-
-def save_dict_to_json(in_dict, file_path) -> tuple:
+    position_x, position_y = dpg.get_item_pos(node_info['uuid'])
+    return {
+        'uuid': node_info['uuid'],
+        'label': node_info['label'],
+        'pins': [{key: value for key, value in pin_info.items() if key != 'pin_instance'}
+                 for pin_info in node_info['pins']],
+        'type': node_info['type'],
+        'import_path': node_info['import_path'],
+        'position':
+            {
+                'x': position_x,
+                'y': position_y
+            }
+    }
+
+
+def save_tool_dict_to_file(in_dict, file_path) -> tuple:
     """
-    Save dictionary to JSON file
+    Save tool dictionary to file, keeping the compact format if the existing file uses it, JSON otherwise
 
     :param dict in_dict: to be saved dictionary
     :param str file_path: save file path
     :return: return message
     """
     try:
-        json_write_to_file_path(file_path=file_path, value=in_dict)
+        write_tool_file(file_path, in_dict, is_compact=is_compact_tool_file(file_path))
     except Exception:
         return 4, traceback.format_exc()
     else:
@@ -248,6 +251,7 @@ def reapply_imported_pin_value_to_new_node(imported_pin_list, new_node):
             continue
         # Set the imported value to this new pin's value
         dpg_set_value(new_pin_info['pin_instance'].value_tag, imported_value)
+        new_pin_info['value'] = imported_value
 
 
 def reconstruct_node_pos_from_imported_info(node_info) -> Tuple[float, float]:
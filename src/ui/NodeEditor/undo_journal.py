@@ -0,0 +1,143 @@
+from enum import IntEnum, auto
+from typing import List, Optional
+
+
+class UndoActionType(IntEnum):
+    AddNode = auto()
+    RemoveNode = auto()
+    AddLink = auto()
+    RemoveLink = auto()
+    EditPinValue = auto()
+    AddVar = auto()
+    RemoveVar = auto()
+
+
+class UndoAction:
+    """
+    One recorded edit of a node graph. Node, pin and var tags in its data are journal tags, the tags they had when
+    first recorded, since nodes re-created by undo / redo get new tags
+    """
+    __slots__ = ('action_type', 'node_editor', 'data')
+
+    def __init__(self, action_type: UndoActionType, node_editor, data: dict):
+        self.action_type = action_type
+        self.node_editor = node_editor
+        self.data = data
+
+
+class UndoJournal:
+    """
+    In-memory journal of the node graph edits. Actions recorded while a group is open, i.e. during one user operation,
+    are undone / redone together by applying their inverse in reverse order
+    """
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo_group_list)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo_group_list)
+
+    def __init__(self, max_undo_steps=100):
+        self._max_undo_steps = max_undo_steps
+        self._undo_group_list: List[List[UndoAction]] = []
+        self._redo_group_list: List[List[UndoAction]] = []
+        self._pending_group: List[UndoAction] = []
+        self._group_depth = 0
+        # Whether the next pin value edit may merge into the last group, so typing in a box is undone at once
+        self._is_last_group_mergeable = False
+        self._live_tag_dict = {}
+        self._journal_tag_dict = {}
+
+    def begin_group(self):
+        self._group_depth += 1
+
+    def end_group(self) -> bool:
+        """
+        Close the current group
+
+        :return: True if the outermost group got closed with at least one action recorded
+        """
+        self._group_depth -= 1
+        if self._group_depth > 0 or not self._pending_group:
+            return False
+        self._push_undo_group(self._pending_group)
+        self._pending_group = []
+        return True
+
+    def record(self, action: UndoAction):
+        if self._group_depth > 0:
+            self._pending_group.append(action)
+            return
+        if action.action_type == UndoActionType.EditPinValue and self._merge_pin_value_edit(action):
+            return
+        self._push_undo_group([action])
+        self._is_last_group_mergeable = action.action_type == UndoActionType.EditPinValue
+
+    def _merge_pin_value_edit(self, action: UndoAction) -> bool:
+        if not self._is_last_group_mergeable:
+            return False
+        last_action = self._undo_group_list[-1][0]
+        if last_action.node_editor is not action.node_editor or \
+            last_action.data['node'] != action.data['node'] or last_action.data['pin'] != action.data['pin']:
+            return False
+        last_action.data['new_value'] = action.data['new_value']
+        return True
+
+    def _push_undo_group(self, group: List[UndoAction]):
+        self._undo_group_list.append(group)
+        if len(self._undo_group_list) > self._max_undo_steps:
+            self._undo_group_list.pop(0)
+        # A new edit branches off the history, the undone edits cannot be redone anymore
+        self._redo_group_list.clear()
+        self._is_last_group_mergeable = False
+
+    def pop_undo_group(self) -> Optional[List[UndoAction]]:
+        if not self._undo_group_list:
+            return None
+        group = self._undo_group_list.pop()
+        self._redo_group_list.append(group)
+        self._is_last_group_mergeable = False
+        return group
+
+    def pop_redo_group(self) -> Optional[List[UndoAction]]:
+        if not self._redo_group_list:
+            return None
+        group = self._redo_group_list.pop()
+        self._undo_group_list.append(group)
+        self._is_last_group_mergeable = False
+        return group
+
+    def discard_node_editor(self, node_editor):
+        """Forget the actions of a closed tab, they can no longer be applied"""
+        for group_list in (self._undo_group_list, self._redo_group_list):
+            group_list[:] = [[action for action in group if action.node_editor is not node_editor]
+                             for group in group_list]
+            group_list[:] = [group for group in group_list if group]
+        self._is_last_group_mergeable = False
+
+    def get_journal_tag(self, live_tag: str) -> str:
+        return self._journal_tag_dict.get(live_tag, live_tag)
+
+    def get_live_tag(self, journal_tag: str) -> str:
+        return self._live_tag_dict.get(journal_tag, journal_tag)
+
+    def map_tag(self, journal_tag: str, live_tag: str):
+        """Map a journal tag to the tag of the node / pin / var that got re-created for it"""
+        old_live_tag = self._live_tag_dict.pop(journal_tag, None)
+        if old_live_tag is not None:
+            self._journal_tag_dict.pop(old_live_tag, None)
+        if journal_tag == live_tag:
+            return
+        self._live_tag_dict[journal_tag] = live_tag
+        self._journal_tag_dict[live_tag] = journal_tag
+
+    def clear(self):
+        self._undo_group_list.clear()
+        self._redo_group_list.clear()
+        self._pending_group = []
+        self._group_depth = 0
+        self._is_last_group_mergeable = False
+        self._live_tag_dict.clear()
+        self._journal_tag_dict.clear()
@@ -114,6 +114,7 @@ def _update_log_window():
 
 def destroy_project_and_get_update_status(tools_viewer_project: ToolsViewer):
     tools_viewer_project.update_cached_user_inputs_files_with_current_tab()
+    tools_viewer_project.user_input_store.close()
     tools_viewer_project.cache_as_last_project()
     is_schedule_update = tools_viewer_project.is_schedule_for_update
     tools_viewer_project.thread_pool.close()
@@ -5,10 +5,14 @@
 
 from ui.ToolsViewer.utils import tkinter_file_dialog
 from core.utils import create_queueHandler_logger, json_load_from_file_path, add_user_input_box, \
-    remove_node_type_from_node_label, log_on_return_message, json_write_to_file_path, dpg_get_value
-from core.data_loader import refresh_core_data_with_json_dict
+    log_on_return_message, json_write_to_file_path, dpg_get_value
+from core.data_loader import get_invalid_exposed_var_names, warn_user_of_incorrect_input
+from core.compile_cache import load_compiled_tool
+from core.tool_file_cache import get_tool_file_version
+from core.user_input_store import UserInputStore
+from core.project_manifest import load_project_manifest
+from core.execution_plan import ExecutionPlan, ExecutionContext
 from core.executor import execute_event
-from core.enum_types import NodeTypeFlag
 from core.self_update import is_user_schedule_update_task
 
 from collections import OrderedDict
@@ -36,6 +40,16 @@ def cached_user_inputs_file_path(self) -> Path:
     def file_path(self) -> Path:
         return self.project_folder_path / (self.project_name + '.mproject')
 
+    @property
+    def user_input_store(self) -> UserInputStore:
+        # One store per project, replaced when another project gets opened
+        if self._user_input_store is None or self._user_input_store.file_path != self.cached_user_inputs_file_path:
+            if self._user_input_store is not None:
+                self._user_input_store.close()
+            self._user_input_store = UserInputStore(self.cached_user_inputs_file_path,
+                                                    self._setting_dict.get('USER_INPUT_FLUSH_DELAY', 1.0), self.logger)
+        return self._user_input_store
+
     def __init__(
         self,
         use_debug_print=False,
@@ -55,6 +69,7 @@ def __init__(
         else:
             self._setting_dict = setting_dict
         self.thread_pool = ThreadPool()
+        self._user_input_store = None
 
         # ------- LOGGING ______
         self.logging_queue = logging_queue
@@ -111,8 +126,17 @@ def update_current_tab_name_by_tab_id(self, tab_id: int):
         for tab_name, tab_info in self.tab_dict.items():
             if tab_info['id'] == tab_id:
                 self.current_tab_name = tab_name
+                self._import_tool_to_current_tab_if_pending()
                 return
 
+    def _import_tool_to_current_tab_if_pending(self):
+        """Tabs of an opened project get their widgets built once first activated"""
+        tab_info = self.tab_dict[self.current_tab_name]
+        if not tab_info.get('is_pending', False):
+            return
+        tab_info['is_pending'] = False
+        self._import_tool_to_tab(tab_info['child_window_id'], tab_info['tool_summary'])
+
     def callback_project_open(self, sender, app_data):
         """
         Open new project
@@ -138,25 +162,21 @@ def _delete_tab(self, tab_name: str):
         self.tab_dict.pop(tab_name)
 
     def _batch_open_tools_in_project(self, project_file_path: Path, default_opening_tab_name=''):
-        project_dict = {}
+        tool_summary_dict = OrderedDict([])
         try:
-            project_dict = json_load_from_file_path(project_file_path)
-        except IndexError:
+            # Events and exposed vars of every tool, from the project manifest when the tools did not change
+            tool_summary_dict = load_project_manifest(project_file_path)
+        except (OSError, ValueError, KeyError):
             self.logger.exception("Could not open project due to error: ")
-        for tool_name, tool_relative_path in project_dict.items():
-            tool_abs_path = Path(project_file_path).parent / tool_relative_path
-            self.current_tab_name = tool_name
-            tab_id = self._open_tool(tool_name, tool_abs_path)
-            self._update_tab_dict_with_imported_tool(tool_name, tab_id, tool_abs_path)
+        for tool_name, tool_summary in tool_summary_dict.items():
+            # Widgets of the tool are only built once its tab gets activated
+            tab_id, tab_child_window_id = self._init_new_tab_and_get_child_window_id(tool_name)
+            self._update_tab_dict_with_imported_tool(tool_name, tab_id, tool_summary, tab_child_window_id)
         if default_opening_tab_name:
             self._select_default_opening_tab(default_opening_tab_name)
         else:
-            self.current_tab_name = list(project_dict.keys())[0]
-
-    def _open_tool(self, tool_name: str, tool_path: Path) -> int:
-        tab_id, tab_child_window_id = self._init_new_tab_and_get_child_window_id(tool_name)
-        self._import_tool_to_tab(tab_child_window_id, tool_path)
-        return tab_id
+            self.current_tab_name = list(tool_summary_dict.keys())[0]
+            self._import_tool_to_current_tab_if_pending()
 
     def _init_new_tab_and_get_child_window_id(self, new_tab_name: str) -> Tuple[int, int]:
         with dpg.tab(label=new_tab_name, parent=self.tab_bar_id, closable=False) as tab_id:
@@ -166,12 +186,12 @@ def _init_new_tab_and_get_child_window_id(self, new_tab_name: str) -> Tuple[int,
                 pass
         return tab_id, tab_child_window_id
 
-    def _import_tool_to_tab(self, tab_child_window_id: int, tool_path: Path):
-        tool_data = json_load_from_file_path(tool_path)
-        self._add_user_input_boxes_to_tab_from_vars_data(tab_child_window_id, tool_data['vars'])
-        self._add_event_buttons_to_tab_from_nodes_data(tab_child_window_id, tool_data['nodes'])
+    def _import_tool_to_tab(self, tab_child_window_id: int, tool_summary: dict):
+        self._add_user_input_boxes_to_tab_from_vars_data(tab_child_window_id, tool_summary['vars'])
+        self._add_event_buttons_to_tab_from_event_labels(tab_child_window_id, tool_summary['events'])
 
     def _add_user_input_boxes_to_tab_from_vars_data(self, tab_window_id: int, vars_data: dict):
+        cached_user_inputs = self.get_cached_user_inputs()
         for var_info in vars_data.values():
             if var_info['is_exposed'][0] is False:
                 continue
@@ -183,7 +203,7 @@ def _add_user_input_boxes_to_tab_from_vars_data(self, tab_window_id: int, vars_d
                     dpg.add_text(_var_name)
                     exposed_var_user_input_box_tag = var_info.get('user_input_box_tag', None)
                     if exposed_var_user_input_box_tag is not None:
-                        cached_user_input_value = self.get_cached_user_inputs().get(_var_name, None)
+                        cached_user_input_value = cached_user_inputs.get(_var_name, None)
                         add_user_input_box(var_type=var_info['type'][0],
                                            width=500,
                                            tag=var_info['user_input_box_tag'],
@@ -194,16 +214,12 @@ def _add_user_input_boxes_to_tab_from_vars_data(self, tab_window_id: int, vars_d
                                            tag=var_info['user_input_box_tag'])
 
     def get_cached_user_inputs(self):
-        user_inputs_data = json_load_from_file_path(self.cached_user_inputs_file_path)
-        return user_inputs_data.get(self.current_tab_name, {})
+        return self.user_input_store.get_tab_user_inputs(self.current_tab_name)
 
-    def _add_event_buttons_to_tab_from_nodes_data(self, tab_window_id: int, nodes_data: list):
-        for node_info in nodes_data:
-            if node_info['type'] != NodeTypeFlag.Event:
-                continue
-            event_label = remove_node_type_from_node_label(node_info['label'])
+    def _add_event_buttons_to_tab_from_event_labels(self, tab_window_id: int, event_label_dict: dict):
+        for event_tag, event_label in event_label_dict.items():
             dpg.add_button(width=-1, label=event_label, callback=self.callback_execute_event,
-                           user_data=node_info['uuid'], parent=tab_window_id)
+                           user_data=event_tag, parent=tab_window_id)
 
     def _select_default_opening_tab(self, default_opening_tab_name: str):
         default_opening_tab_id = self._get_tab_id_from_label(default_opening_tab_name)
@@ -216,10 +232,14 @@ def _get_tab_id_from_label(self, search_tab_label: str) -> int:
                 return tab_info['id']
         return list(self.tab_dict.values())[0]['id']
 
-    def _update_tab_dict_with_imported_tool(self, tool_name: str, tab_id: int, tool_abs_path: Path):
+    def _update_tab_dict_with_imported_tool(self, tool_name: str, tab_id: int, tool_summary: dict,
+                                            tab_child_window_id: int):
         self.tab_dict.update({tool_name: {
             'id': tab_id,
-            'tool_path': tool_abs_path
+            'tool_path': tool_summary['tool_path'],
+            'tool_summary': tool_summary,
+            'child_window_id': tab_child_window_id,
+            'is_pending': True
         }})
 
     def callback_project_open_in_node_editor(self):
@@ -232,17 +252,30 @@ def callback_open_project_log(self):
 
     def callback_execute_event(self, sender, app_data, user_data):
         event_tag = user_data
-        return_message = refresh_core_data_with_json_dict(self.get_current_tool_data())
+        # Unchanged tools reuse their compiled graph, only the user inputs are bound on every click
+        return_message, compiled_tool = load_compiled_tool(self.tab_dict[self.current_tab_name]['tool_path'])
         log_on_return_message(self.logger, 'Compile node graph', return_message)
-        if return_message[0] == 1:  # compile success
-            self.subprocess_execution_event(event_tag)
+        if return_message[0] != 1:
+            return
+        exposed_var_values = self._get_exposed_var_values_from_user_inputs(compiled_tool.vars_data)
+        invalid_var_name_list = get_invalid_exposed_var_names(compiled_tool.vars_data, exposed_var_values)
+        if invalid_var_name_list:
+            self.logger.error(f'Incorrect input value for {", ".join(invalid_var_name_list)}')
+            warn_user_of_incorrect_input(invalid_var_name_list[0])
+            return
+        self.subprocess_execution_event(event_tag, compiled_tool.plan,
+                                        ExecutionContext(compiled_tool.plan, exposed_var_values))
 
-    def get_current_tool_data(self) -> dict:
-        tool_path = self.tab_dict[self.current_tab_name]['tool_path']
-        return json_load_from_file_path(tool_path)
+    @staticmethod
+    def _get_exposed_var_values_from_user_inputs(tool_vars_data: dict) -> dict:
+        exposed_var_values = {}
+        for var_info in tool_vars_data.values():
+            if var_info['is_exposed'][0]:
+                exposed_var_values[var_info['name'][0]] = dpg_get_value(var_info['user_input_box_tag'])
+        return exposed_var_values
 
-    def subprocess_execution_event(self, event_tag: str):
-        self.thread_pool.apply_async(execute_event, (event_tag,))
+    def subprocess_execution_event(self, event_tag: str, plan: ExecutionPlan, context: ExecutionContext):
+        self.thread_pool.apply_async(execute_event, (event_tag, plan, context))
 
     def _update_project_data(self, project_path: Path):
         self._update_project_name(project_path.name)
@@ -252,19 +285,17 @@ def _update_project_name(self, new_project_name: str):
         self.project_name = new_project_name
         dpg.configure_item(self.project_name_button_id, label=new_project_name + ' (click to refresh)')
 
-    def _init_cached_user_inputs_file(self):
-        if not self.cached_user_inputs_file_path.exists():
-            to_export_dict = self._get_current_tab_user_inputs()
-            json_write_to_file_path(self.cached_user_inputs_file_path, to_export_dict)
-
     def update_cached_user_inputs_files_with_current_tab(self):
-        _to_update_user_inputs_dict = json_load_from_file_path(self.cached_user_inputs_file_path)
-        _current_tab_user_inputs_value = self._get_current_tab_user_inputs()
-        _to_update_user_inputs_dict.update(_current_tab_user_inputs_value)
-        json_write_to_file_path(self.cached_user_inputs_file_path, _to_update_user_inputs_dict)
+        # Written in the background, at most once per flush delay
+        for tab_name, user_inputs in self._get_current_tab_user_inputs().items():
+            self.user_input_store.update_tab_user_inputs(tab_name, user_inputs)
 
     def _get_current_tab_user_inputs(self) -> dict:
-        current_vars_data = json_load_from_file_path(self.tab_dict[self.current_tab_name]['tool_path'])['vars']
+        current_tab_info = self.tab_dict[self.current_tab_name]
+        if 'tool_summary' in current_tab_info:
+            current_vars_data = current_tab_info['tool_summary']['vars']
+        else:
+            current_vars_data = get_tool_file_version(current_tab_info['tool_path']).summary['vars']
         exposed_var_dict = {}
         for exposed_var_info in current_vars_data.values():
             if not exposed_var_info['is_exposed'][0]: